@@ -0,0 +1,268 @@
+'''
+Throughput and latency of the glove acquisition path, off the rig.
+
+Runs the recorder against a `SimulatedGlove` and reports, per output format,
+
+- samples/sec actually logged by `record_from_glove` (and the fraction of
+  simulated packets that never made it into the file),
+- CPU usage of the recorder process (in 'poll' or 'callback' mode),
+- the distribution of packet-arrival-to-file latency, and
+- microbenchmarks of each stage of the acquisition loop
+  (`newData` -> `getSensorRawAll` (with and without a reusable buffer)
+  -> row/dict build -> `WinClock.time`/`Clock.time`
+  -> logger write).
+
+Usage (from the repository root):
+    python -m benchmarks.acquisition --rate 2000 --duration 10 --json before.json
+'''
+from time import perf_counter, perf_counter_ns, process_time, sleep
+from tempfile import TemporaryDirectory
+import argparse
+import struct
+import json
+import os
+
+import numpy as np
+
+from glove import (
+    CH_NAMES,
+    GloveRecorder,
+    SimulatedGlove,
+    TSVLogger,
+    BinaryLogger,
+    CompressedLogger,
+    Clock,
+    WinClock,
+    read_binary,
+    read_compressed,
+    )
+
+CH_LIST = sorted(CH_NAMES, key = lambda ch: CH_NAMES[ch])
+
+# format name -> (file extension, GloveRecorder kwargs)
+FORMATS = {
+    'tsv': ('.tsv', dict(fmt = 'tsv', buffered = False)),
+    'tsv-buffered': ('.tsv', dict(fmt = 'tsv', buffered = True)),
+    'npy': ('.npy', dict(fmt = 'npy')),
+    'dcz': ('.dcz', dict(fmt = 'dcz')),
+}
+
+
+def _percentiles(x, q = (50, 90, 99, 99.9)):
+    if len(x) == 0:
+        return {}
+    return {'p%g'%p: float(v) for p, v in zip(q, np.percentile(x, q))}
+
+def _open_logger(fmt, fpath):
+    if fmt == 'npy':
+        return BinaryLogger(fpath, CH_LIST)
+    if fmt == 'dcz':
+        return CompressedLogger(fpath, CH_LIST)
+    return TSVLogger(fpath, CH_LIST + ['timestamp'],
+        buffered = FORMATS[fmt][1]['buffered'], flush_ms = 200)
+
+def _read_timestamps(fmt, fpath):
+    if fmt == 'npy':
+        return np.asarray(read_binary(fpath)['timestamp'])
+    if fmt == 'dcz':
+        return read_compressed(fpath)['timestamp']
+    with open(fpath) as f:
+        header = f.readline().rstrip('\n').split('\t')
+    return np.loadtxt(fpath, delimiter = '\t', skiprows = 1, ndmin = 1,
+        usecols = header.index('timestamp'))
+
+
+class _TimedFile:
+    '''
+    Wraps a logger's file object and records when each sample is written.
+    '''
+    def __init__(self, f, itemsize = None, count_rows = None):
+        self._f = f
+        self._itemsize = itemsize
+        self._count_rows = count_rows
+        self.times = [] # (perf_counter, number of samples) per write
+
+    def write(self, data):
+        at_header = self._itemsize is not None and self._f.tell() == 0
+        n = self._f.write(data)
+        if at_header:
+            return n
+        if self._count_rows is not None:
+            rows = self._count_rows(data)
+        elif self._itemsize is None:
+            rows = data.count('\n')
+        else:
+            rows = len(data) // self._itemsize
+        self.times.append((perf_counter(), rows))
+        return n
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+
+def bench_recorder(fmt, rate, duration, tmpdir, mode = 'poll'):
+    '''
+    Runs `GloveRecorder` in its own process and measures what it logged.
+    '''
+    ext, kwargs = FORMATS[fmt]
+    fpath = os.path.join(tmpdir, 'recorder_%s%s'%(fmt, ext))
+    rec = GloveRecorder(fpath, backend = 'simulated',
+        backend_kwargs = dict(rate = rate, seed = 0), mode = mode, **kwargs)
+    cpu0 = os.times()
+    rec.start()
+    sleep(duration)
+    rec.stop()
+    cpu1 = os.times()
+    ts = _read_timestamps(fmt, fpath)
+    span = ts[-1] - ts[0] if len(ts) > 1 else float('nan')
+    expected = span * rate + 1
+    cpu = (cpu1.children_user - cpu0.children_user
+            + cpu1.children_system - cpu0.children_system)
+    return dict(
+        samples = int(len(ts)),
+        samples_per_sec = float((len(ts) - 1) / span),
+        missed_fraction = float(max(0., 1 - len(ts) / expected)),
+        # children times are only reported on POSIX; NaN elsewhere
+        cpu_percent = float(100 * cpu / span) if os.name == 'posix' else float('nan'),
+        file_bytes = os.path.getsize(fpath),
+        )
+
+def bench_latency(fmt, rate, duration, tmpdir):
+    '''
+    Acquisition loop of `record_from_glove`, instrumented in-process.
+
+    Latency is measured from the simulated packet's arrival to the moment
+    the sample is handed to the file object (by the loop itself for
+    unbuffered TSV, by the writer thread or block flush otherwise).
+    '''
+    ext, _ = FORMATS[fmt]
+    fpath = os.path.join(tmpdir, 'latency_%s%s'%(fmt, ext))
+    glove = SimulatedGlove(rate = rate, seed = 0)
+    log = _open_logger(fmt, fpath)
+    if fmt == 'dcz': # one write per chunk, which starts with its row count
+        timed = _TimedFile(log._f,
+            count_rows = lambda data: struct.unpack_from('<I', data)[0])
+    else:
+        timed = _TimedFile(log._f, log.dtype.itemsize if fmt == 'npy' else None)
+    log._f = timed
+    clock = Clock()
+    if fmt in ('npy', 'dcz'):
+        write = log.write_sample
+    else:
+        def write(vals, t):
+            row = vals[:len(CH_LIST)].tolist()
+            row.append(t)
+            log.write_row(row)
+    vals = np.zeros(20, dtype = np.uint16)
+    arrivals = []
+    glove.open('SIM')
+    wall0, cpu0 = perf_counter(), process_time()
+    while perf_counter() - wall0 < duration:
+        if glove.newData():
+            arrivals.append(glove.getPacketTime())
+            write(glove.getSensorRawAll(vals), clock.time())
+    log.close()
+    wall, cpu = perf_counter() - wall0, process_time() - cpu0
+    glove.close()
+    arrivals = np.asarray(arrivals)
+    written = np.repeat(
+        [t for t, n in timed.times], [n for t, n in timed.times]
+        )[:len(arrivals)]
+    lat_us = (written - arrivals[:len(written)]) * 1e6
+    return dict(
+        samples = int(len(arrivals)),
+        cpu_percent = float(100 * cpu / wall), # busy-polling, so ~100%
+        latency_us = _percentiles(lat_us),
+        )
+
+def _time_stage(func, n):
+    durations = np.empty(n)
+    for i in range(n):
+        t0 = perf_counter_ns()
+        func()
+        durations[i] = perf_counter_ns() - t0
+    return durations
+
+def bench_stages(n, tmpdir):
+    '''
+    Per-call cost (ns) of each stage of the acquisition loop.
+    '''
+    # new data on every poll; keep the looped signal short at this rate
+    glove = SimulatedGlove(rate = 1e6, duration = .01, seed = 0)
+    glove.open('SIM')
+    clock = Clock()
+    vals = glove.getSensorRawAll()
+    buf = np.zeros(20, dtype = np.uint16)
+    stages = {
+        'newData': glove.newData,
+        'getSensorRawAll': glove.getSensorRawAll,
+        'getSensorRawAll(out)': lambda: glove.getSensorRawAll(buf),
+        'dict build': lambda: {ch: vals[idx] for ch, idx in CH_NAMES.items()},
+        'row build': lambda: buf[:14].tolist() + [0.],
+        'WinClock.time': WinClock().time,
+        'Clock.time': clock.time,
+        }
+    results = {name: _percentiles(_time_stage(f, n), (50, 99))
+                for name, f in stages.items()}
+    ch_vals = {ch: vals[idx] for ch, idx in CH_NAMES.items()}
+    ch_vals['timestamp'] = clock.time()
+    row = vals[:14] + [clock.time()]
+    for fmt in FORMATS:
+        fpath = os.path.join(tmpdir, 'stages_%s%s'%(fmt, FORMATS[fmt][0]))
+        log = _open_logger(fmt, fpath)
+        if fmt in ('npy', 'dcz'):
+            write = lambda: log.write_sample(buf, 0.)
+        else:
+            results['TSVLogger.write (%s)'%fmt] = _percentiles(
+                _time_stage(lambda: log.write(**ch_vals), n), (50, 99))
+            write = lambda: log.write_row(row)
+        results['write (%s)'%fmt] = _percentiles(_time_stage(write, n), (50, 99))
+        log.close()
+    glove.close()
+    return results
+
+
+def main(rate, duration, formats, n_calls, mode = 'poll', json_path = None):
+    results = dict(rate = rate, duration = duration, mode = mode,
+                    recorder = {}, latency = {}, stages = {})
+    with TemporaryDirectory() as tmpdir:
+        print('Stage microbenchmarks (%d calls, ns per call):'%n_calls)
+        results['stages'] = bench_stages(n_calls, tmpdir)
+        for name, res in results['stages'].items():
+            print('  %-32s p50 %8.0f   p99 %8.0f'%(name, res['p50'], res['p99']))
+        for fmt in formats:
+            print('\n[%s] simulated glove at %g Hz for %g s'%(fmt, rate, duration))
+            rec = bench_recorder(fmt, rate, duration, tmpdir, mode)
+            results['recorder'][fmt] = rec
+            print('  recorder: %.1f samples/sec, %.2f%% missed, %.1f%% CPU, %d bytes'%(
+                rec['samples_per_sec'], 100 * rec['missed_fraction'],
+                rec['cpu_percent'], rec['file_bytes']
+                ))
+            lat = bench_latency(fmt, rate, duration, tmpdir)
+            results['latency'][fmt] = lat
+            print('  arrival -> file latency (us): ' + ', '.join(
+                '%s %.1f'%(k, v) for k, v in lat['latency_us'].items()
+                ))
+    if json_path is not None:
+        with open(json_path, 'w') as f:
+            json.dump(results, f, indent = 2)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = __doc__,
+        formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rate', type = float, default = 1000.,
+        help = 'simulated packet rate in Hz')
+    parser.add_argument('--duration', type = float, default = 5.,
+        help = 'seconds per format and measurement')
+    parser.add_argument('--formats', nargs = '+', default = list(FORMATS),
+        choices = list(FORMATS))
+    parser.add_argument('--mode', default = 'poll', choices = ['poll', 'callback'],
+        help = 'acquisition mode of the recorder')
+    parser.add_argument('--calls', type = int, default = 20000,
+        help = 'calls per stage microbenchmark')
+    parser.add_argument('--json', default = None,
+        help = 'save results to this file, for before/after comparisons')
+    args = parser.parse_args()
+    main(args.rate, args.duration, args.formats, args.calls, args.mode, args.json)
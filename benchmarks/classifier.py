@@ -0,0 +1,92 @@
+'''
+Latency of online gesture classification on the glove stream.
+
+Fits a `GestureClassifier`, either to recorded sessions or to synthetic
+gestures, and times `StreamingClassifier.update` for batches of the sizes
+that `GloveRecorder.read_new` returns while recording.
+
+Usage (from the repository root):
+    python -m benchmarks.classifier
+    python -m benchmarks.classifier --sessions logs/sub-01/run-01 logs/sub-01/run-02
+'''
+from time import perf_counter_ns
+import argparse
+import os
+
+import numpy as np
+
+from glove import CH_NAMES
+from glove.binary import glove_dtype
+from glove.classify import GestureClassifier, StreamingClassifier
+
+CH_LIST = sorted(CH_NAMES, key = lambda ch: CH_NAMES[ch])
+
+
+def synthetic_gestures(n_classes = 8, n_per_class = 2000, seed = 0):
+    '''
+    Raw channel values scattered around one random posture per class.
+    '''
+    rng = np.random.default_rng(seed)
+    postures = rng.uniform(1000, 3000, (n_classes, len(CH_LIST)))
+    y = np.repeat(np.arange(n_classes), n_per_class)
+    X = postures[y] + rng.normal(0, 100, (len(y), len(CH_LIST)))
+    names = np.array(['stimuli/image_%d.jpeg'%(i + 1) for i in range(n_classes)])
+    return np.clip(X, 0, 4095).astype(np.uint16), names[y]
+
+def _as_rows(X):
+    rows = np.zeros(len(X), dtype = glove_dtype(CH_LIST))
+    for j, ch in enumerate(CH_LIST):
+        rows[ch] = X[:, j]
+    return rows
+
+def bench_update(stream, X, batch_size, n_calls):
+    rows = _as_rows(X)
+    durations = np.empty(n_calls)
+    for i in range(n_calls):
+        start = (i * batch_size) % max(len(rows) - batch_size, 1)
+        batch = rows[start:start + batch_size]
+        t0 = perf_counter_ns()
+        stream.update(batch)
+        durations[i] = perf_counter_ns() - t0
+    return durations / 1e3 # us
+
+
+def main(sessions, batch_sizes, n_calls):
+    clf = GestureClassifier()
+    if sessions:
+        clf.fit_sessions([
+            (os.path.join(d, 'glove.tsv'), os.path.join(d, 'events.tsv'))
+            for d in sessions
+            ])
+        X = None
+    else:
+        X, y = synthetic_gestures()
+        order = np.random.default_rng(1).permutation(len(X))
+        train, test = order[:len(X) // 2], order[len(X) // 2:]
+        clf.fit(X[train], y[train])
+        labels, conf = clf.predict(X[test])
+        print('Synthetic held-out accuracy: %.3f'%np.mean(labels == y[test]))
+        X = X[test]
+    if X is None:
+        X, _ = synthetic_gestures(len(clf.classes_))
+    stream = StreamingClassifier(clf)
+    stream.set_target(clf.classes_[0])
+    print('StreamingClassifier.update (%d classes, %d calls):'%(
+        len(clf.classes_), n_calls))
+    for size in batch_sizes:
+        us = bench_update(stream, X, size, n_calls)
+        p50, p99, pmax = np.percentile(us, [50, 99, 100])
+        print('  batch %4d: p50 %8.1f us  p99 %8.1f us  max %8.1f us  (%.2f us/sample)'%(
+            size, p50, p99, pmax, p50 / size))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = __doc__,
+        formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', nargs = '*', default = [],
+        help = 'run directories containing glove.tsv and events.tsv')
+    parser.add_argument('--batch-sizes', nargs = '+', type = int,
+        default = [1, 8, 64, 512])
+    parser.add_argument('--calls', type = int, default = 5000)
+    args = parser.parse_args()
+    main(args.sessions, args.batch_sizes, args.calls)
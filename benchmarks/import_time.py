@@ -0,0 +1,110 @@
+'''
+Import time of the analysis-side modules, each in a fresh interpreter.
+
+Analysis jobs start many short-lived processes that only need to read
+logs, so importing e.g. `glove.readers` must not load the recorder
+(multiprocessing), the 5DT driver wrapper or psychopy. For each module,
+reports the wall time of the import (median and best of `--repeat` fresh
+processes) and which of those heavy modules it pulled in; exits with
+status 1 if an analysis module loaded any of them.
+
+Usage (from the repository root):
+    python -m benchmarks.import_time --repeat 20 --json before.json
+'''
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules analysis code imports, which must stay light
+ANALYSIS = [
+    'glove',
+    'glove.logging',
+    'glove.clock',
+    'glove.binary',
+    'glove.compressed',
+    'glove.readers',
+    'glove.index',
+    'glove.gaps',
+    'glove.calibration',
+    'glove.align',
+    'util',
+    ]
+# modules that are expected to be heavy, timed for reference
+HARDWARE = [
+    'glove.recorder',
+    ]
+HEAVY = [
+    'multiprocessing',
+    'ctypes.wintypes',
+    'glove.glove',
+    'glove.recorder',
+    'psychopy',
+    'psychtoolbox',
+    'pandas',
+    ]
+
+_SCRIPT = '''
+import sys, time
+t0 = time.perf_counter()
+import %s
+t1 = time.perf_counter()
+print(t1 - t0, *[m for m in %r if m in sys.modules])
+'''
+
+def time_import(module, repeat = 10):
+    '''
+    Imports `module` in `repeat` fresh interpreters.
+
+    Returns
+    -------
+    result : dict
+        Median and best import time in ms, and the heavy modules loaded.
+    '''
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', _SCRIPT%(module, HEAVY)],
+            cwd = ROOT, capture_output = True, text = True)
+        if out.returncode:
+            return dict(error = out.stderr.strip().splitlines()[-1])
+        fields = out.stdout.split()
+        times.append(1e3 * float(fields[0]))
+        loaded = fields[1:]
+    return dict(median_ms = float(np.median(times)), best_ms = float(np.min(times)),
+                loaded = loaded)
+
+def main(repeat = 10, json_path = None):
+    results = dict()
+    ok = True
+    for module in ANALYSIS + HARDWARE:
+        res = results[module] = time_import(module, repeat)
+        if 'error' in res:
+            print('  %-18s failed: %s'%(module, res['error']))
+            ok &= module not in ANALYSIS
+            continue
+        print('  %-18s median %7.1f ms   best %7.1f ms   loads %s'%(
+            module, res['median_ms'], res['best_ms'],
+            ', '.join(res['loaded']) or '-'))
+        if module in ANALYSIS:
+            # pandas is fine, the readers need it
+            ok &= not [m for m in res['loaded'] if m != 'pandas']
+    if json_path is not None:
+        with open(json_path, 'w') as f:
+            json.dump(results, f, indent = 2)
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = __doc__,
+        formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type = int, default = 10,
+        help = 'fresh interpreters per module')
+    parser.add_argument('--json', default = None,
+        help = 'save results to this file, for before/after comparisons')
+    args = parser.parse_args()
+    sys.exit(0 if main(args.repeat, args.json) else 1)
@@ -0,0 +1,131 @@
+'''
+Accuracy and latency of TR capture, off the scanner.
+
+Runs `TRSync` against a `SimulatedKeyboard` that presses the trigger key
+once per TR (with optional jitter and missed pulses), optionally while a
+`GloveRecorder` records a simulated glove in parallel, and compares the
+logged TRs.tsv with the injected trigger schedule. Reports
+
+- how many triggers were injected, skipped (missed pulses) and logged,
+- the error of each logged timestamp relative to its injected trigger,
+- the listener latency (trigger -> picked up), as logged, and
+- the spread of the logged TR intervals.
+
+Usage (from the repository root):
+    python -m benchmarks.tr_timing --tr 1 --duration 30 --glove-rate 1000
+'''
+from tempfile import TemporaryDirectory
+from time import sleep
+import argparse
+import json
+import os
+
+import numpy as np
+
+from glove import GloveRecorder
+from glove.readers import _read_tsv
+from util import TRSync
+
+MRI_KEY = 't'
+
+
+def _percentiles(x, q = (50, 90, 99, 100)):
+    if len(x) == 0:
+        return {}
+    return {'p%g'%p: float(v) for p, v in zip(q, np.percentile(x, q))}
+
+def compare(schedule_fpath, tr_fpath, tr):
+    '''
+    Matches logged TRs to the injected triggers nearest to them.
+
+    Returns
+    -------
+    results : dict
+    '''
+    schedule = _read_tsv(schedule_fpath, ['timestamp', 'missed'])
+    logged = _read_tsv(tr_fpath, ['timestamp', 'latency'])
+    t_log = logged['timestamp'].to_numpy(dtype = float)
+    # only the part of the schedule that was due while we were recording
+    end = t_log[-1] + tr / 2 if len(t_log) else -np.inf
+    due = schedule[schedule['timestamp'] <= end]
+    sent = due.loc[due['missed'] == 0, 'timestamp'].to_numpy(dtype = float)
+    error = np.full(len(t_log), np.inf)
+    if len(sent):
+        idx = np.searchsorted(sent, t_log)
+        before = sent[np.clip(idx - 1, 0, len(sent) - 1)]
+        after = sent[np.clip(idx, 0, len(sent) - 1)]
+        nearest = np.where(t_log - before <= after - t_log, before, after)
+        error = t_log - nearest
+    matched = np.abs(error) < tr / 2
+    return dict(
+        injected = int(len(due)),
+        missed_pulses = int(due['missed'].sum()),
+        logged = int(len(t_log)),
+        unmatched = int((~matched).sum()),
+        not_logged = int(len(sent) - matched.sum()),
+        error_us = _percentiles(np.abs(error[matched]) * 1e6),
+        latency_ms = _percentiles(logged['latency'].to_numpy(dtype = float) * 1e3),
+        interval_std_ms = float(np.std(np.diff(t_log)) * 1e3) if len(t_log) > 2 else float('nan'),
+        )
+
+def bench_tr(tr, jitter, p_missed, duration, tmpdir, glove_rate = 0., seed = 0):
+    '''
+    Records simulated triggers for `duration` seconds and compares them
+    with what was logged.
+    '''
+    tr_f = os.path.join(tmpdir, 'TRs.tsv')
+    schedule_f = os.path.join(tmpdir, 'injected.tsv')
+    glove = None
+    if glove_rate:
+        glove = GloveRecorder(os.path.join(tmpdir, 'glove.tsv'),
+            backend = 'simulated', backend_kwargs = dict(rate = glove_rate, seed = 0))
+        glove.start()
+    tr_listener = TRSync(tr_f, None, MRI_KEY, kb_backend = 'simulated',
+        kb_kwargs = dict(key = MRI_KEY, tr = tr, jitter = jitter,
+            p_missed = p_missed, seed = seed, schedule_fpath = schedule_f))
+    tr_listener.start()
+    tr_listener.wait_until_first_TR(timeout = 30.)
+    sleep(duration)
+    tr_listener.stop()
+    if glove is not None:
+        glove.stop()
+    return compare(schedule_f, tr_f, tr)
+
+
+def main(tr, jitter, p_missed, duration, glove_rate, json_path = None):
+    with TemporaryDirectory() as tmpdir:
+        res = bench_tr(tr, jitter, p_missed, duration, tmpdir, glove_rate)
+    res.update(tr = tr, jitter = jitter, p_missed = p_missed,
+                duration = duration, glove_rate = glove_rate)
+    print('TR %g s (jitter %g s, %g%% missed) for %g s, glove at %g Hz'%(
+        tr, jitter, 100 * p_missed, duration, glove_rate))
+    print('  injected %d (%d missed pulses), logged %d, unmatched %d, not logged %d'%(
+        res['injected'], res['missed_pulses'], res['logged'],
+        res['unmatched'], res['not_logged']))
+    for name, unit in (('error_us', 'us'), ('latency_ms', 'ms')):
+        print('  %-10s (%s): '%(name.split('_')[0], unit) + ', '.join(
+            '%s %.1f'%(k, v) for k, v in res[name].items()))
+    print('  logged TR interval std: %.3f ms'%res['interval_std_ms'])
+    if json_path is not None:
+        with open(json_path, 'w') as f:
+            json.dump(res, f, indent = 2)
+    return res
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = __doc__,
+        formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tr', type = float, default = 1.,
+        help = 'seconds between simulated triggers')
+    parser.add_argument('--jitter', type = float, default = 0.,
+        help = 'standard deviation of trigger times in seconds')
+    parser.add_argument('--missed', type = float, default = 0.,
+        help = 'probability that a trigger is not sent')
+    parser.add_argument('--duration', type = float, default = 20.)
+    parser.add_argument('--glove-rate', type = float, default = 0.,
+        help = 'also record a simulated glove at this rate (0 for none)')
+    parser.add_argument('--json', default = None,
+        help = 'save results to this file')
+    args = parser.parse_args()
+    main(args.tr, args.jitter, args.missed, args.duration, args.glove_rate,
+            args.json)
@@ -5,8 +5,9 @@ import pandas as pd
 import sys
 import os
 
-from glove import GloveRecorder, WinClock
-from glove.logging import TSVLogger
+from glove import GloveRecorder, Clock
+from glove.logging import TSVLogger, write_sidecar
+from glove.classify import GestureClassifier, StreamingClassifier
 
 from psychopy import visual, core
 from util import (
@@ -15,25 +16,43 @@ from util import (
     show_instructions,
     _display_text,
     generate_order,
+    StimulusCache,
     TRSync
     )
 
-clock = WinClock() # clock.time() is essentially time.perf_counter(),
-# but perf_counter doesn't have consistent zero across processes in Python 3.9
+clock = Clock() # clock.time() is essentially time.perf_counter(),
+# but calibrated to a zero that is consistent across processes
 
 ###### Config ############
 
 LOG_DIR = 'logs'
 MRI_EMULATED_KEY = 's'
 KB_NAME = 'Keyboard'
+# GestureClassifier saved with .save(), to score mimicry online (None to skip)
+CLASSIFIER_MODEL = None
+TELEMETRY_INTERVAL = 1. # seconds between updates of the *_stats.json files
 
 ###### Experiment code #######
 
-def main(log_fpath, tr_listener):
+def _report_mimicry(stream):
+    if stream.target is not None:
+        print('%s: %.0f%% of samples classified correctly'%(
+            stream.target, 100 * stream.accuracy))
+
+def main(log_fpath, tr_listener, glove_recorder = None):
 
     # create log file
     log = TSVLogger(log_fpath,
-        fields = ['timestamp', 'target_position']
+        fields = ['timestamp', 'target_position'],
+        buffered = True
+        )
+    write_sidecar(log_fpath, clock = clock.metadata())
+    # and a log of when each stimulus was requested vs. when it appeared
+    flip_fpath = os.path.join(os.path.dirname(log_fpath), 'flips.tsv')
+    flip_log = TSVLogger(flip_fpath,
+        fields = ['trial', 'target_position', 'requested', 'onset',
+                    'latency', 'dropped_frames'],
+        buffered = True
         )
 
     win = visual.Window(
@@ -46,7 +65,17 @@ def main(log_fpath, tr_listener):
         allowGUI = False
         )
     kb = init_keyboard(KB_NAME)
-    positions = generate_order()
+    seed = np.random.SeedSequence().entropy # logged, to reproduce the order
+    positions = generate_order(seed = seed)
+    write_sidecar(log_fpath, order_seed = seed)
+    stimuli = StimulusCache(win, positions)
+    frame_rate = win.getActualFrameRate()
+    frame_period = 1. / frame_rate if frame_rate else 1. / 60
+    write_sidecar(flip_fpath, clock = clock.metadata(),
+                    frame_period = frame_period, n_stimuli = len(stimuli))
+    stream = None
+    if CLASSIFIER_MODEL is not None and glove_recorder is not None:
+        stream = StreamingClassifier(GestureClassifier.load(CLASSIFIER_MODEL))
 
     show_instructions(win, kb,
     '''
@@ -79,17 +108,36 @@ def main(log_fpath, tr_listener):
     print('\n\nWaiting for MRI to start...')
     tr_listener.wait_until_first_TR()
 
+    onsets = []
     def record_event(name):
-        log.write(timestamp = clock.time(), target_position = name)
+        onsets.append(clock.time())
+        log.write(timestamp = onsets[-1], target_position = name)
 
-    for position in positions:
-        image = visual.ImageStim(win, position)
-        image.draw()
+    n_dropped = 0
+    for trial, position in enumerate(positions):
+        stimuli[position].draw()
         win.callOnFlip(record_event, name = position)
+        requested = clock.time()
         win.flip()
+        # whole frames the stimulus came late beyond the next refresh (the
+        # window only flips once per trial, so psychopy's own count would
+        # flag every trial)
+        dropped = max(int((onsets[-1] - requested) / frame_period), 0)
+        n_dropped += dropped
+        flip_log.write_row((trial, position, requested, onsets[-1],
+            onsets[-1] - requested, dropped))
+        if stream is not None: # score the previous trial, start the next
+            stream.update(glove_recorder.read_new())
+            _report_mimicry(stream)
+            stream.set_target(position, onsets[-1])
         core.wait(5.)
     log.write(timestamp = clock.time(), target_position = 'n/a')
     log.close()
+    flip_log.close()
+    write_sidecar(flip_fpath, dropped_frames = n_dropped)
+    if stream is not None:
+        stream.update(glove_recorder.read_new())
+        _report_mimicry(stream)
 
     _display_text(win,
     '''
@@ -124,14 +172,18 @@ if __name__ == '__main__':
     log_f = os.path.join(output_dir, 'events.tsv')
     tr_f = os.path.join(output_dir, 'TRs.tsv')
 
-    glove_recorder = GloveRecorder(glove_f, port = 'USB0')
+    glove_recorder = GloveRecorder(glove_f, port = 'USB0',
+                        telemetry_interval = TELEMETRY_INTERVAL)
     glove_recorder.start()
 
-    tr_listener = TRSync(tr_f, KB_NAME, MRI_EMULATED_KEY)
+    tr_listener = TRSync(tr_f, KB_NAME, MRI_EMULATED_KEY,
+                        telemetry_interval = TELEMETRY_INTERVAL)
     tr_listener.start()
     print('\n\nListening for TRs!\n\n')
+    print('Watch acquisition with: python -m glove.telemetry %s'%(
+        os.path.splitext(glove_f)[0] + '_stats.json'))
 
-    main(log_f, tr_listener)
+    main(log_f, tr_listener, glove_recorder)
 
     tr_listener.stop()
     glove_recorder.stop()
@@ -1,10 +1,52 @@
-from multiprocessing import Process, Event
-from .glove import FiveDTGlove
-from .logging import TSVLogger
+'''
+Everything is imported lazily (PEP 562): `import glove` or
+`from glove import Clock` only loads the modules that are actually used,
+so analysis code never pulls in multiprocessing or the glove driver.
+'''
+from importlib import import_module
 
-from time import time
-from ctypes import wintypes
-import ctypes
+# public name -> submodule defining it
+_EXPORTS = dict(
+	FiveDTGlove = '.glove',
+	SimulatedGlove = '.simulated',
+	load_glove = '.backends',
+	TSVLogger = '.logging',
+	write_sidecar = '.logging',
+	read_sidecar = '.logging',
+	Clock = '.clock',
+	WinClock = '.clock',
+	BinaryLogger = '.binary',
+	read_binary = '.binary',
+	binary_to_tsv = '.binary',
+	CompressedLogger = '.compressed',
+	read_compressed = '.compressed',
+	iter_compressed = '.compressed',
+	chunk_table = '.compressed',
+	tsv_to_compressed = '.compressed',
+	compressed_to_tsv = '.compressed',
+	TimeIndex = '.index',
+	resample_recordings = '.resample', # `glove.resample` is the module
+	Telemetry = '.telemetry',
+	stats_path = '.telemetry',
+	SEQUENCE_FIELDS = '.gaps',
+	GapEstimator = '.gaps',
+	check_recording = '.gaps',
+	check_logs = '.gaps',
+	snapshot_calibration = '.calibration',
+	scale_raw = '.calibration',
+	scale_recording = '.calibration',
+	SampleQueue = '.queues',
+	SharedRing = '.shared',
+	merge_recordings = '.merge',
+	pin_to_cpu = '.recorder',
+	record_from_glove = '.recorder',
+	GloveRecorder = '.recorder',
+	HANDS = '.recorder',
+	find_gloves = '.recorder',
+	MultiGloveRecorder = '.recorder',
+	)
+
+__all__ = ['CH_NAMES'] + list(_EXPORTS)
 
 CH_NAMES = dict( # channel names and indices for 14 channel glove
 	FD_THUMBNEAR = 0,
@@ -23,61 +65,14 @@ CH_NAMES = dict( # channel names and indices for 14 channel glove
 	FD_LITTLEFAR = 13
 )
 
-class WinClock:
-	'''
-	provides more precise time than built-in time.time() for Windows
-	'''
-	def __init__(self):
-		kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
-		kernel32.QueryPerformanceFrequency.argtypes = (
-			wintypes.PLARGE_INTEGER,) # lpFrequency
-		kernel32.QueryPerformanceCounter.argtypes = (
-			wintypes.PLARGE_INTEGER,) # lpPerformanceCount
-		_qpc_frequency = wintypes.LARGE_INTEGER()
-		if not kernel32.QueryPerformanceFrequency(ctypes.byref(_qpc_frequency)):
-			raise ctypes.WinError(ctypes.get_last_error())
-		self._qpc_frequency = _qpc_frequency.value
-		self._k32 = kernel32
-
-	def time(self):
-		count = wintypes.LARGE_INTEGER()
-		if not self._k32.QueryPerformanceCounter(ctypes.byref(count)):
-			raise ctypes.WinError(ctypes.get_last_error())
-		return count.value / self._qpc_frequency
-
-
-def record_from_glove(stop_event, glove_output, glove_port):
-	glove = FiveDTGlove()
-	glove.open(glove_port)
-	ch_names = [key for key in CH_NAMES]
-	ch_names.sort(key = lambda ch: CH_NAMES[ch])
-	log = TSVLogger(glove_output, ch_names + ['timestamp'])
-	clock = WinClock()
-	while not stop_event.is_set():
-		is_new_data = glove.newData()
-		if is_new_data:
-			vals = glove.getSensorRawAll()
-			ch_vals = {ch: vals[idx] for ch, idx in CH_NAMES.items()}
-			ch_vals['timestamp'] = clock.time()
-			log.write(**ch_vals)
-	log.close()
-	glove.close()
-
-
-class GloveRecorder:
-
-	def __init__(self, rec_fpath, port = 'USB0'):
-		self.fpath = rec_fpath
-		self.port = port
-
-	def start(self):
-		self._stop_event = Event()
-		self._process = Process(
-			target = record_from_glove,
-			args = (self._stop_event, self.fpath, self.port)
-			)
-		self._process.start()
+def __getattr__(name):
+	try:
+		module = _EXPORTS[name]
+	except KeyError:
+		raise AttributeError('module %r has no attribute %r'%(__name__, name))
+	value = getattr(import_module(module, __name__), name)
+	globals()[name] = value # later lookups skip __getattr__
+	return value
 
-	def stop(self):
-		self._stop_event.set()
-		self._process.join()
+def __dir__():
+	return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,194 @@
+'''
+Aligns glove recordings with the stimulus events and TRs of the same run.
+
+Every run directory written by `experiment.py` (logs/sub-XX/run-YY) holds
+glove.tsv (or glove.npy/.dcz), events.tsv and TRs.tsv, all timestamped with the
+same clock. This module epochs the glove stream by stimulus onset and by
+TR using sorted search on the timestamps, reading the recording in chunks
+so that memory use is bounded by the size of the output, not the session.
+
+Usage (from the repository root):
+    python -m glove.align logs --jobs 8
+'''
+from glob import glob
+import argparse
+import os
+
+import numpy as np
+
+from .readers import iter_glove, read_events, read_TRs
+
+N_CHANNELS = 14
+
+
+def epoch(glove_fpath, starts, ends, chunk_size = 1 << 20):
+    '''
+    Cuts the glove stream into windows [starts[i], ends[i]).
+
+    Windows may overlap, and can be in any order.
+
+    Returns
+    -------
+    data : np.ndarray, shape (n_windows, max_samples, 14)
+        Raw channel values (float32), padded with NaN after the last
+        sample of shorter windows.
+    times : np.ndarray, shape (n_windows, max_samples)
+        Timestamps relative to the start of each window, NaN padded.
+    counts : np.ndarray, shape (n_windows,)
+        Number of samples in each window.
+    '''
+    starts = np.asarray(starts, dtype = float)
+    ends = np.asarray(ends, dtype = float)
+    pieces = [[] for _ in starts]
+    for channels, timestamps in iter_glove(glove_fpath, chunk_size):
+        lo = np.searchsorted(timestamps, starts, side = 'left')
+        hi = np.searchsorted(timestamps, ends, side = 'left')
+        for i in np.flatnonzero(hi > lo):
+            # copies, so that no window keeps its whole chunk alive
+            pieces[i].append((channels[lo[i]:hi[i]].astype(np.float32),
+                                timestamps[lo[i]:hi[i]].copy()))
+    counts = np.array([sum(len(t) for _, t in p) for p in pieces], dtype = int)
+    n_max = counts.max() if len(counts) else 0
+    data = np.full((len(starts), n_max, N_CHANNELS), np.nan, dtype = np.float32)
+    times = np.full((len(starts), n_max), np.nan)
+    for i, p in enumerate(pieces):
+        if counts[i]:
+            data[i, :counts[i]] = np.concatenate([c for c, _ in p])
+            times[i, :counts[i]] = np.concatenate([t for _, t in p]) - starts[i]
+    return data, times, counts
+
+def epoch_trials(glove_fpath, events_fpath, tmin = 0., tmax = None,
+                    chunk_size = 1 << 20):
+    '''
+    Epochs the glove stream by stimulus onset.
+
+    Parameters
+    ----------
+    tmin : float
+        Start of each epoch relative to onset, in seconds.
+    tmax : float | None
+        End of each epoch relative to onset. If None, each epoch lasts until
+        the next event, i.e. for as long as the stimulus was on screen.
+
+    Returns
+    -------
+    data, times, counts : np.ndarray
+        See `epoch`; times are relative to stimulus onset.
+    stimuli : np.ndarray of str
+        Stimulus shown in each trial.
+    '''
+    onsets, names = read_events(events_fpath)
+    trials = names != 'n/a'
+    if tmax is None:
+        ends = np.append(onsets[1:], np.inf)[trials]
+    else:
+        ends = onsets[trials] + tmax
+    data, times, counts = epoch(glove_fpath, onsets[trials] + tmin, ends,
+                                chunk_size)
+    return data, times + tmin, counts, names[trials]
+
+def volume_means(glove_fpath, tr_fpath, chunk_size = 1 << 20):
+    '''
+    Averages the glove channels within each fMRI volume.
+
+    Volume i spans [TR_i, TR_i+1); the last one lasts one median TR.
+
+    Returns
+    -------
+    means : np.ndarray, shape (n_volumes, 14)
+        Mean raw value of each channel (NaN for volumes without samples).
+    counts : np.ndarray, shape (n_volumes,)
+        Number of glove samples in each volume.
+    '''
+    trs = read_TRs(tr_fpath)
+    n_vol = len(trs)
+    if n_vol == 0:
+        return np.zeros((0, N_CHANNELS)), np.zeros(0, dtype = int)
+    last = trs[-1] + (np.median(np.diff(trs)) if n_vol > 1 else np.inf)
+    edges = np.append(trs, last)
+    sums = np.zeros((n_vol, N_CHANNELS))
+    counts = np.zeros(n_vol, dtype = int)
+    for channels, timestamps in iter_glove(glove_fpath, chunk_size):
+        vol = np.searchsorted(edges, timestamps, side = 'right') - 1
+        inside = (vol >= 0) & (vol < n_vol)
+        vol = vol[inside]
+        counts += np.bincount(vol, minlength = n_vol)
+        for j in range(N_CHANNELS):
+            sums[:, j] += np.bincount(vol, weights = channels[inside, j],
+                                        minlength = n_vol)
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        means = sums / counts[:, np.newaxis]
+    return means, counts
+
+
+def _glove_file(run_dir):
+    for name in ('glove.npy', 'glove.dcz', 'glove.tsv'):
+        fpath = os.path.join(run_dir, name)
+        if os.path.exists(fpath):
+            return fpath
+    raise FileNotFoundError('No glove recording in %s.'%run_dir)
+
+def align_run(run_dir, tmin = 0., tmax = None, out_name = 'aligned.npz'):
+    '''
+    Aligns one run and saves the result in the run directory.
+
+    The .npz file contains `trial_data`, `trial_times`, `trial_counts` and
+    `stimuli` (see `epoch_trials`), and `volume_means` and `volume_counts`
+    (see `volume_means`) when the run has a TRs.tsv.
+
+    Returns
+    -------
+    out_fpath : str
+    '''
+    glove_f = _glove_file(run_dir)
+    data, times, counts, stimuli = epoch_trials(
+        glove_f, os.path.join(run_dir, 'events.tsv'), tmin, tmax)
+    out = dict(trial_data = data, trial_times = times,
+                trial_counts = counts, stimuli = stimuli)
+    tr_f = os.path.join(run_dir, 'TRs.tsv')
+    if os.path.exists(tr_f):
+        out['volume_means'], out['volume_counts'] = volume_means(glove_f, tr_f)
+    out_fpath = os.path.join(run_dir, out_name)
+    np.savez(out_fpath, **out)
+    return out_fpath
+
+def find_runs(log_dir):
+    '''
+    Run directories (sub-XX/run-YY) under `log_dir` that have events.
+    '''
+    runs = glob(os.path.join(log_dir, 'sub-*', 'run-*', 'events.tsv'))
+    return sorted(os.path.dirname(f) for f in runs)
+
+def align_runs(run_dirs, n_jobs = None, **kwargs):
+    '''
+    Runs `align_run` on many runs in parallel processes.
+
+    Parameters
+    ----------
+    run_dirs : list of str
+    n_jobs : int | None
+        Number of worker processes; defaults to the number of CPUs.
+    **kwargs
+        Passed to `align_run`.
+
+    Returns
+    -------
+    out_fpaths : list of str
+    '''
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(n_jobs) as pool:
+        futures = [pool.submit(align_run, d, **kwargs) for d in run_dirs]
+        return [f.result() for f in futures]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = __doc__,
+        formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('log_dir', help = 'e.g. logs')
+    parser.add_argument('--jobs', type = int, default = None)
+    parser.add_argument('--tmin', type = float, default = 0.)
+    parser.add_argument('--tmax', type = float, default = None)
+    args = parser.parse_args()
+    runs = find_runs(args.log_dir)
+    for f in align_runs(runs, args.jobs, tmin = args.tmin, tmax = args.tmax):
+        print(f)
@@ -0,0 +1,35 @@
+from importlib import import_module
+
+# backend name -> (module, class); modules are only imported when used,
+# so e.g. the simulated glove never touches the 5DT driver
+BACKENDS = {
+    '5dt': ('.glove', 'FiveDTGlove'),
+    'simulated': ('.simulated', 'SimulatedGlove'),
+}
+
+def load_glove(backend = '5dt', **backend_kwargs):
+    '''
+    Instantiates a glove backend.
+
+    All backends share the interface of `FiveDTGlove` (`open`, `newData`,
+    `getSensorRawAll`, `getPacketRate`, `close`, ...).
+
+    Parameters
+    ----------
+    backend : str | type
+        Either a key of `BACKENDS` ('5dt' for the real glove, 'simulated'
+        for `SimulatedGlove`) or a class implementing the glove interface.
+    **backend_kwargs
+        Passed to the backend's constructor.
+    '''
+    if isinstance(backend, str):
+        try:
+            module, name = BACKENDS[backend]
+        except KeyError:
+            raise ValueError(
+                'Unknown glove backend %r. Available backends are %s.'%(
+                    backend, ', '.join(BACKENDS)
+                    )
+                )
+        backend = getattr(import_module(module, __package__), name)
+    return backend(**backend_kwargs)
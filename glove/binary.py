@@ -0,0 +1,306 @@
+from collections import deque
+from threading import Thread, Event
+import struct
+import os
+
+import numpy as np
+
+_MAGIC = b'\x93NUMPY\x01\x00'
+_ALIGN = 64
+
+
+def glove_dtype(fields, channel_dtype = '<u2', time_field = 'timestamp',
+                    extra_fields = None):
+    '''
+    Structured dtype for one sample: one column per channel plus a timestamp.
+
+    Parameters
+    ----------
+    fields : list of str
+        Channel names, in the order they should be stored.
+    channel_dtype : str
+        Numpy type string shared by all channel columns.
+    time_field : str
+        Name of the float64 timestamp column appended after the channels.
+    extra_fields : list of (str, str) | None
+        (name, type string) of further columns stored after the timestamp,
+        e.g. [('sample', '<u8')].
+    '''
+    return np.dtype(
+        [(f, channel_dtype) for f in fields] + [(time_field, '<f8')]
+        + [tuple(f) for f in (extra_fields or [])]
+        )
+
+
+def _header_size(descr):
+    # leave room for the largest possible row count, so the header
+    # can be rewritten in place without moving any data
+    dummy = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }"%(
+        descr, 2**63
+        )
+    n = len(_MAGIC) + 2 + len(dummy) + 1
+    return n + (-n % _ALIGN)
+
+def _npy_header(descr, n_rows, size):
+    header = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }"%(
+        descr, n_rows
+        )
+    pad = size - len(_MAGIC) - 2 - len(header) - 1
+    header = header + ' '*pad + '\n'
+    return _MAGIC + struct.pack('<H', size - len(_MAGIC) - 2) + header.encode('latin1')
+
+
+class BinaryLogger:
+
+    def __init__(self, fpath, fields, channel_dtype = '<u2',
+                    time_field = 'timestamp', block_size = 4096,
+                    background = False, extra_fields = None):
+        '''
+        Opens a memory-mappable .npy file in which to log fixed-width samples.
+
+        Samples are copied into a preallocated block, which is appended
+        to the file whenever it fills up. The row count in the header is
+        updated after every block, so the file stays readable with
+        `read_binary` while recording continues. (`np.load(fpath,
+        mmap_mode = 'r')` works too, but NumPy >= 1.24 rejects headers over
+        10 kB, i.e. recordings with more than a few hundred columns, unless
+        given a larger `max_header_size`.)
+
+        Parameters
+        ----------
+        fpath : str
+            A valid filepath to write data to.
+        fields : list of str
+            Names of the channel columns, in storage order.
+        channel_dtype : str
+            Numpy type string of the channel columns. Default is uint16,
+            which holds the raw values of the 5DT glove.
+        time_field : str
+            Name of the float64 timestamp column stored after the channels.
+        block_size : int
+            Number of samples buffered in memory between writes.
+        background : bool
+            If True, full blocks are handed to a background writer thread
+            and a fresh block is started, so disk I/O never blocks the
+            caller. `close` waits for everything to be written.
+        extra_fields : list of (str, str) | None
+            Further columns after the timestamp (see `glove_dtype`), whose
+            values are passed to `write_sample` after the timestamp.
+        '''
+        self.extra_fields = [tuple(f) for f in (extra_fields or [])]
+        self.dtype = glove_dtype(fields, channel_dtype, time_field,
+                                    self.extra_fields)
+        self._fields = list(self.dtype.names)
+        self._n_ch = len(fields)
+        self._channel_dtype = np.dtype(channel_dtype)
+        self._time_field = time_field
+        self._block_size = block_size
+        self._descr = np.lib.format.dtype_to_descr(self.dtype)
+        self._header_size = _header_size(self._descr)
+        self._new_block()
+        self.n_rows = 0
+        self._f = open(fpath, 'wb')
+        self._write_header()
+        self.background = background
+        self._closed = False
+        if not background:
+            return
+        self._queue = deque() # appends/pops are atomic, so no lock needed
+        self._wake = Event()
+        self._error = None
+        self._writer = Thread(target = self._write_loop, daemon = True)
+        self._writer.start()
+
+    def _new_block(self):
+        self._block = np.zeros(self._block_size, dtype = self.dtype)
+        # plain 2D view of the channel columns, so a whole sample
+        # can be copied with a single slice assignment
+        self._ch = np.ndarray(
+            shape = (self._block_size, self._n_ch),
+            dtype = self._channel_dtype,
+            buffer = self._block,
+            strides = (self.dtype.itemsize, self._channel_dtype.itemsize)
+            )
+        self._ts = self._block[self._time_field]
+        self._extra = [self._block[name] for name, _ in self.extra_fields]
+        self._i = 0
+
+    def write_sample(self, channels, timestamp, *extra):
+        '''
+        Adds one sample to the current block.
+
+        Parameters
+        ----------
+        channels : sequence
+            Channel values; only the first `len(fields)` are stored, so the
+            20 value array returned by the glove driver can be passed as is.
+        timestamp : float
+        *extra
+            Values of the `extra_fields`, in order.
+        '''
+        i = self._i
+        self._ch[i] = channels[:self._n_ch]
+        self._ts[i] = timestamp
+        for col, value in zip(self._extra, extra):
+            col[i] = value
+        self._i = i + 1
+        if self._i == len(self._block):
+            self.flush()
+
+    def write(self, **params):
+        '''
+        Adds one sample given as keyword arguments, like `TSVLogger.write`.
+        Missing fields are stored as zero.
+        '''
+        self._block[self._i] = tuple(params.get(f, 0) for f in self._fields)
+        self._i += 1
+        if self._i == len(self._block):
+            self.flush()
+
+    def write_block(self, rows):
+        '''
+        Adds many samples at once, e.g. when converting or merging
+        recordings. Samples buffered by `write_sample` are written first.
+
+        Parameters
+        ----------
+        rows : np.ndarray
+            Structured array with the logger's `dtype`.
+        '''
+        if rows.dtype != self.dtype:
+            raise ValueError('Rows have dtype %s, expected %s.'%(
+                rows.dtype, self.dtype))
+        self.flush()
+        if len(rows) == 0:
+            return
+        if self.background: # the caller may reuse `rows`
+            self._queue.append(rows.copy())
+            self._wake.set()
+        else:
+            self._write_block(rows)
+
+    def flush(self):
+        '''
+        Appends buffered samples to the file and updates the header.
+        In background mode, only hands them to the writer thread.
+        '''
+        if self._closed or self._i == 0:
+            return
+        if not self.background:
+            self._write_block(self._block[:self._i])
+            self._i = 0
+            return
+        if self._i == len(self._block):
+            self._queue.append(self._block)
+            self._new_block()
+        else: # keep filling the current block after a partial flush
+            self._queue.append(self._block[:self._i].copy())
+            self._ch = self._ch[self._i:]
+            self._ts = self._ts[self._i:]
+            self._extra = [col[self._i:] for col in self._extra]
+            self._block = self._block[self._i:]
+            self._i = 0
+        self._wake.set()
+
+    def _write_header(self):
+        self._f.write(_npy_header(self._descr, 0, self._header_size))
+
+    def _write_block(self, rows):
+        self._f.write(rows.tobytes())
+        self.n_rows += len(rows)
+        self._f.seek(0)
+        self._f.write(_npy_header(self._descr, self.n_rows, self._header_size))
+        self._f.seek(0, os.SEEK_END)
+        self._f.flush()
+
+    @property
+    def queue_depth(self):
+        '''
+        Number of blocks waiting for the background writer (0 if not
+        in background mode).
+        '''
+        return len(self._queue) if self.background else 0
+
+    def _write_loop(self):
+        stopping = False
+        try:
+            while not stopping:
+                self._wake.wait()
+                self._wake.clear()
+                stopping = self._closed
+                queue = self._queue
+                while queue:
+                    self._write_block(queue.popleft())
+        except Exception as e:
+            self._error = e
+
+    def close(self):
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        if self.background:
+            self._wake.set()
+            self._writer.join()
+        self._f.close()
+        if self.background and self._error is not None:
+            raise self._error
+
+    def __del__(self):
+        if hasattr(self, '_f'):
+            self.close()
+
+
+def read_binary(fpath):
+    '''
+    Memory-maps a recording written by `BinaryLogger`.
+
+    The number of rows is inferred from the file size rather than the
+    header, so recordings that were interrupted before the last header
+    update (e.g. by a crash) are still read up to the last complete sample.
+
+    Returns
+    -------
+    data : np.memmap
+        Structured array with one field per column.
+    '''
+    with open(fpath, 'rb') as f:
+        version = np.lib.format.read_magic(f)
+        read_header = (np.lib.format.read_array_header_1_0 if version == (1, 0)
+                        else np.lib.format.read_array_header_2_0)
+        try: # wide recordings (hundreds of columns) have long headers
+            header = read_header(f, max_header_size = 1 << 20)
+        except TypeError: # NumPy < 1.24 has no limit
+            header = read_header(f)
+        dtype = header[2]
+        offset = f.tell()
+    n_rows = (os.path.getsize(fpath) - offset) // dtype.itemsize
+    if n_rows == 0:
+        return np.zeros(0, dtype = dtype)
+    return np.memmap(fpath, dtype = dtype, mode = 'r',
+                        offset = offset, shape = (n_rows,))
+
+
+def binary_to_tsv(src, dst, chunk_size = 65536):
+    '''
+    Converts a `BinaryLogger` recording to the TSV layout of `TSVLogger`.
+
+    Parameters
+    ----------
+    src : str
+        Path of the .npy recording.
+    dst : str
+        Path of the TSV file to write.
+    chunk_size : int
+        Number of rows converted at a time, which bounds memory use.
+    '''
+    data = read_binary(src)
+    fields = data.dtype.names
+    with open(dst, 'w') as f:
+        f.write('\t'.join(fields))
+        for start in range(0, len(data), chunk_size):
+            chunk = data[start:start + chunk_size]
+            cols = [chunk[field].tolist() for field in fields]
+            f.write(''.join(
+                '\n' + '\t'.join(map(str, row)) for row in zip(*cols)
+                ))
@@ -0,0 +1,167 @@
+'''
+Offline scaling of raw glove recordings.
+
+The driver's scaled values (`getSensorScaledAll`) are the raw values
+mapped linearly from the calibration range [lower, upper] of each sensor
+onto [0, 1], and clipped. With autocalibration on, the driver widens that
+range to the smallest and largest raw value it has received so far,
+before scaling each packet.
+
+This is the scaling described in the 5DT SDK manual. `scale_raw` only
+follows that description: `SimulatedGlove` implements the same formula,
+so agreeing with it says nothing about the real driver, and the two have
+not been compared on a real glove.
+
+The recorder therefore only reads raw values. It stores the calibration
+bounds at the start and end of the recording and the autocalibration
+state in the sidecar, from which `scale_recording` approximates the
+driver's scaled values for the whole recording at once. Under
+autocalibration the approximation breaks down if packets were missed,
+since the driver saw raw values that the recording does not hold;
+`scale_recording` warns when it can tell.
+'''
+import warnings
+
+import numpy as np
+
+from .gaps import read_columns
+from .logging import read_sidecar
+from .readers import read_glove
+
+
+def snapshot_calibration(glove, n_channels = 14):
+    '''
+    Current calibration bounds of an open glove, as JSON-serializable
+    lists.
+    '''
+    upper, lower = glove.getCalibrationAll()
+    return dict(
+        upper = [int(x) for x in upper[:n_channels]],
+        lower = [int(x) for x in lower[:n_channels]],
+        )
+
+def glove_info(glove):
+    '''
+    Identification of an open glove, as JSON-serializable values.
+    '''
+    return dict(
+        info = glove.getGloveInfo(),
+        driver = glove.getDriverInfo(),
+        type = int(glove.getGloveType()),
+        hand = int(glove.getGloveHand()),
+        n_sensors = int(glove.getNumSensors()),
+        )
+
+
+def running_bounds(raw, upper, lower):
+    '''
+    Calibration bounds in effect for each sample under autocalibration:
+    the running maximum and minimum of the raw values, starting from the
+    bounds `upper` and `lower` set before the first sample.
+
+    Returns
+    -------
+    upper, lower : np.ndarray, shape like `raw`
+    '''
+    raw = np.asarray(raw)
+    upper = np.maximum.accumulate(
+        np.vstack([np.asarray(upper, dtype = raw.dtype)[np.newaxis], raw]))[1:]
+    lower = np.minimum.accumulate(
+        np.vstack([np.asarray(lower, dtype = raw.dtype)[np.newaxis], raw]))[1:]
+    return upper, lower
+
+def scale_raw(raw, upper, lower, autocalibrate = False):
+    '''
+    Scales raw values the way the SDK manual describes the driver's
+    `getSensorScaledAll` (not checked against the real driver, see the
+    module docstring).
+
+    Parameters
+    ----------
+    raw : np.ndarray, shape (n_samples, n_channels)
+        Raw values, e.g. from `read_glove`.
+    upper, lower : array-like, shape (n_channels,)
+        Calibration bounds (see `getCalibrationAll`) when the first sample
+        was recorded.
+    autocalibrate : bool
+        Whether autocalibration was on, in which case the bounds follow
+        the running maximum and minimum of `raw` (see `running_bounds`).
+        The driver also widens them for packets that were missed, which
+        `raw` does not hold.
+
+    Returns
+    -------
+    scaled : np.ndarray of float32, shape (n_samples, n_channels)
+    '''
+    raw = np.asarray(raw)
+    if raw.ndim == 1:
+        return scale_raw(raw[np.newaxis], upper, lower, autocalibrate)[0]
+    raw = raw.astype(np.int64)
+    if autocalibrate:
+        upper, lower = running_bounds(raw, upper, lower)
+    upper = np.asarray(upper, dtype = np.int64)
+    lower = np.asarray(lower, dtype = np.int64)
+    span = np.maximum(upper - lower, 1)
+    return np.clip((raw - lower) / span, 0, 1).astype(np.float32)
+
+
+def read_calibration(fpath):
+    '''
+    Calibration stored in the sidecar of a recording, or None.
+    '''
+    return read_sidecar(fpath).get('calibration')
+
+def _n_unrecorded(fpath):
+    '''
+    Packets the driver received but the recording does not hold: those
+    estimated as missed, plus samples lost before they were logged.
+    None if the recording has no 'missed' or 'sample' column.
+    '''
+    cols = read_columns(fpath, ['missed', 'sample'])
+    if not cols:
+        return None
+    n = int(cols['missed'].sum()) if 'missed' in cols else 0
+    if 'sample' in cols:
+        step = np.diff(cols['sample'].astype(np.int64))
+        n += int(np.sum(step[step > 1] - 1))
+    return n
+
+def scale_recording(fpath):
+    '''
+    Approximate scaled values of a whole recording, from its raw values
+    and the calibration in its sidecar (see `scale_raw`).
+
+    Warns if the result is known to differ from what the driver would have
+    reported: under autocalibration when packets are missing from the
+    recording, and whenever the bounds replayed from the recording differ
+    from the driver's at the end of the recording.
+
+    Returns
+    -------
+    scaled : np.ndarray of float32, shape (n_samples, 14)
+    timestamps : np.ndarray, shape (n_samples,)
+    '''
+    calibration = read_calibration(fpath)
+    if calibration is None:
+        raise ValueError('%s has no calibration in its sidecar.'%fpath)
+    raw, timestamps = read_glove(fpath)
+    start = calibration['start']
+    autocalibrate = calibration['autocalibrate']
+    if autocalibrate:
+        n_unrecorded = _n_unrecorded(fpath)
+        if n_unrecorded:
+            warnings.warn('%s is missing %d packets, which may have widened '
+                'the autocalibration bounds in the driver.'%(fpath, n_unrecorded))
+    scaled = scale_raw(raw, start['upper'], start['lower'], autocalibrate)
+    end = calibration.get('end')
+    if end is not None:
+        upper, lower = start['upper'], start['lower']
+        if autocalibrate and len(raw):
+            upper, lower = (b[-1] for b in running_bounds(
+                raw.astype(np.int64), upper, lower))
+        if (not np.array_equal(upper, end['upper'])
+                or not np.array_equal(lower, end['lower'])):
+            warnings.warn('The calibration bounds replayed from %s differ '
+                'from the driver\'s at the end of the recording, so the '
+                'scaled values are off.'%fpath)
+    return scaled, timestamps
@@ -0,0 +1,227 @@
+import numpy as np
+
+from .readers import read_glove, read_events
+
+N_CHANNELS = 14
+
+
+def label_samples(timestamps, event_times, event_names, settle = 1.):
+    '''
+    Labels each glove sample with the stimulus on screen at the time.
+
+    Parameters
+    ----------
+    timestamps : np.ndarray
+        Glove sample times.
+    event_times, event_names : np.ndarray
+        Stimulus onsets and names, as returned by `read_events`.
+    settle : float
+        Seconds after each onset during which the hand is still moving to
+        the new gesture; samples in this window are left unlabeled.
+
+    Returns
+    -------
+    labels : np.ndarray of str
+        Stimulus name of each sample.
+    valid : np.ndarray of bool
+        Samples that fall within a trial and after the settling window.
+    '''
+    idx = np.searchsorted(event_times, timestamps, side = 'right') - 1
+    valid = idx >= 0
+    idx = np.maximum(idx, 0)
+    labels = event_names[idx]
+    valid &= labels != 'n/a'
+    valid &= timestamps - event_times[idx] >= settle
+    return labels, valid
+
+
+class GestureClassifier:
+    '''
+    Classifies hand gestures from the 14 raw glove channels.
+
+    Uses linear discriminant analysis (class means with a shared, shrunk
+    covariance), so inference is one small matrix product per batch and
+    takes the same time for every sample.
+    '''
+
+    def __init__(self, shrinkage = .1):
+        '''
+        Parameters
+        ----------
+        shrinkage : float
+            Between 0 and 1. How far the shared covariance is pulled towards
+            a scaled identity matrix, which keeps it well conditioned when
+            some sensors barely move.
+        '''
+        self.shrinkage = shrinkage
+
+    def fit(self, X, y):
+        '''
+        Parameters
+        ----------
+        X : np.ndarray, shape (n_samples, 14)
+            Raw channel values.
+        y : np.ndarray, shape (n_samples,)
+            Stimulus name of each sample.
+        '''
+        X = np.asarray(X, dtype = float)
+        self.classes_, y_idx = np.unique(y, return_inverse = True)
+        counts = np.bincount(y_idx)
+        means = np.stack([
+            np.bincount(y_idx, weights = X[:, j], minlength = len(counts))
+            for j in range(X.shape[1])
+            ], axis = 1) / counts[:, np.newaxis]
+        resid = X - means[y_idx]
+        cov = resid.T @ resid / max(len(X) - len(self.classes_), 1)
+        target = np.trace(cov) / len(cov) * np.eye(len(cov))
+        cov = (1 - self.shrinkage) * cov + self.shrinkage * target
+        W = np.linalg.solve(cov, means.T) # (n_channels, n_classes)
+        self.coef_ = W
+        self.intercept_ = -.5 * np.sum(means.T * W, axis = 0) \
+                            + np.log(counts / counts.sum())
+        return self
+
+    def fit_sessions(self, sessions, settle = 1.):
+        '''
+        Fits the classifier to previous recordings.
+
+        Parameters
+        ----------
+        sessions : list of (str, str)
+            Pairs of (glove.tsv, events.tsv) paths from the same run.
+        settle : float
+            See `label_samples`.
+        '''
+        X, y = [], []
+        for glove_f, events_f in sessions:
+            channels, timestamps = read_glove(glove_f)
+            labels, valid = label_samples(
+                timestamps, *read_events(events_f), settle = settle)
+            X.append(channels[valid])
+            y.append(labels[valid])
+        return self.fit(np.concatenate(X), np.concatenate(y))
+
+    def predict_proba(self, X):
+        '''
+        Class probabilities, shape (n_samples, n_classes).
+        '''
+        scores = np.asarray(X, dtype = float) @ self.coef_ + self.intercept_
+        scores -= scores.max(axis = 1, keepdims = True)
+        np.exp(scores, out = scores)
+        scores /= scores.sum(axis = 1, keepdims = True)
+        return scores
+
+    def predict(self, X):
+        '''
+        Returns
+        -------
+        labels : np.ndarray of str
+            Most likely stimulus for each sample.
+        confidence : np.ndarray of float
+            Probability of that stimulus.
+        '''
+        proba = self.predict_proba(X)
+        best = proba.argmax(axis = 1)
+        return self.classes_[best], proba[np.arange(len(best)), best]
+
+    def save(self, fpath):
+        np.savez(fpath, classes = self.classes_, coef = self.coef_,
+                    intercept = self.intercept_, shrinkage = self.shrinkage)
+
+    @classmethod
+    def load(cls, fpath):
+        f = np.load(fpath)
+        clf = cls(float(f['shrinkage']))
+        clf.classes_ = f['classes']
+        clf.coef_ = f['coef']
+        clf.intercept_ = f['intercept']
+        return clf
+
+
+def _channel_matrix(rows):
+    '''
+    (n_samples, 14) view of the channel fields of a structured glove array.
+    '''
+    if rows.flags['C_CONTIGUOUS']: # channels are the leading uint16 fields
+        return np.ndarray(shape = (len(rows), N_CHANNELS), dtype = np.uint16,
+            buffer = rows, strides = (rows.dtype.itemsize, 2))
+    names = rows.dtype.names
+    return np.stack([rows[ch] for ch in names[:N_CHANNELS]], axis = 1)
+
+
+class StreamingClassifier:
+    '''
+    Runs a fitted `GestureClassifier` on the live glove stream.
+
+    Usage:
+    stream = StreamingClassifier(GestureClassifier.load('model.npz'))
+    stream.set_target('stimuli/image_1.jpeg')
+    ...
+    stream.update(glove_recorder.read_new())
+    stream.prediction, stream.confidence, stream.accuracy
+    '''
+
+    def __init__(self, classifier, settle = 1.):
+        '''
+        Parameters
+        ----------
+        classifier : GestureClassifier
+        settle : float
+            Seconds after `set_target` during which samples are not scored.
+        '''
+        self.classifier = classifier
+        self.settle = settle
+        self.prediction = None
+        self.confidence = float('nan')
+        self.set_target(None)
+
+    def set_target(self, target, timestamp = None):
+        '''
+        Sets the stimulus the participant is asked to mimic, and resets the
+        accuracy counters.
+
+        Parameters
+        ----------
+        target : str | None
+        timestamp : float | None
+            Onset of the stimulus; samples before `timestamp + settle` are
+            not scored. If None, all subsequent samples are scored.
+        '''
+        self.target = target
+        self._score_from = -np.inf if timestamp is None else timestamp + self.settle
+        self.n_scored = 0
+        self.n_correct = 0
+
+    @property
+    def accuracy(self):
+        '''
+        Fraction of scored samples since `set_target` that matched it.
+        '''
+        return self.n_correct / self.n_scored if self.n_scored else float('nan')
+
+    def update(self, rows):
+        '''
+        Classifies a batch of new samples.
+
+        Parameters
+        ----------
+        rows : np.ndarray
+            Structured array with one field per channel plus 'timestamp',
+            as returned by `GloveRecorder.read_new`.
+
+        Returns
+        -------
+        labels, confidence : np.ndarray
+            See `GestureClassifier.predict`.
+        '''
+        if len(rows) == 0:
+            return self.classifier.classes_[:0], np.zeros(0)
+        X = _channel_matrix(rows)
+        labels, confidence = self.classifier.predict(X)
+        self.prediction = labels[-1]
+        self.confidence = float(confidence[-1])
+        if self.target is not None:
+            scored = rows['timestamp'] >= self._score_from
+            self.n_scored += int(scored.sum())
+            self.n_correct += int((labels[scored] == self.target).sum())
+        return labels, confidence
@@ -0,0 +1,124 @@
+from time import perf_counter, perf_counter_ns, get_clock_info
+import ctypes
+import time
+import os
+
+
+class WinClock:
+	'''
+	provides more precise time than built-in time.time() for Windows
+	'''
+	def __init__(self):
+		if not hasattr(ctypes, 'WinDLL'):
+			# elsewhere perf_counter is CLOCK_MONOTONIC, which already
+			# has the same zero in every process
+			self.time = perf_counter
+			return
+		from ctypes import wintypes
+		kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+		kernel32.QueryPerformanceFrequency.argtypes = (
+			wintypes.PLARGE_INTEGER,) # lpFrequency
+		kernel32.QueryPerformanceCounter.argtypes = (
+			wintypes.PLARGE_INTEGER,) # lpPerformanceCount
+		_qpc_frequency = wintypes.LARGE_INTEGER()
+		if not kernel32.QueryPerformanceFrequency(ctypes.byref(_qpc_frequency)):
+			raise ctypes.WinError(ctypes.get_last_error())
+		self._qpc_frequency = _qpc_frequency.value
+		self._k32 = kernel32
+		# allocate the output once instead of on every call
+		self._count = wintypes.LARGE_INTEGER()
+		self._count_ref = ctypes.byref(self._count)
+		self._qpc = kernel32.QueryPerformanceCounter
+
+	def time(self):
+		if not self._qpc(self._count_ref):
+			raise ctypes.WinError(ctypes.get_last_error())
+		return self._count.value / self._qpc_frequency
+
+	def time_ns(self):
+		'''
+		Raw counter in integer nanoseconds, used as `Clock`'s reference.
+		'''
+		if not self._qpc(self._count_ref):
+			raise ctypes.WinError(ctypes.get_last_error())
+		return self._count.value * 10**9 // self._qpc_frequency
+
+
+def _reference():
+	'''
+	Returns a (name, function) pair for a counter that reads the same in
+	every process on this machine, in integer nanoseconds.
+	'''
+	if hasattr(ctypes, 'WinDLL'):
+		return 'QueryPerformanceCounter', WinClock().time_ns
+	if hasattr(time, 'CLOCK_MONOTONIC'):
+		return 'CLOCK_MONOTONIC', lambda: time.clock_gettime_ns(time.CLOCK_MONOTONIC)
+	return 'monotonic', time.monotonic_ns
+
+
+class Clock:
+	'''
+	Cheap monotonic clock with the same zero in every process.
+
+	`time.perf_counter` is the cheapest precise clock, but in Python 3.9 on
+	Windows its zero differs between processes. At start-up, `Clock` measures
+	the offset between `perf_counter_ns` and a counter that is shared across
+	processes (QueryPerformanceCounter on Windows, CLOCK_MONOTONIC elsewhere).
+	After that, each reading costs a single `perf_counter_ns` call.
+	Times are in seconds on the reference counter's timebase, so they line up
+	with recordings made with `WinClock`.
+	'''
+
+	def __init__(self, n_calibration = 1000):
+		'''
+		Parameters
+		----------
+		n_calibration : int
+			Number of paired readings used to estimate the offset; the pair
+			with the tightest bracket is kept.
+		'''
+		self.reference, self._reference_ns = _reference()
+		self.calibrate(n_calibration)
+
+	def calibrate(self, n = 1000):
+		'''
+		(Re-)estimates the offset of this process's `perf_counter_ns`
+		from the shared reference counter, and the cost of `time`.
+		'''
+		ref = self._reference_ns
+		best = None
+		for _ in range(n):
+			before = perf_counter_ns()
+			t_ref = ref()
+			after = perf_counter_ns()
+			if best is None or after - before < best[0]:
+				best = (after - before, t_ref - (before + after) // 2)
+		self.uncertainty_ns = best[0] / 2
+		self.offset_ns = best[1]
+		if abs(self.offset_ns) <= self.uncertainty_ns:
+			# perf_counter already is the shared counter (e.g. on Linux),
+			# so skip the offset arithmetic altogether
+			self.time = perf_counter
+		else:
+			offset = self.offset_ns
+			def clock_time():
+				return (perf_counter_ns() + offset) * 1e-9
+			self.time = clock_time
+		clock_time = self.time
+		t0 = perf_counter_ns()
+		for _ in range(n):
+			clock_time()
+		self.read_overhead_ns = (perf_counter_ns() - t0) / n
+
+	def metadata(self):
+		'''
+		Calibration results, to be stored with a recording.
+		'''
+		return dict(
+			reference = self.reference,
+			offset_ns = self.offset_ns,
+			offset_uncertainty_ns = self.uncertainty_ns,
+			read_overhead_ns = self.read_overhead_ns,
+			resolution_s = get_clock_info('perf_counter').resolution,
+			pid = os.getpid()
+			)
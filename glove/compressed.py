@@ -0,0 +1,287 @@
+'''
+Delta-compressed, chunked storage for glove recordings (.dcz).
+
+Layout: the magic bytes b'DCZ1', a uint32 header length and a JSON header
+(column names and types, codec), followed by independent chunks. Each
+chunk starts with a fixed-size header (number of rows, first and last
+timestamp, payload size) and holds
+
+- each channel column, delta-encoded in wrapping unsigned arithmetic, and
+- the timestamps, delta-encoded as the int64 bit patterns of the float64s,
+
+byte-shuffled (all low bytes, then all high bytes) and compressed with a
+standard library codec. Every transform is exactly invertible, so a
+recording converts back to the same TSV byte for byte.
+'''
+from concurrent.futures import ThreadPoolExecutor
+import bz2
+import json
+import lzma
+import struct
+import zlib
+import os
+
+import numpy as np
+
+from .binary import BinaryLogger, glove_dtype
+
+_MAGIC = b'DCZ1'
+_CHUNK = struct.Struct('<IddQ') # n_rows, t_first, t_last, payload bytes
+
+# codec name -> (compress(data, level), decompress(data), default level)
+CODECS = {
+    'zlib': (lambda b, level: zlib.compress(b, level), zlib.decompress, 6),
+    'lzma': (lambda b, level: lzma.compress(b, preset = level), lzma.decompress, 6),
+    'bz2': (lambda b, level: bz2.compress(b, level), bz2.decompress, 9),
+}
+
+
+def _uint(dtype):
+    '''
+    Unsigned integer type of the same width, to delta-encode any column.
+    '''
+    return np.dtype('<u%d'%np.dtype(dtype).itemsize)
+
+def _encode_column(x):
+    x = np.ascontiguousarray(x).view(_uint(x.dtype))
+    delta = np.empty_like(x)
+    delta[0] = x[0]
+    np.subtract(x[1:], x[:-1], out = delta[1:]) # wraps around
+    # byte planes compress much better than interleaved bytes
+    return delta.view(np.uint8).reshape(len(x), -1).T.tobytes()
+
+def _decode_column(buf, n, dtype):
+    dtype = np.dtype(dtype)
+    planes = np.frombuffer(buf, dtype = np.uint8).reshape(dtype.itemsize, n)
+    delta = np.ascontiguousarray(planes.T).view(_uint(dtype)).ravel()
+    return np.cumsum(delta, dtype = delta.dtype).view(dtype)
+
+
+def read_header(f):
+    '''
+    Reads the JSON header of an open .dcz file, leaving `f` at the first chunk.
+    '''
+    if f.read(4) != _MAGIC:
+        raise ValueError('Not a .dcz recording.')
+    (n,) = struct.unpack('<I', f.read(4))
+    return json.loads(f.read(n).decode('utf8'))
+
+def _dtype(header):
+    return glove_dtype(header['fields'], header['channel_dtype'],
+                        header['time_field'], header.get('extra_fields'))
+
+
+class CompressedLogger(BinaryLogger):
+
+    def __init__(self, fpath, fields, channel_dtype = '<u2',
+                    time_field = 'timestamp', block_size = 4096,
+                    background = True, codec = 'zlib', level = None,
+                    extra_fields = None):
+        '''
+        Logs fixed-width samples to a delta-compressed .dcz file.
+
+        Works like `BinaryLogger`, except that each block of samples is
+        written as one compressed chunk. Chunks are self-contained, so the
+        file can be read up to the last complete chunk while recording
+        continues, or after a crash.
+
+        Parameters
+        ----------
+        fpath, fields, channel_dtype, time_field, block_size, extra_fields
+            See `BinaryLogger`.
+        background : bool
+            Compress and write chunks in a background thread. Default True,
+            so compression never stalls acquisition.
+        codec : str
+            'zlib' (fast), 'lzma' (smallest) or 'bz2'.
+        level : int | None
+            Compression level, or the codec's default.
+        '''
+        if codec not in CODECS:
+            raise ValueError('Unknown codec %r. Available codecs are %s.'%(
+                codec, ', '.join(CODECS)))
+        self.codec = codec
+        self._compress = CODECS[codec][0]
+        self.level = CODECS[codec][2] if level is None else level
+        super().__init__(fpath, fields, channel_dtype, time_field,
+                            block_size, background, extra_fields)
+
+    def _write_header(self):
+        header = json.dumps(dict(
+            fields = self._fields[:self._n_ch],
+            channel_dtype = self._channel_dtype.str,
+            time_field = self._time_field,
+            extra_fields = self.extra_fields,
+            codec = self.codec,
+            level = self.level,
+            )).encode('utf8')
+        self._f.write(_MAGIC + struct.pack('<I', len(header)) + header)
+
+    def _write_block(self, rows):
+        if len(rows) == 0:
+            return
+        payload = self._compress(b''.join(
+            _encode_column(rows[name]) for name in self._fields
+            ), self.level)
+        ts = rows[self._time_field]
+        self._f.write(
+            _CHUNK.pack(len(rows), ts[0], ts[-1], len(payload)) + payload
+            )
+        self.n_rows += len(rows)
+        self._f.flush()
+
+
+def chunk_table(fpath):
+    '''
+    Lists the complete chunks of a .dcz recording without decompressing them.
+
+    Returns
+    -------
+    header : dict
+    chunks : np.ndarray
+        Structured array with one row per chunk: 'offset' of its payload in
+        the file, 'nbytes', 'n_rows', 'start' (index of its first row),
+        't_first' and 't_last'.
+    '''
+    rows = []
+    start = 0
+    size = os.path.getsize(fpath)
+    with open(fpath, 'rb') as f:
+        header = read_header(f)
+        while True:
+            buf = f.read(_CHUNK.size)
+            if len(buf) < _CHUNK.size:
+                break
+            n_rows, t_first, t_last, nbytes = _CHUNK.unpack(buf)
+            offset = f.tell()
+            if offset + nbytes > size: # cut off mid-chunk
+                break
+            rows.append((offset, nbytes, n_rows, start, t_first, t_last))
+            start += n_rows
+            f.seek(nbytes, os.SEEK_CUR)
+    chunks = np.array(rows, dtype = [('offset', '<i8'), ('nbytes', '<i8'),
+        ('n_rows', '<i8'), ('start', '<i8'), ('t_first', '<f8'), ('t_last', '<f8')])
+    return header, chunks
+
+def _decode_chunk(f, chunk, dtype, decompress, out):
+    f.seek(chunk['offset'])
+    raw = decompress(f.read(chunk['nbytes']))
+    n = len(out)
+    pos = 0
+    for name in dtype.names:
+        size = n * dtype[name].itemsize
+        out[name] = _decode_column(raw[pos:pos + size], n, dtype[name])
+        pos += size
+
+def read_chunks(fpath, chunks = None, n_jobs = None, header = None):
+    '''
+    Decompresses a .dcz recording, or some of its chunks, in parallel.
+
+    Parameters
+    ----------
+    fpath : str
+    chunks : np.ndarray | None
+        Rows of `chunk_table(fpath)` to read (all if None).
+    n_jobs : int | None
+        Number of decompression threads; the codecs release the GIL.
+    header : dict | None
+        The file's header, if already known (see `chunk_table`).
+
+    Returns
+    -------
+    data : np.ndarray
+        Structured array with one field per column, like `read_binary`.
+    '''
+    if chunks is None:
+        header, chunks = chunk_table(fpath)
+    elif header is None:
+        with open(fpath, 'rb') as f:
+            header = read_header(f)
+    dtype = _dtype(header)
+    decompress = CODECS[header['codec']][1]
+    out = np.empty(int(chunks['n_rows'].sum()), dtype = dtype)
+    ends = np.cumsum(chunks['n_rows'])
+    def decode(i):
+        with open(fpath, 'rb') as f:
+            _decode_chunk(f, chunks[i], dtype, decompress,
+                            out[ends[i] - chunks['n_rows'][i]:ends[i]])
+    if len(chunks) <= 1:
+        for i in range(len(chunks)):
+            decode(i)
+        return out
+    with ThreadPoolExecutor(n_jobs) as pool:
+        list(pool.map(decode, range(len(chunks))))
+    return out
+
+def read_compressed(fpath, n_jobs = None):
+    '''
+    Reads a whole .dcz recording; see `read_chunks`.
+    '''
+    return read_chunks(fpath, n_jobs = n_jobs)
+
+def iter_compressed(fpath):
+    '''
+    Yields the chunks of a .dcz recording one at a time, as structured arrays.
+    '''
+    header, table = chunk_table(fpath)
+    dtype = _dtype(header)
+    decompress = CODECS[header['codec']][1]
+    with open(fpath, 'rb') as f:
+        for chunk in table:
+            out = np.empty(int(chunk['n_rows']), dtype = dtype)
+            _decode_chunk(f, chunk, dtype, decompress, out)
+            yield out
+
+
+def tsv_to_compressed(src, dst, codec = 'zlib', level = None,
+                        block_size = 4096):
+    '''
+    Converts a glove.tsv recording to .dcz. `compressed_to_tsv` gives back
+    the same file.
+
+    Columns after 'timestamp' (e.g. 'sample' and 'missed') are kept as
+    extra fields, typed as pandas parses them.
+    '''
+    import pandas as pd
+    with open(src) as f:
+        header = f.readline().rstrip('\n').split('\t')
+    time_field = 'timestamp' if 'timestamp' in header else header[-1]
+    i = header.index(time_field)
+    fields, extra = header[:i], header[i + 1:]
+    reader = pd.read_csv(src, sep = '\t', chunksize = block_size,
+        dtype = dict.fromkeys(fields, np.uint16),
+        float_precision = 'round_trip')
+    log = None
+    for df in reader:
+        if log is None:
+            log = CompressedLogger(dst, fields, time_field = time_field,
+                block_size = block_size, background = False,
+                codec = codec, level = level,
+                extra_fields = [(name, df[name].dtype.str) for name in extra])
+        rows = np.empty(len(df), dtype = log.dtype)
+        for name in header:
+            rows[name] = df[name].to_numpy()
+        log.write_block(rows)
+    if log is None: # header only
+        log = CompressedLogger(dst, fields, time_field = time_field,
+            background = False, codec = codec, level = level,
+            extra_fields = [(name, '<f8') for name in extra] or None)
+    log.close()
+
+def compressed_to_tsv(src, dst):
+    '''
+    Converts a .dcz recording to the TSV layout of `TSVLogger`.
+    '''
+    with open(dst, 'w') as f:
+        first = True
+        for chunk in iter_compressed(src):
+            if first:
+                f.write('\t'.join(chunk.dtype.names))
+                first = False
+            cols = [chunk[field].tolist() for field in chunk.dtype.names]
+            f.write(''.join(
+                '\n' + '\t'.join(map(str, row)) for row in zip(*cols)
+                ))
+        if first: # no complete chunk yet
+            header, _ = chunk_table(src)
+            f.write('\t'.join(_dtype(header).names))
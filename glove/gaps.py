@@ -0,0 +1,243 @@
+'''
+Sample counters and gap checks for glove recordings.
+
+Every logged glove sample carries two extra columns:
+
+- 'sample' counts the samples the recorder took from the driver, and so
+  goes up by exactly one per sample. Samples lost on the way to the file
+  (e.g. dropped by a full queue in callback mode) show up as jumps.
+- 'missed' is the number of packets the glove sent before this sample
+  that the recorder never read. The driver does not number its packets,
+  so this is estimated from the time since the previous sample and the
+  packet rate (see `GapEstimator`).
+
+Timestamps are taken when a sample is read, not when the packet arrived,
+so 'missed' is only an estimate: a read delayed by more than half a packet
+period counts as a missed packet. It is never negative, even if the clock
+steps back, and is 0 until the driver reports a packet rate.
+
+`check_logs` checks every recording in a logs/ tree, e.g. to reject bad
+runs before analysis:
+    python -m glove.gaps logs --max-missed .01 --max-gap .5
+'''
+from glob import glob
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+from .binary import read_binary
+from .compressed import read_compressed
+from .logging import read_sidecar
+from .readers import _read_tsv
+
+# extra columns stored after the timestamp of each sample
+SEQUENCE_FIELDS = [('sample', '<u8'), ('missed', '<u4')]
+
+
+class GapEstimator:
+    '''
+    Estimates the packets missed before each sample as it is logged.
+
+    Usage:
+    gaps = GapEstimator(glove.getPacketRate)
+    n_missed = gaps(timestamp)
+    '''
+
+    def __init__(self, packet_rate, refresh_interval = 1.):
+        '''
+        Parameters
+        ----------
+        packet_rate : float | callable
+            Nominal packet rate in Hz, or a function returning it (e.g.
+            `glove.getPacketRate`). The driver only knows the rate once
+            packets come in, so the function is called with the first
+            sample and then at most once every `refresh_interval` seconds
+            (of sample time).
+        '''
+        self._rate_func = packet_rate if callable(packet_rate) else None
+        self.refresh_interval = refresh_interval
+        self._refresh_at = -np.inf
+        self.set_rate(None if callable(packet_rate) else packet_rate)
+        self._t_prev = None
+
+    def set_rate(self, rate):
+        self.rate = rate
+        self._period = 1. / rate if rate else None
+
+    def __call__(self, t):
+        '''
+        Number of packets missed between the previous sample and the one
+        with timestamp `t`.
+        '''
+        if self._rate_func is not None and t >= self._refresh_at:
+            self.set_rate(self._rate_func())
+            self._refresh_at = t + self.refresh_interval
+        t_prev = self._t_prev
+        self._t_prev = t
+        if t_prev is None or self._period is None:
+            return 0
+        missed = int((t - t_prev) / self._period + .5) - 1
+        return missed if missed > 0 else 0
+
+
+def sequence_numbers(timestamps, rate):
+    '''
+    Estimated packet number of each sample of a whole recording: it goes
+    up by the number of packet periods since the previous sample, so
+    missed packets show up as jumps and duplicate reads of a packet as
+    repeated numbers.
+
+    Returns
+    -------
+    seq : np.ndarray
+    missed : np.ndarray
+        Packets missed before each sample, as `GapEstimator` counts them.
+    '''
+    timestamps = np.asarray(timestamps, dtype = float)
+    steps = np.ones(len(timestamps), dtype = np.int64)
+    if rate and len(timestamps) > 1:
+        steps[1:] = np.floor(np.diff(timestamps) * rate + .5)
+    steps[0] = 0
+    np.maximum(steps, 0, out = steps) # backward clock steps
+    return np.cumsum(steps), np.maximum(steps - 1, 0)
+
+
+def read_columns(fpath, columns):
+    '''
+    Some columns of a glove recording (.tsv, .npy or .dcz), as a dict of
+    arrays. Columns the recording does not have are left out.
+    '''
+    if fpath.endswith(('.npy', '.dcz')):
+        data = read_binary(fpath) if fpath.endswith('.npy') else read_compressed(fpath)
+        return {name: np.asarray(data[name]) for name in columns
+                if name in data.dtype.names}
+    with open(fpath) as f:
+        header = f.readline().rstrip('\n').split('\t')
+    columns = [name for name in columns if name in header]
+    df = _read_tsv(fpath, columns)
+    return {name: df[name].to_numpy() for name in columns}
+
+def read_timestamps(fpath):
+    '''
+    Timestamps of a glove recording (.tsv, .npy or .dcz).
+    '''
+    return read_columns(fpath, ['timestamp'])['timestamp'].astype(float)
+
+def check_timestamps(timestamps, rate = None):
+    '''
+    Gap statistics of one recording.
+
+    Parameters
+    ----------
+    timestamps : np.ndarray
+    rate : float | None
+        Nominal packet rate; estimated from the median sample interval
+        if not given.
+
+    Returns
+    -------
+    stats : dict
+    '''
+    t = np.asarray(timestamps, dtype = float)
+    dt = np.diff(t)
+    if rate is None or rate <= 0:
+        rate = 1. / np.median(dt) if len(dt) and np.median(dt) > 0 else float('nan')
+    seq, missed = sequence_numbers(t, rate if np.isfinite(rate) else None)
+    n_expected = int(seq[-1]) + 1 if len(seq) else 0
+    duplicates = int(np.sum(np.diff(seq) == 0))
+    gaps = missed > 0
+    return dict(
+        samples = int(len(t)),
+        duration_s = float(t[-1] - t[0]) if len(t) else 0.,
+        nominal_rate = float(rate),
+        logged_rate = float((len(t) - 1) / (t[-1] - t[0])) if len(t) > 1 and t[-1] > t[0] else float('nan'),
+        gaps = int(gaps.sum()),
+        missed = int(missed.sum()),
+        missed_fraction = float(missed.sum() / n_expected) if n_expected else 0.,
+        duplicates = int(duplicates),
+        max_gap_s = float(dt.max()) if len(dt) else 0.,
+        max_gap_at = float(t[1:][np.argmax(dt)]) if len(dt) else float('nan'),
+        non_monotonic = int(np.sum(dt < 0)),
+        )
+
+def check_recording(fpath, max_missed = .01, max_gap = .5):
+    '''
+    `check_timestamps` for one file, using the packet rate stored in its
+    sidecar, plus an 'ok' verdict: at most `max_missed` of the packets
+    missed, no interval longer than `max_gap` seconds, and timestamps that
+    never go backwards.
+
+    If the recording has a 'sample' counter, the stats also hold 'lost',
+    the samples that were read from the driver but never logged, and
+    'counter_errors', the number of times the counter did not go up
+    (which fails the check).
+    '''
+    cols = read_columns(fpath, ['timestamp', 'sample'])
+    stats = check_timestamps(cols['timestamp'].astype(float),
+                                read_sidecar(fpath).get('packet_rate'))
+    stats['fpath'] = fpath
+    counter_errors = 0
+    if 'sample' in cols:
+        step = np.diff(cols['sample'].astype(np.int64))
+        stats['lost'] = int(np.sum(step[step > 1] - 1))
+        counter_errors = stats['counter_errors'] = int(np.sum(step < 1))
+    stats['ok'] = bool(stats['samples'] > 1
+        and stats['missed_fraction'] <= max_missed
+        and stats['max_gap_s'] <= max_gap
+        and stats['non_monotonic'] == 0
+        and counter_errors == 0)
+    return stats
+
+def find_recordings(log_dir):
+    '''
+    Glove recordings (one per device) under `log_dir`. Merged multi-glove
+    recordings are skipped, since their samples interleave several
+    devices; their per-device parts are checked instead.
+    '''
+    found = []
+    for ext in ('tsv', 'npy', 'dcz'):
+        found += glob(os.path.join(log_dir, '**', 'glove*.%s'%ext),
+                        recursive = True)
+    return sorted(f for f in found if 'devices' not in read_sidecar(f))
+
+def check_logs(log_dir, n_jobs = None, **kwargs):
+    '''
+    Runs `check_recording` on every recording under `log_dir`, in parallel.
+
+    Returns
+    -------
+    results : list of dict
+    '''
+    fpaths = find_recordings(log_dir)
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(n_jobs) as pool:
+        futures = [pool.submit(check_recording, f, **kwargs) for f in fpaths]
+        return [f.result() for f in futures]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = __doc__,
+        formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('log_dir', help = 'e.g. logs')
+    parser.add_argument('--max-missed', type = float, default = .01,
+        help = 'largest acceptable fraction of missed packets')
+    parser.add_argument('--max-gap', type = float, default = .5,
+        help = 'longest acceptable interval between samples, in seconds')
+    parser.add_argument('--jobs', type = int, default = None)
+    parser.add_argument('--json', default = None,
+        help = 'save the full report to this file')
+    args = parser.parse_args()
+    results = check_logs(args.log_dir, args.jobs,
+                            max_missed = args.max_missed, max_gap = args.max_gap)
+    for r in results:
+        print('%-4s %-50s %8d samples  %6.2f%% missed in %d gaps (max %.3f s)  %d duplicates  %s lost'%(
+            'ok' if r['ok'] else 'BAD', r['fpath'], r['samples'],
+            100 * r['missed_fraction'], r['gaps'], r['max_gap_s'], r['duplicates'],
+            r.get('lost', 'n/a')))
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent = 2)
+    sys.exit(0 if all(r['ok'] for r in results) else 1)
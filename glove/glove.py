@@ -1,12 +1,9 @@
 from os.path import join, dirname, realpath
-import ctypes.wintypes as wintypes
 from ctypes import *
 import sys 
 import os
 
-## make sure Python knows where to look for glove driver
 this_dir = dirname(realpath(__file__))
-os.add_dll_directory(this_dir)
 
 
 class FiveDTGlove:
@@ -75,14 +72,35 @@ class FiveDTGlove:
         '''
 
         self._as_parameter_ = 5
-        
+
+        ## make sure Python knows where to look for glove driver
+        ## (done here rather than at import, so the package imports off Windows)
+        if hasattr(os, 'add_dll_directory'):
+            os.add_dll_directory(this_dir)
         self.gloveDLL = cdll.LoadLibrary("fglove64")
         self.gloveDLL.fdOpen.restype = c_int64
         self.gloveDLL.fdClose.argtypes = [c_int64]
-        self.gloveDLL.fdGetSensorRawAll.argtypes = [c_int64]
+        # buffers are passed as void pointers, so that ctypes arrays and
+        # the addresses of NumPy arrays can both be filled in place
+        self.gloveDLL.fdGetSensorRawAll.argtypes = [c_int64, c_void_p]
+        self.gloveDLL.fdGetSensorScaledAll.argtypes = [c_int64, c_void_p]
+        self.gloveDLL.fdGetCalibrationAll.argtypes = [c_int64, c_void_p, c_void_p]
+        self.gloveDLL.fdGetThresholdAll.argtypes = [c_int64, c_void_p, c_void_p]
+        self.gloveDLL.fdGetNumSensors.argtypes = [c_int64]
         self.gloveDLL.fdGetNumSensors.restype = c_int64
+        # queried when a recording starts (see `glove.calibration`)
+        self.gloveDLL.fdGetAutoCalibrate.argtypes = [c_int64]
+        self.gloveDLL.fdGetAutoCalibrate.restype = c_bool
+        self.gloveDLL.fdSetAutoCalibrate.argtypes = [c_int64, c_bool]
+        self.gloveDLL.fdResetCalibrationAll.argtypes = [c_int64]
+        self.gloveDLL.fdGetGloveInfo.argtypes = [c_int64, c_void_p]
+        self.gloveDLL.fdGetDriverInfo.argtypes = [c_int64, c_void_p]
         self.gloveDLL.fdNewData.argtypes = [c_int64]
         self.gloveDLL.fdNewData.restype = c_bool
+        self.gloveDLL.fdGetGloveHand.argtypes = [c_int64]
+        self.gloveDLL.fdGetGloveType.argtypes = [c_int64]
+        self.gloveDLL.fdGetPacketRate.argtypes = [c_int64]
+        self.gloveDLL.fdGetPacketRate.restype = c_int
 
         if self.gloveDLL == None:
             raise IOError("Could not open fglove.dll")
@@ -118,14 +136,68 @@ class FiveDTGlove:
         """Get the number of sensors on the Glove."""
         return self.gloveDLL.fdGetNumSensors(self.glovePntr)
 
-    def getSensorRawAll(self):
-        """Get a list of all the current raw sensor values."""
+    def getSensorRawAll(self, out=None):
+        """Get a list of all the current raw sensor values.
+
+        out: optional preallocated buffer of at least 20 unsigned shorts
+        (c_ushort array, or contiguous uint16 NumPy array). If given, it is
+        filled in place and returned, and nothing is allocated.
+
+        """
+        if out is not None:
+            self.gloveDLL.fdGetSensorRawAll(self.glovePntr, self._buffer(out, c_ushort))
+            return out
         arrTypeUShortArray20 = c_ushort*20
         sensorRawValues = arrTypeUShortArray20()
         self.gloveDLL.fdGetSensorRawAll(self.glovePntr, sensorRawValues)
         #numSensors = self.gloveDLL.fdGetNumSensors(self.glovePntr)
         return list(sensorRawValues)
 
+    def getSensorRawBlock(self, block, timestamps=None, clock=None, stop_event=None):
+        """Fill consecutive rows of a preallocated block with new samples.
+
+        block: C-contiguous uint16 NumPy array of shape (n_samples, >= 20).
+        timestamps: optional float array of length n_samples, filled with
+        clock() right after each sample is read, as the recorder does.
+        stop_event: optional event that ends the read early when set.
+
+        Waits for new data before each row. Returns the number of rows filled.
+
+        """
+        self._check_array(block[0], c_ushort)
+        if timestamps is not None and clock is None:
+            raise ValueError("A clock is needed to fill timestamps")
+        addr = block.ctypes.data
+        stride = block.strides[0]
+        newData = self.gloveDLL.fdNewData
+        read = self.gloveDLL.fdGetSensorRawAll
+        pntr = self.glovePntr
+        for i in range(len(block)):
+            while not newData(pntr):
+                if stop_event is not None and stop_event.is_set():
+                    return i
+            read(pntr, addr + i*stride)
+            if timestamps is not None:
+                timestamps[i] = clock()
+        return len(block)
+
+    _NUMPY_CHARS = {c_ushort: 'H', c_float: 'f'}
+
+    def _check_array(self, arr, ctype):
+        """Make sure a NumPy array can hold 20 values of the given C type."""
+        if (arr.dtype.char != self._NUMPY_CHARS[ctype] or arr.size < 20
+                or not arr.flags['C_CONTIGUOUS']):
+            raise ValueError("Buffer must be a contiguous array of at least 20 %s"%ctype.__name__)
+
+    def _buffer(self, out, ctype):
+        """Return something the DLL can write 20 values of ctype into."""
+        if isinstance(out, Array):
+            if out._type_ is not ctype or len(out) < 20:
+                raise ValueError("Buffer must be an array of at least 20 %s"%ctype.__name__)
+            return out
+        self._check_array(out, ctype)
+        return out.ctypes.data
+
     def getSensorRaw(self, nSensor):
         """Get a single raw sensor value, with index defined by argument 'nSensor'"""
         sensorVal = c_ushort(0)
@@ -134,8 +206,16 @@ class FiveDTGlove:
         sensorVal = funct(self.glovePntr, nSensor)
         return sensorVal
 
-    def getSensorScaledAll(self):
-        """Get a list of all the current scaled sensor values."""
+    def getSensorScaledAll(self, out=None):
+        """Get a list of all the current scaled sensor values.
+
+        out: optional preallocated buffer of at least 20 floats (c_float
+        array or contiguous float32 NumPy array), filled in place and returned.
+
+        """
+        if out is not None:
+            self.gloveDLL.fdGetSensorScaledAll(self.glovePntr, self._buffer(out, c_float))
+            return out
         arrTypeFloatArray20 = c_float*20
         sensorRawValues = arrTypeFloatArray20()     
         self.gloveDLL.fdGetSensorScaledAll(self.glovePntr, sensorRawValues)          
@@ -170,11 +250,18 @@ class FiveDTGlove:
         self.gloveDLL.fdGetCalibration(self.glovePntr, nSensor, pointer(calibrationUpper), pointer(calibrationLower))
         return [calibrationUpper.value, calibrationLower.value]    
 
-    def getCalibrationAll(self):
+    def getCalibrationAll(self, upper=None, lower=None):
         """Get all the calibration information.
         Return a list of 2 lists: [list_of_upper_vals, list_of_lower_vals]
+
+        upper, lower: optional preallocated unsigned short buffers (see
+        getSensorRawAll). If given, they are filled in place and returned.
         
         """
+        if upper is not None and lower is not None:
+            self.gloveDLL.fdGetCalibrationAll(self.glovePntr,
+                self._buffer(upper, c_ushort), self._buffer(lower, c_ushort))
+            return [upper, lower]
         arrTypeUShortArray20 = c_ushort*20
         calibrationUpper = arrTypeUShortArray20()           
         calibrationLower = arrTypeUShortArray20()        
@@ -189,8 +276,17 @@ class FiveDTGlove:
         """Reset the calibration of all the sensors."""
         self.gloveDLL.fdResetCalibrationAll(self.glovePntr)
 
-    def getThresholdAll(self):
-        """Get the current gesture recognition threshold settings of the driver."""
+    def getThresholdAll(self, upper=None, lower=None):
+        """Get the current gesture recognition threshold settings of the driver.
+
+        upper, lower: optional preallocated float buffers (see
+        getSensorScaledAll). If given, they are filled in place and returned.
+
+        """
+        if upper is not None and lower is not None:
+            self.gloveDLL.fdGetThresholdAll(self.glovePntr,
+                self._buffer(upper, c_float), self._buffer(lower, c_float))
+            return [upper, lower]
         arrTypeFloatArray20 = c_float*20
         thresholdUpper = arrTypeFloatArray20()           
         thresholdLower = arrTypeFloatArray20()        
@@ -238,30 +334,28 @@ class FiveDTGlove:
         self.gloveDLL.fdGetDriverInfo(self.glovePntr, byref(charBuffer))
         return str(charBuffer.value)
 
-    def _set_callback_func(self):
-        def function(call):
-            print('new sample')
-        CMPFUNC = CFUNCTYPE(None, wintypes.LPVOID)
-        func = CMPFUNC(function)
-        self.gloveDLL.fdSetCallback.argtypes = [c_int64, POINTER(CMPFUNC), wintypes.LPVOID]
-        self.gloveDLL.fdSetCallback(self.glovePntr, byref(func), wintypes.LPVOID(None)) 
-        
+    # driver callbacks have the form void func(LPVOID param); LPVOID is c_void_p
+    CALLBACK = CFUNCTYPE(None, c_void_p)
 
     def setCallback(self, function):
         """Set the callback function.
 
-        This function will be called each time the driver receives new data.
+        This function will be called, without arguments and from a driver
+        thread, each time the driver receives new data.
 
         """
-        CMPFUNC = CFUNCTYPE(c_bool, wintypes.LPVOID)
-        func = CMPFUNC(function)
-        ptr = c_void_p(pointer(self))
-        self.gloveDLL.fdSetCallback(self.glovePntr, func, wintypes.LPVOID(None))    
+        # keep a reference to the C function pointer for as long as the
+        # driver may call it, otherwise it gets garbage collected
+        self._callback = self.CALLBACK(lambda param: function())
+        self.gloveDLL.fdSetCallback.argtypes = [c_int64, self.CALLBACK, c_void_p]
+        self.gloveDLL.fdSetCallback(self.glovePntr, self._callback, None)
         return
 
     def removeCallback(self):
         """Remove the current callback function."""
+        self.gloveDLL.fdRemoveCallback.argtypes = [c_int64]
         self.gloveDLL.fdRemoveCallback(self.glovePntr)
+        self._callback = None
         return
 
     def getPacketRate(self):
@@ -0,0 +1,187 @@
+'''
+Random access by time into glove recordings.
+
+`TimeIndex` finds the samples in any [t0, t1) window with a binary search,
+reading only the part of the file that holds them:
+
+- .npy recordings are memory-mapped and searched directly,
+- .dcz recordings are searched through their chunk table, and only the
+  chunks that overlap the window are decompressed, and
+- .tsv recordings get a sparse index (the byte offset and timestamp of
+  every `stride`-th line), built with one pass over the file.
+
+The chunk table and sparse index are cached beside the recording (e.g.
+glove.tsv.index.npz), and rebuilt when the recording changes.
+'''
+from io import BytesIO
+import os
+
+import numpy as np
+
+from .binary import read_binary
+from .compressed import chunk_table, read_chunks, read_header
+from .readers import _channel_names
+
+
+def _tsv_index(fpath, stride, block_size = 1 << 24):
+    '''
+    Byte offset and timestamp of every `stride`-th line of a TSV recording.
+    '''
+    with open(fpath, 'rb') as f:
+        header = f.readline()
+        t_idx = header.rstrip(b'\n').split(b'\t').index(b'timestamp')
+        starts = [len(header)] # line starts, sampled every `stride` lines
+        n_lines = 1 # lines seen so far, counting the one at `len(header)`
+        pos = len(header)
+        while True:
+            buf = f.read(block_size)
+            if not buf:
+                break
+            newlines = np.flatnonzero(np.frombuffer(buf, dtype = np.uint8) == 10)
+            # line `k` starts after newline `k - 1` (within the data)
+            first = (-n_lines) % stride
+            starts.extend((newlines[first::stride] + pos + 1).tolist())
+            n_lines += len(newlines)
+            pos += len(buf)
+        offsets = np.array(starts[:-1] if starts[-1] >= pos else starts,
+                            dtype = np.int64)
+        times = np.empty(len(offsets))
+        for i, offset in enumerate(offsets.tolist()):
+            f.seek(offset)
+            times[i] = float(f.readline().split(b'\t')[t_idx])
+    return offsets, times
+
+
+class TimeIndex:
+    '''
+    Usage:
+    index = TimeIndex('logs/sub-01/run-01/glove.tsv')
+    channels, timestamps = index.window(t0, t1)
+    for channels, timestamps in index.windows(onsets, onsets + 5.):
+        ...
+    '''
+
+    def __init__(self, fpath, stride = 4096, cache = True):
+        '''
+        Parameters
+        ----------
+        fpath : str
+            A glove.tsv, .npy or .dcz recording.
+        stride : int
+            For .tsv, number of lines between entries of the sparse index;
+            each window read parses at most about 2 * `stride` extra lines.
+        cache : bool
+            Whether to save the index beside the recording and reuse it.
+        '''
+        self.fpath = fpath
+        self.stride = stride
+        self._cache = cache
+        self._ch_names = _channel_names()
+        self.refresh()
+
+    @property
+    def cache_fpath(self):
+        return self.fpath + '.index.npz'
+
+    def _stamp(self):
+        st = os.stat(self.fpath)
+        return np.array([st.st_size, st.st_mtime_ns], dtype = np.int64)
+
+    def _load_cache(self, stamp):
+        if not (self._cache and os.path.exists(self.cache_fpath)):
+            return None
+        with np.load(self.cache_fpath) as cached:
+            if not np.array_equal(cached['stamp'], stamp):
+                return None
+            if int(cached['stride']) != self.stride:
+                return None
+            return {k: cached[k] for k in cached.files}
+
+    def refresh(self):
+        '''
+        (Re-)reads the index, e.g. after the recording has grown.
+        '''
+        self._data = None
+        if self.fpath.endswith('.npy'):
+            self._data = read_binary(self.fpath)
+            self._times = self._data['timestamp']
+            return
+        stamp = self._stamp()
+        cached = self._load_cache(stamp)
+        if self.fpath.endswith('.dcz'):
+            if cached is None:
+                self._header, chunks = chunk_table(self.fpath)
+                cached = dict(chunks = chunks)
+            else:
+                with open(self.fpath, 'rb') as f:
+                    self._header = read_header(f)
+            self._chunks = cached['chunks']
+        else:
+            if cached is None:
+                offsets, times = _tsv_index(self.fpath, self.stride)
+                cached = dict(offsets = offsets, times = times)
+            self._offsets = cached['offsets']
+            self._times = cached['times']
+            self._size = int(stamp[0])
+            with open(self.fpath) as f:
+                self._columns = f.readline().rstrip('\n').split('\t')
+        if self._cache and 'stamp' not in cached:
+            np.savez(self.cache_fpath, stamp = stamp, stride = self.stride,
+                        **cached)
+
+    def _structured(self, rows):
+        channels = np.stack([rows[ch] for ch in self._ch_names], axis = 1)
+        return channels, np.asarray(rows['timestamp'])
+
+    def window(self, t0, t1):
+        '''
+        Samples with t0 <= timestamp < t1.
+
+        Returns
+        -------
+        channels : np.ndarray, shape (n_samples, 14)
+            Raw values, with columns in the order of `CH_NAMES`.
+        timestamps : np.ndarray, shape (n_samples,)
+        '''
+        if self._data is not None: # .npy
+            lo, hi = np.searchsorted(self._times, [t0, t1], side = 'left')
+            return self._structured(self._data[lo:hi])
+        if self.fpath.endswith('.dcz'):
+            return self._window_dcz(t0, t1)
+        return self._window_tsv(t0, t1)
+
+    def _window_dcz(self, t0, t1):
+        chunks = self._chunks
+        first = np.searchsorted(chunks['t_last'], t0, side = 'left')
+        last = np.searchsorted(chunks['t_first'], t1, side = 'left')
+        rows = read_chunks(self.fpath, chunks[first:max(first, last)],
+                            header = self._header)
+        lo, hi = np.searchsorted(rows['timestamp'], [t0, t1], side = 'left')
+        return self._structured(rows[lo:hi])
+
+    def _window_tsv(self, t0, t1):
+        import pandas as pd
+        first = max(np.searchsorted(self._times, t0, side = 'right') - 1, 0)
+        last = np.searchsorted(self._times, t1, side = 'left')
+        start = self._offsets[first] if len(self._offsets) else self._size
+        end = self._offsets[last] if last < len(self._offsets) else self._size
+        with open(self.fpath, 'rb') as f:
+            f.seek(start)
+            buf = f.read(end - start)
+        if not buf.strip():
+            return (np.zeros((0, len(self._ch_names)), dtype = np.uint16),
+                    np.zeros(0))
+        df = pd.read_csv(BytesIO(buf), sep = '\t', header = None,
+            names = self._columns, usecols = self._ch_names + ['timestamp'],
+            dtype = dict.fromkeys(self._ch_names, np.uint16),
+            float_precision = 'round_trip')
+        times = df['timestamp'].to_numpy()
+        lo, hi = np.searchsorted(times, [t0, t1], side = 'left')
+        return df[self._ch_names].to_numpy()[lo:hi], times[lo:hi]
+
+    def windows(self, starts, ends):
+        '''
+        Iterates over `window(starts[i], ends[i])` for each i.
+        '''
+        for t0, t1 in zip(starts, ends):
+            yield self.window(t0, t1)
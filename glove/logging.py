@@ -1,8 +1,46 @@
+from collections import deque
+from threading import Thread, Event
+from time import perf_counter
+import json
 import os
 
+def write_sidecar(fpath, **metadata):
+    '''
+    Adds metadata to the JSON sidecar of a log file, i.e. the file with the
+    same name and a .json extension (glove.json for glove.tsv). Existing
+    keys that are not given are kept.
+
+    Parameters
+    ----------
+    fpath : str
+        Path of the log file the metadata describe.
+    **metadata
+        JSON-serializable values to store.
+    '''
+    sidecar = os.path.splitext(fpath)[0] + '.json'
+    contents = dict()
+    if os.path.exists(sidecar):
+        with open(sidecar) as f:
+            contents = json.load(f)
+    contents.update(metadata)
+    with open(sidecar, 'w') as f:
+        json.dump(contents, f, indent = 2)
+
+def read_sidecar(fpath):
+    '''
+    Metadata in the JSON sidecar of a log file (see `write_sidecar`), or
+    an empty dict if it has none.
+    '''
+    sidecar = os.path.splitext(fpath)[0] + '.json'
+    if not os.path.exists(sidecar):
+        return dict()
+    with open(sidecar) as f:
+        return json.load(f)
+
 class TSVLogger:
 
-    def __init__(self, fpath, fields):
+    def __init__(self, fpath, fields, buffered = False,
+                    flush_rows = None, flush_bytes = None, flush_ms = None):
         '''
         Opens a TSV file in which to log data.
 
@@ -12,27 +50,131 @@ class TSVLogger:
             A valid filepath to write data to.
         fields : list of str
             Names of fields (columns) to be included in the log file.
+        buffered : bool
+            If True, `write` only queues the row, and formatting and disk
+            I/O happen in a background writer thread. Rows are written to
+            disk according to the flush policy below, and `close` drains
+            everything that is still queued. Default False, which writes
+            each row to the file as soon as it comes in.
+        flush_rows : int | None
+            Buffered mode only. Write once this many rows are pending.
+        flush_bytes : int | None
+            Buffered mode only. Write once this many bytes of formatted
+            text are pending.
+        flush_ms : float | None
+            Buffered mode only. Write at least every `flush_ms` milliseconds.
+            If no flush policy is given, defaults to 250 ms.
         '''
         self._f = open(fpath, 'w')
         self._fields = fields
         self._f.write('\t'.join(self._fields))
+        # compile the line template once instead of on every write
+        self._format = ('\n' + '\t'.join(['{}'] * len(fields))).format
+        self._closed = False
+        self.buffered = buffered
+        if not buffered:
+            return
+        if flush_rows is None and flush_bytes is None and flush_ms is None:
+            flush_ms = 250
+        self._flush_rows = flush_rows
+        self._flush_bytes = flush_bytes
+        self._flush_ms = flush_ms
+        self._queue = deque() # appends/pops are atomic, so no lock needed
+        self._wake = Event()
+        self._error = None
+        self._writer = Thread(target = self._write_loop, daemon = True)
+        self._writer.start()
+
+    def _line(self, params):
+        if isinstance(params, dict):
+            return self._format(*[
+                params[field] if field in params else 'n/a'
+                for field in self._fields
+                ])
+        return self._format(*params)
 
     def write(self, **params):
         '''
         Adds data to the TSV file line-by-line.
         '''
-        vals = dict()
-        for field in self._fields:
-            if field in params:
-                vals[field] = params[field]
-            else:
-                vals[field] = 'n/a'
-        boilerplate = '\n' + '\t'.join(['{%s}'%key for key in self._fields])
-        line = boilerplate.format(**vals)
-        self._f.write(line)
+        if self.buffered:
+            self._enqueue(params)
+        else:
+            self._f.write(self._line(params))
+
+    def write_row(self, values):
+        '''
+        Adds a line from a sequence of values given in the order of `fields`,
+        which skips building a dict for every line.
+        '''
+        if self.buffered:
+            self._enqueue(values)
+        else:
+            self._f.write(self._format(*values))
+
+    def _enqueue(self, item):
+        self._queue.append(item)
+        if (self._flush_rows is not None and not self._wake.is_set()
+                and len(self._queue) >= self._flush_rows):
+            self._wake.set()
+
+    @property
+    def queue_depth(self):
+        '''
+        Number of rows waiting for the background writer (0 if unbuffered).
+        '''
+        return len(self._queue) if self.buffered else 0
+
+    def _write_loop(self):
+        if self._flush_ms is not None:
+            timeout = self._flush_ms / 1000
+        else: # still wake up now and then to check the byte policy
+            timeout = .05
+        lines = []
+        n_bytes = 0
+        last_flush = perf_counter()
+        stopping = False
+        try:
+            while not stopping:
+                self._wake.wait(timeout)
+                self._wake.clear()
+                stopping = self._closed
+                queue = self._queue
+                while queue:
+                    line = self._line(queue.popleft())
+                    lines.append(line)
+                    n_bytes += len(line)
+                if not lines:
+                    continue
+                due = (
+                    stopping
+                    or (self._flush_rows is not None
+                        and len(lines) >= self._flush_rows)
+                    or (self._flush_bytes is not None
+                        and n_bytes >= self._flush_bytes)
+                    or (self._flush_ms is not None
+                        and (perf_counter() - last_flush) * 1000 >= self._flush_ms)
+                    )
+                if due:
+                    self._f.write(''.join(lines))
+                    self._f.flush()
+                    lines = []
+                    n_bytes = 0
+                    last_flush = perf_counter()
+        except Exception as e:
+            self._error = e
 
     def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self.buffered:
+            self._wake.set()
+            self._writer.join()
         self._f.close()
+        if self.buffered and self._error is not None:
+            raise self._error
 
     def __del__(self):
-        self.close()
+        if hasattr(self, '_f'):
+            self.close()
@@ -0,0 +1,154 @@
+from heapq import merge
+import numpy as np
+
+from .binary import read_binary
+from .compressed import CompressedLogger, iter_compressed, read_header
+from .logging import read_sidecar, write_sidecar
+
+
+def _tsv_rows(fpath, device):
+    '''
+    Yields (timestamp, line) for each sample of a TSV recording, with the
+    device name appended to the line.
+    '''
+    with open(fpath) as f:
+        header = f.readline().rstrip('\n').split('\t')
+        t_idx = header.index('timestamp')
+        for line in f:
+            line = line.rstrip('\n')
+            if line:
+                yield float(line.split('\t')[t_idx]), '%s\t%s'%(line, device)
+
+def _merge_tsv(parts, dst, devices):
+    headers = []
+    for fpath in parts:
+        with open(fpath) as f:
+            headers.append(f.readline().rstrip('\n'))
+    if len(set(headers)) > 1:
+        raise ValueError('Recordings to merge have different columns.')
+    rows = merge(
+        *[_tsv_rows(fpath, dev) for fpath, dev in zip(parts, devices)],
+        key = lambda row: row[0]
+        )
+    with open(dst, 'w') as f:
+        f.write(headers[0] + '\tdevice')
+        for t, line in rows:
+            f.write('\n' + line)
+
+def _chunks(data, chunk_size):
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+def _merge_chunks(parts):
+    '''
+    Interleaves time-ordered recordings by timestamp, a few chunks at a time.
+
+    Parameters
+    ----------
+    parts : list of iterators
+        Chunks (structured arrays with a 'timestamp' field) of each part.
+
+    Yields
+    ------
+    rows : np.ndarray
+        The rows of all parts up to the earliest last timestamp among their
+        current chunks, ordered by time.
+    device : np.ndarray of uint16
+        Index into `parts` of each row.
+    '''
+    parts = [iter(p) for p in parts]
+    def next_chunk(i):
+        for chunk in parts[i]:
+            if len(chunk):
+                return chunk
+        return None
+    pending = [next_chunk(i) for i in range(len(parts))]
+    while True:
+        live = [i for i, chunk in enumerate(pending) if chunk is not None]
+        if not live:
+            return
+        cutoff = min(pending[i]['timestamp'][-1] for i in live)
+        rows, device = [], []
+        for i in live:
+            chunk = pending[i]
+            n = np.searchsorted(chunk['timestamp'], cutoff, side = 'right')
+            rows.append(chunk[:n])
+            device.append(np.full(n, i, dtype = np.uint16))
+            pending[i] = chunk[n:] if n < len(chunk) else next_chunk(i)
+        rows = np.concatenate(rows)
+        device = np.concatenate(device)
+        order = np.argsort(rows['timestamp'], kind = 'stable')
+        yield rows[order], device[order]
+
+def _merge_compressed(parts, dst, devices):
+    headers = []
+    for fpath in parts:
+        with open(fpath, 'rb') as f:
+            headers.append(read_header(f))
+    columns = set((tuple(h['fields']), h['channel_dtype'], h['time_field'],
+                    str(h.get('extra_fields'))) for h in headers)
+    if len(columns) > 1:
+        raise ValueError('Recordings to merge have different columns.')
+    header = headers[0]
+    log = CompressedLogger(dst, header['fields'] + ['device'],
+        channel_dtype = header['channel_dtype'],
+        time_field = header['time_field'], background = False,
+        codec = header['codec'], level = header['level'],
+        extra_fields = header.get('extra_fields'))
+    for rows, device in _merge_chunks([iter_compressed(p) for p in parts]):
+        chunk = np.empty(len(rows), dtype = log.dtype)
+        for name in rows.dtype.names:
+            chunk[name] = rows[name]
+        chunk['device'] = device
+        log.write_block(chunk)
+    log.close()
+
+def _merge_binary(parts, dst, devices, chunk_size = 65536):
+    data = [read_binary(fpath) for fpath in parts] # memory-mapped
+    if len(set(d.dtype for d in data)) > 1:
+        raise ValueError('Recordings to merge have different columns.')
+    dtype = np.dtype(data[0].dtype.descr + [('device', '<u2')])
+    out = np.lib.format.open_memmap(dst, mode = 'w+', dtype = dtype,
+                                        shape = (sum(len(d) for d in data),))
+    start = 0
+    for rows, device in _merge_chunks([_chunks(d, chunk_size) for d in data]):
+        chunk = out[start:start + len(rows)]
+        for name in rows.dtype.names:
+            chunk[name] = rows[name]
+        chunk['device'] = device
+        start += len(rows)
+    out.flush()
+    del out
+
+
+def merge_recordings(parts, dst, devices):
+    '''
+    Interleaves recordings from several gloves into one, ordered by time.
+
+    All parts must have been timestamped with the same clock (see `Clock`),
+    and each must be in time order, as recorded. They are merged a chunk at
+    a time, so memory use does not grow with their length.
+    TSV recordings get an extra 'device' column holding the device name.
+    In .npy and .dcz recordings, 'device' holds the index into `devices`
+    (uint16, stored as the last channel in .dcz, so there it has the type
+    of the other channels), and the names are stored in the JSON sidecar
+    of `dst`, along with the sidecar of each part (clock calibration etc.)
+    under 'device_metadata'.
+
+    Parameters
+    ----------
+    parts : list of str
+        Per-device recordings, all .tsv, all .npy or all .dcz.
+    dst : str
+        Path of the merged recording.
+    devices : list of str
+        Device name of each part.
+    '''
+    if dst.endswith('.npy'):
+        _merge_binary(parts, dst, devices)
+    elif dst.endswith('.dcz'):
+        _merge_compressed(parts, dst, devices)
+    else:
+        _merge_tsv(parts, dst, devices)
+    write_sidecar(dst, devices = list(devices), device_metadata = {
+        dev: read_sidecar(fpath) for dev, fpath in zip(devices, parts)})
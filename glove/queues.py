@@ -0,0 +1,54 @@
+from collections import deque
+
+
+class SampleQueue:
+    '''
+    Bounded single-producer, single-consumer sample queue.
+
+    Meant to hand samples from the glove driver's callback thread to a
+    writer. `deque.append` and `deque.popleft` are atomic, so neither side
+    ever takes a lock. When the writer falls behind and the queue is full,
+    new samples are dropped (and counted) rather than blocking the driver.
+    '''
+
+    def __init__(self, maxsize = 65536):
+        '''
+        Parameters
+        ----------
+        maxsize : int
+            Maximum number of samples held before new ones are dropped.
+        '''
+        self.maxsize = maxsize
+        self._q = deque()
+        self.n_pushed = 0
+        self.n_dropped = 0
+        self.max_depth = 0
+
+    def push(self, item):
+        '''
+        Adds an item, or drops it if the queue is full.
+
+        Returns
+        -------
+        accepted : bool
+        '''
+        depth = len(self._q)
+        if depth >= self.maxsize:
+            self.n_dropped += 1
+            return False
+        self._q.append(item)
+        self.n_pushed += 1
+        if depth >= self.max_depth:
+            self.max_depth = depth + 1
+        return True
+
+    def drain(self):
+        '''
+        Yields queued items, oldest first, until the queue is empty.
+        '''
+        popleft = self._q.popleft
+        while self._q:
+            yield popleft()
+
+    def __len__(self):
+        return len(self._q)
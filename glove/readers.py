@@ -0,0 +1,96 @@
+import numpy as np
+
+from .binary import read_binary
+from .compressed import read_compressed, iter_compressed
+
+
+def _channel_names():
+    from . import CH_NAMES
+    return sorted(CH_NAMES, key = lambda ch: CH_NAMES[ch])
+
+def _read_tsv(fpath, columns, dtype = None):
+    import pandas as pd
+    return pd.read_csv(fpath, sep = '\t', usecols = columns,
+                        dtype = dtype, na_values = ['n/a'],
+                        float_precision = 'round_trip')
+
+def read_glove(fpath):
+    '''
+    Reads a glove recording written by `GloveRecorder`.
+
+    Parameters
+    ----------
+    fpath : str
+        A glove.tsv, .npy or .dcz recording.
+
+    Returns
+    -------
+    channels : np.ndarray, shape (n_samples, 14)
+        Raw values, with columns in the order of `CH_NAMES`.
+    timestamps : np.ndarray, shape (n_samples,)
+    '''
+    ch_names = _channel_names()
+    if fpath.endswith(('.npy', '.dcz')):
+        if fpath.endswith('.npy'):
+            data = read_binary(fpath)
+        else:
+            data = read_compressed(fpath)
+        channels = np.stack([data[ch] for ch in ch_names], axis = 1)
+        return channels, np.asarray(data['timestamp'])
+    df = _read_tsv(fpath, ch_names + ['timestamp'],
+                    dict.fromkeys(ch_names, np.uint16))
+    return df[ch_names].to_numpy(), df['timestamp'].to_numpy()
+
+def iter_glove(fpath, chunk_size = 1 << 20):
+    '''
+    Reads a glove recording in chunks, so memory use does not grow with
+    the length of the recording.
+
+    Yields
+    ------
+    channels : np.ndarray, shape (<= chunk_size, 14)
+    timestamps : np.ndarray
+    '''
+    ch_names = _channel_names()
+    if fpath.endswith('.npy'):
+        data = read_binary(fpath)
+        for start in range(0, len(data), chunk_size):
+            chunk = data[start:start + chunk_size]
+            channels = np.stack([chunk[ch] for ch in ch_names], axis = 1)
+            yield channels, np.asarray(chunk['timestamp'])
+        return
+    if fpath.endswith('.dcz'):
+        for chunk in iter_compressed(fpath):
+            for start in range(0, len(chunk), chunk_size):
+                part = chunk[start:start + chunk_size]
+                channels = np.stack([part[ch] for ch in ch_names], axis = 1)
+                yield channels, part['timestamp']
+        return
+    import pandas as pd
+    reader = pd.read_csv(fpath, sep = '\t', usecols = ch_names + ['timestamp'],
+        dtype = dict.fromkeys(ch_names, np.uint16), chunksize = chunk_size,
+        float_precision = 'round_trip')
+    for df in reader:
+        yield df[ch_names].to_numpy(), df['timestamp'].to_numpy()
+
+def read_events(fpath):
+    '''
+    Reads an events.tsv written by `experiment.py`.
+
+    Returns
+    -------
+    timestamps : np.ndarray
+        Onset of each event.
+    names : np.ndarray of str
+        Stimulus shown at each onset; 'n/a' marks the end of the last trial.
+    '''
+    df = _read_tsv(fpath, ['timestamp', 'target_position'],
+                    {'target_position': str})
+    names = df['target_position'].fillna('n/a').to_numpy(dtype = str)
+    return df['timestamp'].to_numpy(dtype = float), names
+
+def read_TRs(fpath):
+    '''
+    Reads the TR onsets from a TRs.tsv written by `TRSync`.
+    '''
+    return _read_tsv(fpath, ['timestamp'])['timestamp'].to_numpy(dtype = float)
@@ -0,0 +1,438 @@
+from multiprocessing import Process, Event
+from os.path import splitext
+from time import perf_counter
+import json
+import os
+
+import numpy as np
+
+from . import CH_NAMES
+from .glove import FiveDTGlove
+from .backends import load_glove
+from .logging import TSVLogger, write_sidecar
+from .clock import Clock
+from .binary import BinaryLogger, glove_dtype
+from .compressed import CompressedLogger
+from .telemetry import Telemetry, stats_path
+from .gaps import SEQUENCE_FIELDS, GapEstimator
+from .calibration import snapshot_calibration, glove_info
+from .queues import SampleQueue
+from .shared import SharedRing
+from .merge import merge_recordings
+
+def pin_to_cpu(cpu):
+	'''
+	Restricts the current process to one CPU core, if the OS supports it.
+	Returns whether the process was pinned.
+	'''
+	if hasattr(os, 'sched_setaffinity'):
+		os.sched_setaffinity(0, {cpu})
+		return True
+	try: # Windows has no sched_setaffinity, but psutil can do it there
+		import psutil
+	except ImportError:
+		return False
+	psutil.Process().cpu_affinity([cpu])
+	return True
+
+
+def record_from_glove(stop_event, glove_output, glove_port, fmt = 'tsv',
+						buffered = True, backend = '5dt', backend_kwargs = None,
+						mode = 'poll', queue_size = 65536, drain_interval = .005,
+						live_buffer = None, cpu = None, telemetry_interval = None,
+						telemetry_every = 64):
+	if mode not in ('poll', 'callback'):
+		raise ValueError("mode must be 'poll' or 'callback', got %r"%mode)
+	if cpu is not None and not pin_to_cpu(cpu):
+		print('Cannot pin glove recorder to CPU %d on this system.'%cpu)
+	glove = load_glove(backend, **(backend_kwargs or {}))
+	glove.open(glove_port)
+	ch_names = [key for key in CH_NAMES]
+	ch_names.sort(key = lambda ch: CH_NAMES[ch])
+	n_ch = len(ch_names)
+	# every sample also gets its number among the samples read from the
+	# driver and the number of packets missed before it (see `glove.gaps`)
+	gaps = GapEstimator(glove.getPacketRate)
+	if fmt in ('npy', 'dcz'):
+		Logger = BinaryLogger if fmt == 'npy' else CompressedLogger
+		log = Logger(glove_output, ch_names, extra_fields = SEQUENCE_FIELDS)
+		def write(vals, t, sample):
+			log.write_sample(vals, t, sample, gaps(t))
+	elif fmt == 'tsv':
+		log = TSVLogger(glove_output,
+			ch_names + ['timestamp'] + [name for name, _ in SEQUENCE_FIELDS],
+			buffered = buffered, flush_ms = 200)
+		def write(vals, t, sample):
+			row = vals[:n_ch].tolist()
+			row.append(t)
+			row.append(sample)
+			row.append(gaps(t))
+			log.write_row(row)
+	else:
+		raise ValueError("fmt must be 'tsv', 'npy' or 'dcz', got %r"%fmt)
+	if live_buffer is not None: # also publish samples to the parent process
+		ring = SharedRing(name = live_buffer, fields = ch_names)
+		log_write = write
+		def write(vals, t, sample):
+			log_write(vals, t, sample)
+			ring.write_sample(vals, t)
+	clock = Clock()
+	# only raw values are recorded; keep what is needed to scale them
+	# offline like the driver does (see `scale_recording`)
+	calibration = dict(
+		autocalibrate = bool(glove.getAutoCalibrate()),
+		start = snapshot_calibration(glove, n_ch)
+		)
+	write_sidecar(glove_output, clock = clock.metadata(),
+		glove = glove_info(glove), calibration = calibration)
+	telemetry = None
+	if telemetry_interval is not None:
+		telemetry = Telemetry(stats_path(glove_output), telemetry_interval,
+			recording = glove_output, port = glove_port, mode = mode, fmt = fmt)
+		if hasattr(log, 'queue_depth'):
+			telemetry.gauge('writer_queue_depth', lambda: log.queue_depth)
+		telemetry.start()
+	if mode == 'poll':
+		vals = np.zeros(20, dtype = np.uint16) # reused for every sample
+		n = 0
+		while not stop_event.is_set():
+			is_new_data = glove.newData()
+			if is_new_data:
+				# with telemetry, every `telemetry_every`th sample is timed, so
+				# the instrumentation costs next to nothing
+				timed = telemetry is not None and n % telemetry_every == 0
+				if timed:
+					t0 = perf_counter()
+				glove.getSensorRawAll(vals)
+				t = clock.time()
+				if timed:
+					t1 = perf_counter()
+				write(vals, t, n)
+				n += 1
+				if telemetry is not None:
+					telemetry.tick(t)
+					if timed:
+						telemetry.latency('read', t1 - t0)
+						telemetry.latency('write', perf_counter() - t1)
+						telemetry.set_rate(gaps.rate)
+	else: # driver pushes samples, we sleep in between draining them
+		queue = SampleQueue(queue_size)
+		def on_new_data():
+			t = clock.time()
+			# numbered before the push, so samples dropped by a full queue
+			# leave a gap in the numbers
+			sample = queue.n_pushed + queue.n_dropped
+			queue.push((glove.getSensorRawAll(np.empty(20, dtype = np.uint16)),
+						t, sample))
+		if telemetry is not None:
+			telemetry.gauge('sample_queue_depth', queue.__len__)
+			telemetry.gauge('sample_queue_dropped', lambda: queue.n_dropped)
+		glove.setCallback(on_new_data)
+		while not stop_event.wait(drain_interval):
+			t = None
+			for vals, t, sample in queue.drain():
+				write(vals, t, sample)
+				if telemetry is not None:
+					telemetry.tick(t)
+			if telemetry is not None:
+				if t is not None:
+					# how long the last sample of this drain waited to be logged
+					telemetry.latency('queue', clock.time() - t)
+				telemetry.set_rate(gaps.rate)
+		glove.removeCallback()
+		for vals, t, sample in queue.drain():
+			write(vals, t, sample)
+			if telemetry is not None:
+				telemetry.tick(t)
+		if queue.n_dropped:
+			print('Glove recorder dropped %d of %d samples (queue full).'%(
+				queue.n_dropped, queue.n_dropped + queue.n_pushed))
+	log.close()
+	# nominal rate for offline gap checks (see `check_recording`), and the
+	# bounds autocalibration ended up with
+	calibration['end'] = snapshot_calibration(glove, n_ch)
+	write_sidecar(glove_output, packet_rate = glove.getPacketRate(),
+		calibration = calibration)
+	if telemetry is not None:
+		telemetry.close()
+	if live_buffer is not None:
+		ring.close()
+	glove.close()
+
+
+class GloveRecorder:
+
+	def __init__(self, rec_fpath, port = 'USB0', fmt = 'tsv', buffered = True,
+					backend = '5dt', backend_kwargs = None, mode = 'poll',
+					live_capacity = 4096, cpu = None, telemetry_interval = None):
+		'''
+		Records raw glove data in a separate process.
+
+		Parameters
+		----------
+		rec_fpath : str
+			File to record to.
+		port : str
+			Port the glove is connected to, e.g. 'USB0'.
+		fmt : {'tsv', 'npy', 'dcz'}
+			'tsv' writes one text line per sample with `TSVLogger`.
+			'npy' writes fixed-width binary samples with `BinaryLogger`,
+			which can be converted to the TSV layout with `binary_to_tsv`.
+			'dcz' writes delta-compressed chunks with `CompressedLogger`,
+			several times smaller than either; see `compressed_to_tsv`.
+		buffered : bool
+			For 'tsv', whether lines are formatted and written by a
+			background thread (see `TSVLogger`) rather than the polling loop.
+		backend : str | type
+			Glove backend, see `load_glove`. Use 'simulated' to record
+			from a `SimulatedGlove` when no glove is connected.
+		backend_kwargs : dict | None
+			Keyword arguments for the backend, e.g. `dict(rate = 1000)`.
+		mode : {'poll', 'callback'}
+			'poll' busy-waits on `newData`, which keeps a core fully busy.
+			'callback' lets the driver push each packet into a `SampleQueue`
+			that is drained every few milliseconds, so the recorder is idle
+			between packets. Samples are dropped (and counted) if the writer
+			cannot keep up.
+		live_capacity : int
+			Number of recent samples kept in shared memory for `latest` and
+			`iter_new` while recording. Set to 0 to disable.
+		cpu : int | None
+			CPU core to pin the recording process to, if any.
+		telemetry_interval : float | None
+			If given, the recorder publishes live statistics (driver packet
+			rate, logged rate, missed and duplicate packets, queue depths
+			and loop latencies) every `telemetry_interval` seconds to a
+			JSON file next to the recording (see `Telemetry`).
+		'''
+		self.fpath = rec_fpath
+		self.port = port
+		self.fmt = fmt
+		self.buffered = buffered
+		self.backend = backend
+		self.backend_kwargs = backend_kwargs
+		self.mode = mode
+		self.live_capacity = live_capacity
+		self.cpu = cpu
+		self.telemetry_interval = telemetry_interval
+		self._ring = None
+		self.n_live_missed = 0
+
+	def start(self):
+		self._stop_event = Event()
+		if self.live_capacity:
+			self._ring = SharedRing(self.live_capacity)
+			self._read_pos = 0
+			self.n_live_missed = 0
+		self._process = Process(
+			target = record_from_glove,
+			args = (
+				self._stop_event,
+				self.fpath,
+				self.port,
+				self.fmt,
+				self.buffered,
+				self.backend,
+				self.backend_kwargs,
+				self.mode
+				),
+			kwargs = dict(
+				live_buffer = None if self._ring is None else self._ring.name,
+				cpu = self.cpu,
+				telemetry_interval = self.telemetry_interval
+				)
+			)
+		self._process.start()
+
+	def stop(self):
+		self._stop_event.set()
+		self._process.join()
+		if self._ring is not None:
+			self._ring.close()
+			self._ring = None
+
+	def latest(self):
+		'''
+		Most recent sample as a structured NumPy scalar (one field per
+		channel, plus 'timestamp'), or None if nothing was recorded yet.
+		Only available while recording, with `live_capacity` > 0; None
+		otherwise.
+		'''
+		if self._ring is None:
+			return None
+		return self._ring.latest()
+
+	def read_new(self):
+		'''
+		All samples recorded since the last call, as a structured array.
+
+		Never blocks. If the caller falls more than `live_capacity` samples
+		behind, the oldest samples are skipped and counted in `n_live_missed`.
+		Empty unless recording with `live_capacity` > 0.
+		'''
+		if self._ring is None:
+			return np.zeros(0, dtype = glove_dtype(
+				sorted(CH_NAMES, key = lambda ch: CH_NAMES[ch])))
+		start = self._read_pos
+		rows, first, self._read_pos = self._ring.read_since(start)
+		self.n_live_missed += first - start
+		return rows
+
+	def iter_new(self):
+		'''
+		Iterates over the samples recorded since the last call, without
+		blocking (see `read_new`).
+		'''
+		return iter(self.read_new())
+
+	def telemetry(self):
+		'''
+		Latest statistics published by the recorder (see `Telemetry`), or
+		None if telemetry is off or nothing was published yet.
+		'''
+		if self.telemetry_interval is None:
+			return None
+		try:
+			with open(stats_path(self.fpath)) as f:
+				return json.load(f)
+		except (OSError, ValueError):
+			return None
+
+
+HANDS = dict(left = FiveDTGlove.FD_HAND_LEFT, right = FiveDTGlove.FD_HAND_RIGHT)
+
+def find_gloves(hands, ports = None, backend = '5dt', backend_kwargs = None):
+	'''
+	Finds the ports of the gloves worn on the given hands.
+
+	Parameters
+	----------
+	hands : list of {'left', 'right'}
+	ports : list of str | None
+		Ports to try, default 'USB0' to 'USB7'.
+	backend, backend_kwargs
+		See `GloveRecorder`.
+
+	Returns
+	-------
+	ports : list of str
+		Port of each glove, in the order of `hands`.
+	'''
+	if ports is None:
+		ports = ['USB%d'%i for i in range(8)]
+	found = dict()
+	for port in ports:
+		glove = load_glove(backend, **(backend_kwargs or {}))
+		try:
+			glove.open(port)
+		except IOError:
+			continue
+		found.setdefault(glove.getGloveHand(), port)
+		glove.close()
+	missing = [h for h in hands if HANDS[h] not in found]
+	if missing:
+		raise IOError('Cannot find %s glove(s) on %s.'%(
+			' and '.join(missing), ', '.join(ports)))
+	return [found[HANDS[h]] for h in hands]
+
+
+class MultiGloveRecorder:
+
+	def __init__(self, rec_fpath, ports = None, hands = None, cpus = 'auto',
+					device_kwargs = None, keep_parts = True, **recorder_kwargs):
+		'''
+		Records from several gloves at once, e.g. for bimanual sessions.
+
+		Each glove gets its own recording process (a `GloveRecorder`),
+		optionally pinned to its own core. All processes timestamp samples
+		with the same cross-process `Clock`, so on `stop` their recordings
+		are merged into one time-ordered file with a 'device' column.
+
+		Parameters
+		----------
+		rec_fpath : str
+			File for the merged recording. Per-device recordings are written
+			next to it, named e.g. glove_device-left.tsv for glove.tsv.
+		ports : list of str | None
+			Ports of the gloves, which are also used as device names.
+		hands : list of {'left', 'right'} | None
+			Alternatively, the hands to record from; their ports are found
+			with `find_gloves`, and the hands are used as device names.
+		cpus : 'auto' | list of int | None
+			Cores to pin each device's process to. 'auto' uses the highest
+			numbered cores, leaving core 0 to the experiment, if there are
+			enough cores. None doesn't pin.
+		device_kwargs : list of dict | None
+			Extra `GloveRecorder` arguments for each device.
+		keep_parts : bool
+			Whether to keep the per-device recordings after merging.
+		**recorder_kwargs
+			Arguments shared by all `GloveRecorder`s (fmt, mode, backend ...).
+		'''
+		if (ports is None) == (hands is None):
+			raise ValueError('Specify either ports or hands.')
+		if hands is not None:
+			ports = find_gloves(hands,
+				backend = recorder_kwargs.get('backend', '5dt'),
+				backend_kwargs = recorder_kwargs.get('backend_kwargs'))
+			self.devices = list(hands)
+		else:
+			self.devices = list(ports)
+		n_cpu = os.cpu_count() or 1
+		if cpus == 'auto':
+			cpus = [n_cpu - 1 - i for i in range(len(ports))]
+			if min(cpus) < 1:
+				cpus = [None] * len(ports)
+		elif cpus is None:
+			cpus = [None] * len(ports)
+		if device_kwargs is None:
+			device_kwargs = [dict() for _ in ports]
+		self.fpath = rec_fpath
+		self.ports = ports
+		self.keep_parts = keep_parts
+		stem, ext = splitext(rec_fpath)
+		self.recorders = [
+			GloveRecorder('%s_device-%s%s'%(stem, dev, ext), port = port,
+				cpu = cpu, **dict(recorder_kwargs, **kwargs))
+			for dev, port, cpu, kwargs
+			in zip(self.devices, ports, cpus, device_kwargs)
+			]
+
+	def start(self):
+		for rec in self.recorders:
+			rec.start()
+
+	def stop(self):
+		for rec in self.recorders:
+			rec.stop()
+		parts = [rec.fpath for rec in self.recorders]
+		merge_recordings(parts, self.fpath, self.devices)
+		if not self.keep_parts:
+			for part in parts:
+				os.remove(part)
+
+	def latest(self):
+		'''
+		Most recent sample of each device, see `GloveRecorder.latest`.
+		'''
+		return {dev: rec.latest() for dev, rec in zip(self.devices, self.recorders)}
+
+	def stats(self):
+		'''
+		Per-device counters while recording: samples recorded so far, the
+		timestamp of the latest one, and samples skipped by live readers,
+		plus each recorder's latest telemetry if it is on. Samples and timestamp
+		are None without a live buffer (`live_capacity` = 0, or after `stop`).
+		'''
+		stats = dict()
+		for dev, rec in zip(self.devices, self.recorders):
+			latest = rec.latest()
+			stats[dev] = dict(
+				port = rec.port,
+				cpu = rec.cpu,
+				samples = None if rec._ring is None else rec._ring.count,
+				latest_timestamp = None if latest is None else float(latest['timestamp']),
+				live_missed = rec.n_live_missed,
+				telemetry = rec.telemetry()
+				)
+		return stats
@@ -0,0 +1,220 @@
+'''
+Resamples several recordings (e.g. the glove and the Leap Motion) onto one
+uniform timebase and merges them into a single array.
+
+Recordings are read in chunks and the output is written in blocks, so
+memory use does not depend on the length of the session. Each output row
+holds every source's columns (named '<source>_<column>'), interpolated at
+the row's 'timestamp', and a '<source>_valid' column that is 0 where that
+source had a gap (no samples within `max_gap`) and its values are NaN.
+
+Usage (from the repository root):
+    python -m glove.resample merged.npy glove=output/glove.tsv leap=output/leap.npy --rate 100
+'''
+import argparse
+
+import numpy as np
+
+from .binary import BinaryLogger, read_binary
+from .compressed import CompressedLogger, iter_compressed
+from .logging import write_sidecar
+
+
+def _iter_columns(fpath, chunk_size, columns = None):
+    '''
+    Yields (column names, values as float64 (n, n_columns), timestamps)
+    from any recording with a 'timestamp' column, for the given `columns`
+    (all others than 'timestamp' if None).
+    '''
+    if fpath.endswith(('.npy', '.dcz')):
+        if fpath.endswith('.npy'):
+            data = read_binary(fpath)
+            chunks = (data[i:i + chunk_size] for i in range(0, len(data), chunk_size))
+        else:
+            chunks = iter_compressed(fpath)
+        for chunk in chunks:
+            names = columns or [n for n in chunk.dtype.names if n != 'timestamp']
+            values = np.stack([chunk[n] for n in names], axis = 1).astype(float)
+            yield names, values, np.asarray(chunk['timestamp'], dtype = float)
+        return
+    import pandas as pd
+    reader = pd.read_csv(fpath, sep = '\t', chunksize = chunk_size,
+        usecols = None if columns is None else list(columns) + ['timestamp'],
+        float_precision = 'round_trip')
+    for df in reader:
+        names = columns or [n for n in df.columns if n != 'timestamp']
+        yield (names, df[names].to_numpy(dtype = float),
+                df['timestamp'].to_numpy(dtype = float))
+
+
+class _Stream:
+    '''
+    The samples of one recording that are still needed for interpolation.
+    '''
+
+    def __init__(self, fpath, chunk_size, max_gap, columns = None):
+        self._chunks = _iter_columns(fpath, chunk_size, columns)
+        self.t = np.zeros(0)
+        self.x = None
+        self.done = False
+        self.columns = None
+        if not self._pull():
+            raise ValueError('%s has no samples.'%fpath)
+        if max_gap is None: # a few typical sample intervals
+            dt = np.diff(self.t)
+            max_gap = 5 * np.median(dt) if len(dt) else np.inf
+        self.max_gap = float(max_gap)
+
+    def _pull(self):
+        for names, x, t in self._chunks:
+            if len(t) == 0:
+                continue
+            self.columns = names
+            if self.x is None:
+                self.t, self.x = t, x
+            else:
+                self.t = np.concatenate([self.t, t])
+                self.x = np.concatenate([self.x, x])
+            return True
+        self.done = True
+        return False
+
+    def cover(self, t_end):
+        '''
+        Reads on until the buffer reaches `t_end` or the recording ends.
+        '''
+        while not self.done and self.t[-1] < t_end:
+            self._pull()
+
+    def sample(self, grid, method):
+        self.cover(grid[-1])
+        t, x = self.t, self.x
+        idx = np.searchsorted(t, grid, side = 'right') - 1
+        i0 = np.clip(idx, 0, len(t) - 1)
+        valid = idx >= 0
+        if method == 'hold':
+            out = x[i0]
+            valid &= grid - t[i0] <= self.max_gap
+        else:
+            has_next = idx + 1 < len(t)
+            i1 = np.minimum(i0 + 1, len(t) - 1)
+            span = t[i1] - t[i0]
+            valid &= (has_next & (span <= self.max_gap)) | (grid == t[i0])
+            with np.errstate(invalid = 'ignore', divide = 'ignore'):
+                w = np.where(has_next & (span > 0), (grid - t[i0]) / span, 0.)
+            out = x[i0] + w[:, np.newaxis] * (x[i1] - x[i0])
+        out[~valid] = np.nan
+        # keep the last sample at or before the grid, for the next block
+        keep = max(int(idx[-1]), 0)
+        self.t, self.x = t[keep:], x[keep:]
+        return out, valid
+
+
+def resample(sources, dst, rate, method = 'linear', max_gap = None,
+                columns = None, chunk_size = 65536, block_size = 65536):
+    '''
+    Interpolates recordings onto a shared uniform timebase.
+
+    The output starts at the latest first sample and ends at the earliest
+    last sample of the sources, so that every row lies within all of them.
+
+    Parameters
+    ----------
+    sources : dict
+        Name -> path of a recording (.tsv, .npy or .dcz) with a
+        'timestamp' column, e.g. dict(glove = 'glove.tsv', leap = 'leap.npy').
+    dst : str
+        Output path, .npy (see `BinaryLogger`) or .dcz (`CompressedLogger`).
+    rate : float
+        Output sampling rate in Hz.
+    method : {'linear', 'hold'}
+        'linear' interpolates between the samples on either side of each
+        output time; 'hold' repeats the last sample at or before it.
+    max_gap : float | dict | None
+        Longest interval (seconds) between samples of a source that is
+        interpolated over; output rows in longer gaps are marked invalid.
+        Either one value for all sources or one per source name. By
+        default, 5 times each source's median sample interval (in its
+        first `chunk_size` samples).
+    columns : dict | None
+        Source name -> list of the columns to resample, e.g. only the
+        channels of the glove, leaving out 'sample' and 'missed'. Sources
+        not listed keep all their columns.
+    chunk_size : int
+        Number of input samples read at a time.
+    block_size : int
+        Number of output rows written at a time.
+
+    Returns
+    -------
+    n_rows : int
+        Number of rows written.
+    '''
+    if method not in ('linear', 'hold'):
+        raise ValueError("method must be 'linear' or 'hold', got %r"%method)
+    if not isinstance(max_gap, dict):
+        max_gap = dict.fromkeys(sources, max_gap)
+    columns = columns or dict()
+    streams = {name: _Stream(fpath, chunk_size, max_gap.get(name),
+                                columns.get(name))
+                for name, fpath in sources.items()}
+    fields = ['%s_%s'%(name, col) for name, s in streams.items()
+                for col in s.columns]
+    fields += ['%s_valid'%name for name in streams]
+    Logger = CompressedLogger if dst.endswith('.dcz') else BinaryLogger
+    log = Logger(dst, fields, channel_dtype = '<f8', block_size = block_size,
+                    background = False)
+    t0 = max(s.t[0] for s in streams.values())
+    k = 0
+    n_rows = 0
+    while True:
+        grid = t0 + np.arange(k, k + block_size) / rate
+        for s in streams.values():
+            s.cover(grid[-1])
+        ends = [s.t[-1] for s in streams.values() if s.done]
+        last = bool(ends) and grid[-1] >= min(ends)
+        if last:
+            grid = grid[grid <= min(ends)]
+        if len(grid):
+            rows = np.empty(len(grid), dtype = log.dtype)
+            rows['timestamp'] = grid
+            for name, s in streams.items():
+                out, valid = s.sample(grid, method)
+                for j, col in enumerate(s.columns):
+                    rows['%s_%s'%(name, col)] = out[:, j]
+                rows['%s_valid'%name] = valid
+            log.write_block(rows)
+            n_rows += len(grid)
+        if last:
+            break
+        k += block_size
+    log.close()
+    write_sidecar(dst, sources = dict(sources), rate = rate, method = method,
+        columns = {name: s.columns for name, s in streams.items()},
+        max_gap = {name: s.max_gap for name, s in streams.items()})
+    return n_rows
+
+# the package exports the function under this name, since `glove.resample`
+# is this module
+resample_recordings = resample
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = __doc__,
+        formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('dst', help = 'output .npy or .dcz file')
+    parser.add_argument('sources', nargs = '+', help = 'name=path pairs')
+    parser.add_argument('--rate', type = float, default = 100.)
+    parser.add_argument('--method', default = 'linear',
+        choices = ['linear', 'hold'])
+    parser.add_argument('--max-gap', type = float, default = None,
+        help = 'seconds; default 5 median sample intervals per source')
+    parser.add_argument('--columns', nargs = '+', default = [],
+        help = 'name=col1,col2 pairs, e.g. to leave out a source\'s counters')
+    args = parser.parse_args()
+    sources = dict(src.split('=', 1) for src in args.sources)
+    columns = {name: cols.split(',') for name, cols
+                in (c.split('=', 1) for c in args.columns)}
+    n = resample(sources, args.dst, args.rate, args.method, args.max_gap,
+                    columns)
+    print('%d rows written to %s'%(n, args.dst))
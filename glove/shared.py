@@ -0,0 +1,143 @@
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+
+from .binary import glove_dtype
+
+_HEADER = 64 # bytes reserved for counters before the first row
+# header layout (uint64): samples written, capacity, number of channels
+_COUNT, _CAPACITY, _N_CHANNELS = range(3)
+
+
+def _attach(name):
+    try: # don't let the resource tracker of a reader unlink the block
+        return SharedMemory(name = name, create = False, track = False)
+    except TypeError: # `track` is new in Python 3.13
+        return SharedMemory(name = name, create = False)
+
+
+class SharedRing:
+    '''
+    Ring buffer of the most recent glove samples in shared memory.
+
+    There is exactly one writer (the recording process) and any number of
+    readers, which can be in other processes. Samples are never pickled or
+    sent through a pipe: readers copy rows straight out of the shared block.
+    The writer never waits for readers, so a reader that falls more than
+    `capacity` samples behind loses the oldest samples.
+    '''
+
+    def __init__(self, capacity = 4096, fields = None, name = None):
+        '''
+        Creates a new ring buffer, or attaches to an existing one by name.
+
+        Parameters
+        ----------
+        capacity : int
+            Number of samples kept. Ignored when attaching.
+        fields : list of str | None
+            Channel names. Defaults to the 14 channels in `CH_NAMES`.
+        name : str | None
+            Name of an existing ring to attach to, see `SharedRing.name`.
+        '''
+        if fields is None:
+            from . import CH_NAMES
+            fields = sorted(CH_NAMES, key = lambda ch: CH_NAMES[ch])
+        self.dtype = glove_dtype(fields)
+        if name is None:
+            self._shm = SharedMemory(
+                create = True,
+                size = _HEADER + capacity * self.dtype.itemsize
+                )
+            self._owner = True
+        else:
+            self._shm = _attach(name)
+            self._owner = False
+        self._header = np.ndarray((3,), np.uint64, buffer = self._shm.buf)
+        if self._owner:
+            self._header[:] = (0, capacity, len(fields))
+        elif int(self._header[_N_CHANNELS]) != len(fields):
+            raise ValueError('Ring buffer %s does not hold %d channels.'%(
+                name, len(fields)))
+        self.capacity = int(self._header[_CAPACITY])
+        self._rows = np.ndarray((self.capacity,), self.dtype,
+            buffer = self._shm.buf, offset = _HEADER)
+        self._ch = np.ndarray(
+            shape = (self.capacity, len(fields)),
+            dtype = np.uint16,
+            buffer = self._shm.buf,
+            offset = _HEADER,
+            strides = (self.dtype.itemsize, 2)
+            )
+        self._ts = self._rows[self.dtype.names[-1]]
+        self._n = int(self._header[_COUNT])
+        self._n_ch = len(fields)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    @property
+    def count(self):
+        '''
+        Total number of samples written so far.
+        '''
+        return int(self._header[_COUNT])
+
+    def write_sample(self, channels, timestamp):
+        '''
+        Adds one sample (writer only). The row is filled before the sample
+        count is published, so readers never see a partially written row.
+        '''
+        i = self._n % self.capacity
+        self._ch[i] = channels[:self._n_ch]
+        self._ts[i] = timestamp
+        self._n += 1
+        self._header[_COUNT] = self._n
+
+    def latest(self):
+        '''
+        Copy of the most recent sample, or None if nothing was written yet.
+        '''
+        n = self.count
+        if n == 0:
+            return None
+        return self._rows[(n - 1) % self.capacity].copy()
+
+    def read_since(self, start):
+        '''
+        Copies all samples with index >= `start` that are still in the ring.
+
+        Returns
+        -------
+        rows : np.ndarray
+            Structured array of samples, oldest first.
+        first : int
+            Index of the first returned sample; anything between `start` and
+            `first` was overwritten before it could be read.
+        end : int
+            Index to pass as `start` next time.
+        '''
+        end = self.count
+        first = max(start, end - self.capacity)
+        rows = self._rows[np.arange(first, end) % self.capacity]
+        # drop rows the writer overwrote while we were copying, including
+        # the one it may be writing right now
+        overwritten = self.count + 1 - self.capacity - first
+        if overwritten > 0:
+            rows = rows[overwritten:]
+            first += overwritten
+        return rows, first, end
+
+    def close(self):
+        if self._shm is None:
+            return
+        # release our views before closing the underlying buffer
+        self._header = self._rows = self._ch = self._ts = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+        self._shm = None
+
+    def __del__(self):
+        if hasattr(self, '_shm'):
+            self.close()
@@ -0,0 +1,263 @@
+from time import perf_counter, sleep
+from threading import Thread, Event
+import numpy as np
+
+from .glove import FiveDTGlove
+from .readers import read_glove
+
+N_CHANNELS = 14 # channels recorded by the 14 sensor glove
+N_VALUES = 20 # length of the driver's sensor arrays
+
+
+def _synthesize(n, rate, rng):
+    '''
+    Slowly varying, noisy finger flexion in the raw value range of the glove.
+    '''
+    t = np.arange(n)[:, np.newaxis] / rate
+    freqs = rng.uniform(.1, .5, N_CHANNELS) # Hz
+    phases = rng.uniform(0, 2 * np.pi, N_CHANNELS)
+    lower = rng.uniform(1000, 1500, N_CHANNELS)
+    upper = lower + rng.uniform(1000, 2000, N_CHANNELS)
+    flex = .5 + .5 * np.sin(2 * np.pi * freqs * t + phases)
+    vals = lower + flex * (upper - lower) + rng.normal(0, 3, flex.shape)
+    return np.clip(np.round(vals), 0, 4095).astype(np.uint16)
+
+
+def _fill(out, arr, values):
+    '''
+    Copies a sample into a NumPy array or ctypes array in place.
+    '''
+    if hasattr(out, 'dtype'):
+        out[:N_VALUES] = arr
+    else:
+        out[:N_VALUES] = values
+
+
+class SimulatedGlove:
+    '''
+    Stand-in for `FiveDTGlove` that needs neither the glove nor its driver.
+
+    Packets "arrive" on a fixed schedule at `rate` packets per second,
+    counted from the call to `open`. Channel values are either synthetic
+    or replayed (in a loop) from an existing recording.
+
+    Usage:
+    glove = SimulatedGlove(rate = 1000, source = 'logs/sub-01/run-01/glove.tsv')
+    glove.open('USB0')
+    if glove.newData():
+        glove.getSensorRawAll()
+    glove.close()
+    '''
+
+    FD_HAND_LEFT = FiveDTGlove.FD_HAND_LEFT
+    FD_HAND_RIGHT = FiveDTGlove.FD_HAND_RIGHT
+    FD_GLOVE14U_USB = FiveDTGlove.FD_GLOVE14U_USB
+
+    def __init__(self, rate = None, source = None, hand = FD_HAND_RIGHT,
+                    duration = 10., seed = None):
+        '''
+        Parameters
+        ----------
+        rate : float | None
+            Packet rate in Hz. If None, the median rate of `source` is used,
+            or 75 Hz (the nominal rate of the glove) for synthetic data.
+        source : str | None
+            Path to a glove.tsv or .npy recording to replay. If None,
+            synthetic data are generated.
+        hand : int
+            Value returned by `getGloveHand`.
+        duration : float
+            Length in seconds of the synthetic signal, which is looped.
+        seed : int | None
+            Seed for the synthetic signal.
+        '''
+        if source is not None:
+            channels, timestamps = read_glove(source)
+            if rate is None:
+                rate = 1 / np.median(np.diff(timestamps))
+        else:
+            if rate is None:
+                rate = 75.
+            rng = np.random.default_rng(seed)
+            channels = _synthesize(max(int(duration * rate), 1), rate, rng)
+        if len(channels) == 0:
+            raise ValueError('%s contains no samples.'%source)
+        self.rate = float(rate)
+        self.source = source
+        self._hand = hand
+        data = np.zeros((len(channels), N_VALUES), dtype = np.uint16)
+        data[:, :N_CHANNELS] = channels
+        self._data = data
+        self._rows = data.tolist() # python ints, like the ctypes wrapper
+        self._upper = channels.max(axis = 0)
+        self._lower = channels.min(axis = 0)
+        self._autocalibrate = False
+        self._calibrated_to = -1 # last packet included in the bounds
+        self._t0 = None
+        self._last_seen = -1
+        self._callback_thread = None
+
+    def open(self, port):
+        '''Starts the packet clock. `port` is ignored.'''
+        self.port = port
+        self._t0 = perf_counter()
+        self._last_seen = -1
+        self._calibrated_to = -1
+
+    def close(self):
+        self.removeCallback()
+        self._t0 = None
+
+    def _packet(self):
+        return int((perf_counter() - self._t0) * self.rate)
+
+    def newData(self):
+        '''Whether a packet has arrived since the last call.'''
+        k = self._packet()
+        if k > self._last_seen:
+            self._last_seen = k
+            return True
+        return False
+
+    def getPacketTime(self):
+        '''
+        Arrival time (in `time.perf_counter` seconds) of the packet that
+        was announced by the last `newData` call. Not part of the 5DT
+        interface; used to benchmark latency against a known schedule.
+        '''
+        return self._t0 + self._last_seen / self.rate
+
+    def getSensorRawAll(self, out = None):
+        '''
+        Raw values of the most recent packet, optionally written into a
+        preallocated buffer (see `FiveDTGlove.getSensorRawAll`).
+        '''
+        k = self._packet() % len(self._rows)
+        if out is None:
+            return list(self._rows[k])
+        _fill(out, self._data[k], self._rows[k])
+        return out
+
+    def getSensorRawBlock(self, block, timestamps = None, clock = None,
+                            stop_event = None):
+        '''
+        Fills consecutive rows of `block` with new packets, like
+        `FiveDTGlove.getSensorRawBlock`.
+        '''
+        if timestamps is not None and clock is None:
+            raise ValueError('A clock is needed to fill timestamps')
+        for i in range(len(block)):
+            while not self.newData():
+                if stop_event is not None and stop_event.is_set():
+                    return i
+            block[i, :N_VALUES] = self._data[self._packet() % len(self._data)]
+            if timestamps is not None:
+                timestamps[i] = clock()
+        return len(block)
+
+    def getSensorRaw(self, nSensor):
+        return self.getSensorRawAll()[nSensor]
+
+    def _update_calibration(self):
+        '''
+        With autocalibration on, widens the bounds to the raw values of
+        every packet received so far, like the driver.
+        '''
+        if not self._autocalibrate:
+            return
+        k = self._packet()
+        if k <= self._calibrated_to:
+            return
+        n = len(self._data)
+        packets = np.arange(max(self._calibrated_to + 1, k + 1 - n), k + 1)
+        rows = self._data[packets % n, :N_CHANNELS]
+        self._upper = np.maximum(self._upper, rows.max(axis = 0))
+        self._lower = np.minimum(self._lower, rows.min(axis = 0))
+        self._calibrated_to = k
+
+    def getSensorScaledAll(self, out = None):
+        self._update_calibration()
+        raw = np.asarray(self.getSensorRawAll()[:N_CHANNELS], dtype = float)
+        span = np.maximum(self._upper - self._lower, 1)
+        scaled = np.zeros(N_VALUES, dtype = np.float32)
+        scaled[:N_CHANNELS] = np.clip((raw - self._lower) / span, 0, 1)
+        if out is None:
+            return scaled.tolist()
+        _fill(out, scaled, scaled.tolist())
+        return out
+
+    def getSensorScaled(self, nSensor):
+        return self.getSensorScaledAll()[nSensor]
+
+    def getCalibrationAll(self, upper = None, lower = None):
+        self._update_calibration()
+        vals = np.zeros((2, N_VALUES), dtype = np.uint16)
+        vals[0, :N_CHANNELS] = self._upper
+        vals[1, :N_CHANNELS] = self._lower
+        if upper is None or lower is None:
+            return vals.tolist()
+        _fill(upper, vals[0], vals[0].tolist())
+        _fill(lower, vals[1], vals[1].tolist())
+        return [upper, lower]
+
+    def resetCalibrationAll(self):
+        '''Empties the calibration range, to be rebuilt by autocalibration.'''
+        self._upper = np.zeros(N_CHANNELS, dtype = np.uint16)
+        self._lower = np.full(N_CHANNELS, 4095, dtype = np.uint16)
+        self._calibrated_to = self._packet() - 1 if self._t0 is not None else -1
+
+    def getAutoCalibrate(self):
+        return self._autocalibrate
+
+    def setAutoCalibrate(self, bAutocalibrate):
+        if not isinstance(bAutocalibrate, bool):
+            raise ValueError('Input argument bAutocalibrate needs to be a boolean value')
+        self._update_calibration()
+        self._autocalibrate = bAutocalibrate
+        self._calibrated_to = self._packet() - 1 if self._t0 is not None else -1
+
+    def setCallback(self, function):
+        '''
+        Calls `function()` from a background thread as each packet arrives.
+        '''
+        self.removeCallback()
+        self._callback_stop = Event()
+        self._callback_thread = Thread(
+            target = self._callback_loop,
+            args = (function, self._callback_stop),
+            daemon = True
+            )
+        self._callback_thread.start()
+
+    def _callback_loop(self, function, stop):
+        k = self._packet()
+        while not stop.is_set():
+            k += 1
+            delay = self._t0 + k / self.rate - perf_counter()
+            if delay > 0:
+                sleep(delay)
+            function()
+
+    def removeCallback(self):
+        if self._callback_thread is not None:
+            self._callback_stop.set()
+            self._callback_thread.join()
+            self._callback_thread = None
+
+    def getPacketRate(self):
+        return int(round(self.rate))
+
+    def getGloveHand(self):
+        return self._hand
+
+    def getGloveType(self):
+        return self.FD_GLOVE14U_USB
+
+    def getNumSensors(self):
+        return N_CHANNELS
+
+    def getGloveInfo(self):
+        return 'simulated glove (%s)'%(self.source or 'synthetic')
+
+    def getDriverInfo(self):
+        return 'simulated driver'
@@ -0,0 +1,210 @@
+'''
+Live statistics of a running recorder, published as a JSON file.
+
+A `Telemetry` object is updated from the recording loop with a few cheap
+calls (counter increments, the odd latency sample), and a background
+thread rewrites the stats file every `interval` seconds. The file is
+replaced atomically, so it can be polled by any other process, e.g.
+
+    python -m glove.telemetry logs/sub-01/run-01/glove_stats.json
+'''
+from threading import Thread, Event
+from time import perf_counter, sleep
+import argparse
+import json
+import os
+
+import numpy as np
+
+
+def stats_path(fpath):
+    '''
+    Stats file of a recording, e.g. glove_stats.json for glove.tsv.
+    '''
+    return os.path.splitext(fpath)[0] + '_stats.json'
+
+
+class Telemetry:
+
+    def __init__(self, fpath, interval = 1., n_latencies = 1024, **info):
+        '''
+        Parameters
+        ----------
+        fpath : str
+            JSON file to (re)write.
+        interval : float
+            Seconds between updates of the file.
+        n_latencies : int
+            Number of most recent latency samples kept per stage, from
+            which the percentiles are computed.
+        **info
+            JSON-serializable values to include in every update.
+        '''
+        self.fpath = fpath
+        self.interval = interval
+        self.info = info
+        self.counts = dict(samples = 0, missed = 0, duplicates = 0)
+        self.values = dict()
+        self._gauges = dict()
+        self._n_latencies = n_latencies
+        self._latencies = dict()
+        self._period = None
+        self._t_prev = None
+        self._last = None
+        self._t_start = perf_counter()
+        self._stop = Event()
+        self._thread = None
+
+    def tick(self, t):
+        '''
+        Counts one logged sample with timestamp `t`. Once the nominal rate
+        is known (see `set_rate`), gaps longer than 1.5 sample periods are
+        counted as missed packets, and intervals shorter than half a period
+        as duplicates.
+        '''
+        counts = self.counts
+        counts['samples'] += 1
+        period = self._period
+        if period is not None and self._t_prev is not None:
+            dt = t - self._t_prev
+            if dt > 1.5 * period:
+                counts['missed'] += int(dt / period + .5) - 1
+            elif dt < .5 * period:
+                counts['duplicates'] += 1
+        self._t_prev = t
+
+    def count(self, name, n = 1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def set(self, name, value):
+        '''
+        Sets a value to publish as is, e.g. a rate reported by the driver.
+        '''
+        self.values[name] = value
+
+    def set_rate(self, rate):
+        '''
+        Sets the nominal sample rate (Hz) used by `tick`, and publishes it.
+        '''
+        self.values['nominal_rate'] = rate
+        self._period = 1. / rate if rate else None
+
+    def gauge(self, name, func):
+        '''
+        Publishes `func()` (e.g. a queue's length) with every update. It is
+        called from the telemetry thread, so it must be thread-safe.
+        '''
+        self._gauges[name] = func
+
+    def latency(self, stage, seconds):
+        '''
+        Records one latency sample of a stage of the recording loop.
+        '''
+        buf = self._latencies.get(stage)
+        if buf is None:
+            buf = self._latencies[stage] = [np.full(self._n_latencies, np.nan), 0]
+        buf[0][buf[1] % self._n_latencies] = seconds
+        buf[1] += 1
+
+    def snapshot(self):
+        '''
+        Current statistics as a JSON-serializable dict.
+        '''
+        now = perf_counter()
+        counts = dict(self.counts)
+        rates = dict()
+        if self._last is not None:
+            t_last, counts_last = self._last
+            dt = now - t_last
+            if dt > 0:
+                rates = {name: (n - counts_last.get(name, 0)) / dt
+                            for name, n in counts.items()}
+        self._last = (now, counts)
+        latency_us = dict()
+        for stage, (buf, n) in list(self._latencies.items()):
+            x = buf[:min(n, len(buf))] * 1e6
+            p50, p90, p99 = np.percentile(x, [50, 90, 99])
+            latency_us[stage] = dict(p50 = p50, p90 = p90, p99 = p99,
+                                        max = x.max(), n = n)
+        gauges = dict()
+        for name, func in list(self._gauges.items()):
+            try:
+                gauges[name] = func()
+            except Exception as e: # never let a gauge stop the telemetry
+                gauges[name] = repr(e)
+        return dict(
+            info = self.info,
+            elapsed_s = now - self._t_start,
+            counts = counts,
+            rates_per_s = rates,
+            values = dict(self.values),
+            gauges = gauges,
+            latency_us = latency_us,
+            )
+
+    def write(self):
+        tmp = self.fpath + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.snapshot(), f, indent = 2, default = float)
+        os.replace(tmp, self.fpath)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError: # e.g. the file is open in a viewer on Windows
+                pass
+
+    def start(self):
+        self._thread = Thread(target = self._loop, daemon = True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        '''
+        Stops the telemetry thread and writes the final statistics.
+        '''
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.write()
+
+
+def watch(fpath, interval = 1.):
+    '''
+    Prints the main figures of a stats file whenever it is updated.
+    '''
+    mtime = None
+    while True:
+        try:
+            st = os.stat(fpath).st_mtime_ns
+            if st != mtime:
+                mtime = st
+                with open(fpath) as f:
+                    stats = json.load(f)
+                rates = stats['rates_per_s']
+                counts = stats['counts']
+                line = '%7.1f s  logged %7.1f/s  nominal %s/s  missed %d  duplicates %d'%(
+                    stats['elapsed_s'], rates.get('samples', float('nan')),
+                    stats['values'].get('nominal_rate', 'n/a'),
+                    counts['missed'], counts['duplicates'])
+                for name, value in stats['gauges'].items():
+                    line += '  %s %s'%(name, value)
+                print(line, flush = True)
+        except (OSError, ValueError, KeyError):
+            pass
+        sleep(interval)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = __doc__,
+        formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('stats', help = 'e.g. logs/sub-01/run-01/glove_stats.json')
+    parser.add_argument('--interval', type = float, default = 1.)
+    args = parser.parse_args()
+    try:
+        watch(args.stats, args.interval)
+    except KeyboardInterrupt:
+        pass
@@ -11,60 +11,369 @@ os.chdir(rose_dir)
 
 from resources.LeapSDK.v53_python39 import Leap
 from LeapData import LeapData
-from glove import GloveRecorder, WinClock
+from glove import (GloveRecorder, Clock, BinaryLogger, binary_to_tsv, read_binary,
+                    resample_recordings, CH_NAMES)
 
+from multiprocessing import Process, Event
 from time import time, strftime
+import argparse
 import numpy as np
 import pandas as pd
 
 OUTPUT_DIR = 'output'
 str_time = strftime('%Y%m%d-%H%M%S')
 LEAP_OUTPUT_FILE = 'leap_%s.tsv'%str_time
+LEAP_STREAM_FILE = 'leap_%s.npy'%str_time
 GLOVE_OUTPUT_FILE = 'glove_%s.tsv'%str_time
+MERGED_OUTPUT_FILE = 'merged_%s.npy'%str_time
+
+clock = Clock()
+
+# what is captured of each hand in deferred mode, in storage order
+HAND_VECTORS = ('palm_position', 'palm_velocity', 'palm_normal', 'direction',
+                'wrist_position', 'stabilized_palm_position')
+HAND_SCALARS = ('id', 'is_left', 'is_right', 'confidence', 'palm_width',
+                'grab_strength', 'pinch_strength')
+ARM_VECTORS = ('elbow_position', 'wrist_position', 'center', 'direction')
+ARM_SCALARS = ('width',)
+BONE_VECTORS = ('prev_joint', 'next_joint', 'center', 'direction')
+BONE_SCALARS = ('length', 'width')
+BASIS = ('x_basis', 'y_basis', 'z_basis', 'origin')
+N_FINGERS = 5
+N_BONES = 4
+
+
+def _raw_fields():
+    '''
+    Column names of the raw hand geometry captured in deferred mode.
+    '''
+    fields = []
+    def part(prefix, vectors, scalars):
+        for attr in vectors:
+            fields.extend('%s%s_%s' % (prefix, attr, c) for c in 'xyz')
+        for b in BASIS:
+            fields.extend('%sbasis_%s_%s' % (prefix, b, c) for c in 'xyz')
+        fields.extend(prefix + attr for attr in scalars)
+    part('hand_', HAND_VECTORS, HAND_SCALARS)
+    part('arm_', ARM_VECTORS, ARM_SCALARS)
+    for f in range(N_FINGERS):
+        for b in range(N_BONES):
+            part('finger%d_bone%d_' % (f, b), BONE_VECTORS, BONE_SCALARS)
+    return fields
+
+RAW_FIELDS = _raw_fields()
+
+
+def _capture_part(values, obj, vectors, scalars):
+    for attr in vectors:
+        v = getattr(obj, attr)
+        values.extend((v.x, v.y, v.z))
+    basis = obj.basis
+    for b in BASIS:
+        v = getattr(basis, b)
+        values.extend((v.x, v.y, v.z))
+    values.extend(getattr(obj, attr) for attr in scalars)
+
+def capture_hand(hand):
+    '''
+    Copies the geometry of a Leap hand into a flat list of floats, in the
+    order of `RAW_FIELDS`. Only attribute reads, no angle math.
+    '''
+    values = []
+    _capture_part(values, hand, HAND_VECTORS, HAND_SCALARS)
+    _capture_part(values, hand.arm, ARM_VECTORS, ARM_SCALARS)
+    for finger in hand.fingers:
+        for b in range(N_BONES):
+            _capture_part(values, finger.bone(b), BONE_VECTORS, BONE_SCALARS)
+    return values
+
+
+class _Proxy:
+    '''
+    Stand-in for a Leap object, rebuilt from captured values, that exposes
+    the same attributes (vectors and bases are real `Leap.Vector` and
+    `Leap.Matrix` objects, so their methods work as usual).
+
+    Only what `capture_hand` stores is available:
+    hand: the `HAND_VECTORS` and `HAND_SCALARS`, `basis`, `arm` and `fingers`
+    arm: the `ARM_VECTORS`, `width` and `basis`
+    finger: `type`, `bone(type)`/`bones`, and `direction`, `tip_position`,
+        `width` (those of the distal bone) and `length` (sum of all bones
+        but the metacarpal), which are derived, not read from the SDK
+    bone: the `BONE_VECTORS` and `BONE_SCALARS`, `type` and `basis`
+    frame (`first_frame`): `hands` only
+    Reading anything else raises an AttributeError.
+    '''
+    def __init__(self, **attrs):
+        self.__dict__.update(attrs)
+        self.is_valid = True
+
+    def __getattr__(self, name): # only called for attributes not captured
+        raise AttributeError('%s is not captured in deferred mode' % name)
+
+class _Finger(_Proxy):
+    def bone(self, type):
+        return self.bones[type]
+
+class _FingerList(list):
+    def finger_type(self, type):
+        return _FingerList(f for f in self if f.type == type)
+
+class _Reader:
+
+    def __init__(self, row):
+        self._row = row
+        self._i = 0
+
+    def vector(self):
+        i = self._i
+        self._i = i + 3
+        return Leap.Vector(*self._row[i:i + 3])
+
+    def matrix(self):
+        return Leap.Matrix(*[self.vector() for _ in BASIS])
+
+    def scalar(self):
+        self._i += 1
+        return self._row[self._i - 1]
+
+    def attrs(self, vectors, scalars):
+        attrs = {attr: self.vector() for attr in vectors}
+        attrs['basis'] = self.matrix()
+        attrs.update((attr, self.scalar()) for attr in scalars)
+        return attrs
+
+def restore_hand(row):
+    '''
+    Rebuilds a hand from one row captured by `capture_hand`, so RoSeMotion's
+    angle conversion can run on it as if it came from the controller.
+    '''
+    r = _Reader(row.tolist() if hasattr(row, 'tolist') else row)
+    attrs = r.attrs(HAND_VECTORS, HAND_SCALARS)
+    attrs['id'] = int(attrs['id'])
+    attrs['is_left'] = bool(attrs['is_left'])
+    attrs['is_right'] = bool(attrs['is_right'])
+    attrs['arm'] = _Proxy(**r.attrs(ARM_VECTORS, ARM_SCALARS))
+    fingers = _FingerList()
+    for f in range(N_FINGERS):
+        bones = [_Proxy(type = b, **r.attrs(BONE_VECTORS, BONE_SCALARS))
+                    for b in range(N_BONES)]
+        fingers.append(_Finger(type = f, bones = bones,
+                                direction = bones[-1].direction,
+                                tip_position = bones[-1].next_joint,
+                                length = sum(b.length for b in bones[1:]),
+                                width = bones[-1].width))
+    return _Proxy(fingers = fingers, **attrs)
+
+
+def _grown(block, n):
+    '''
+    Returns `block` with room for at least one more row after the first `n`.
+    '''
+    if n < len(block):
+        return block
+    grown = np.empty((2 * len(block),) + block.shape[1:], dtype = block.dtype)
+    grown[:n] = block
+    return grown
 
-clock = WinClock()
 
 class DataHandler(LeapData):
     '''
     Handles converting joint positions to joint angles
+
+    Channel values are stored in a preallocated NumPy block (one row per
+    frame, timestamp in the last column) that doubles in size when full,
+    instead of as a list of Python tuples.
+
+    If `fpath` is given, frames are instead streamed to a .npy recording
+    (see `BinaryLogger`) by a background writer thread, so memory use does
+    not grow with the session and the file can be read while recording.
+    The first frame, which only sets up the skeleton, is not written.
+
+    If `deferred` is True, `add_frame` only copies the hand geometry (see
+    `capture_hand`) and its timestamp, which keeps the Leap callback short
+    enough not to drop frames. Joint angles are computed afterwards by
+    `convert` (called by `close`), which replays the captured hands through
+    RoSeMotion's conversion, on stand-ins for the Leap objects (see
+    `_Proxy` for which attributes they cover). This has not been checked
+    against the live path on recorded frames, so live conversion stays the
+    default. When streaming, the raw geometry is itself
+    streamed to `<fpath stem>_raw.npy`, so memory use stays bounded, and a
+    worker process (`convert_stream`) converts it to `fpath` as it comes
+    in, so little is left to do at exit.
     '''
+    def __init__(self, *args, fpath = None, deferred = False,
+                    initial_frames = 4096, block_size = 256, **kwargs):
+        super(DataHandler, self).__init__(*args, **kwargs)
+        self.fpath = fpath
+        self.deferred = deferred
+        self._raw_logger = None
+        self._raw = None
+        self._n_raw = 0
+        self._n_converted = 0
+        self._worker = None
+        if deferred and fpath is not None:
+            self.raw_fpath = os.path.splitext(fpath)[0] + '_raw.npy'
+            self._raw_logger = BinaryLogger(self.raw_fpath, RAW_FIELDS,
+                channel_dtype = '<f8', block_size = block_size,
+                background = True)
+            self._worker_stop = Event()
+            self._worker = Process(target = convert_stream,
+                args = (self.raw_fpath, fpath, self._worker_stop))
+            self._worker.start()
+        else:
+            self.raw_fpath = None
+        self._block_size = block_size
+        self._logger = None
+        self._initial_frames = initial_frames
+        self._block = None
+        self._n_frames = 0
+
+    def column_names(self):
+        return ['%s_%s' % (c[0], c[1]) for c in self._motion_channels]
+
+    def _stream(self, t, channel_values):
+        if self._logger is None:
+            self._logger = BinaryLogger(self.fpath, self.column_names(),
+                channel_dtype = '<f8', block_size = self._block_size,
+                background = True)
+        self._logger.write_sample([channel[2] for channel in channel_values], t)
+
+    def close(self):
+        '''
+        Converts the frames captured in deferred mode, and writes out the
+        frames still buffered when streaming to `fpath`.
+        '''
+        if self._worker is not None:
+            # the worker converts what is left once the raw stream is complete
+            self._raw_logger.close()
+            self._worker_stop.set()
+            self._worker.join()
+            self._worker = None
+        elif self.deferred:
+            self.convert()
+        if self._logger is not None:
+            self._logger.close()
+
+    def _capture(self, hand, t):
+        values = capture_hand(hand)
+        if self._raw_logger is not None:
+            self._raw_logger.write_sample(values, t)
+        else:
+            if self._raw is None:
+                self._raw = np.empty((self._initial_frames, len(values) + 1))
+            self._raw = _grown(self._raw, self._n_raw)
+            row = self._raw[self._n_raw]
+            row[:-1] = values
+            row[-1] = t
+        self._n_raw += 1
+
+    def convert(self):
+        '''
+        Computes joint angles for the frames captured in memory in deferred
+        mode since the last call, as `add_frame` would have. (When
+        streaming, `convert_stream` does this in a worker process.)
+        '''
+        raw = self._raw[:self._n_raw] if self._raw is not None else np.zeros((0, 1))
+        self.convert_rows(raw[self._n_converted:])
+        self._n_converted = len(raw)
+
+    def convert_rows(self, raw, chunk_size = 4096):
+        '''
+        Computes joint angles for captured hands (rows of `capture_hand`
+        values followed by the timestamp).
+        '''
+        for start in range(0, len(raw), chunk_size):
+            for row in np.asarray(raw[start:start + chunk_size]):
+                hand = restore_hand(row[:-1])
+                if not self.first_frame:
+                    self.first_frame = _Proxy(hands = [hand])
+                    channel_values = self._get_channel_values(hand, firstframe=True)
+                    self._append(0, channel_values)
+                else:
+                    self._append(float(row[-1]), self._get_channel_values(hand))
+
+    def _append(self, t, channel_values):
+        if self.fpath is not None:
+            if self._n_frames > 0:
+                self._stream(t, channel_values)
+            self._n_frames += 1
+            return
+        if self._block is None:
+            self._block = np.empty((self._initial_frames, len(channel_values) + 1))
+        self._block = _grown(self._block, self._n_frames)
+        row = self._block[self._n_frames]
+        row[:-1] = [channel[2] for channel in channel_values]
+        row[-1] = t
+        self._n_frames += 1
+
     def add_frame(self, frame):
         if not self._check_frame(frame):
             return None
 
         # Get the first hand
         hand = frame.hands[0]
+        if self.deferred:
+            self._capture(hand, clock.time())
+            return frame
         if not self.first_frame:
             self.first_frame = frame
             channel_values = self._get_channel_values(hand, firstframe=True)
-            self._motions.append((0, channel_values))
+            self._append(0, channel_values)
             return
 
         channel_values = self._get_channel_values(hand)
-        self._motions.append((clock.time(), channel_values))
+        self._append(clock.time(), channel_values)
         return frame
 
     def _motion2dataframe(self):
         """Returns all of the channels parsed from the LeapMotion sensor as a pandas DataFrame"""
-        time_index = pd.to_timedelta([f[0] for f in self._motions], unit='s')
-        frames = [f[1] for f in self._motions]
-        channels = np.asarray([[channel[2] for channel in frame] for frame in frames])
-        column_names = ['%s_%s' % (c[0], c[1]) for c in self._motion_channels]
+        column_names = self.column_names()
+        if self._block is None:
+            return pd.DataFrame(columns=column_names + ['timestamp'])
+        # a view of the filled rows, so the DataFrame shares the block's memory
+        block = self._block[:self._n_frames]
+        time_index = pd.to_timedelta(block[:, -1], unit='s')
+        return pd.DataFrame(data=block, index=time_index,
+                            columns=column_names + ['timestamp'], copy=False)
 
-        df = pd.DataFrame(data=channels, index=time_index, columns=column_names)
-        df['timestamp'] = [f[0] for f in self._motions]
-        return df
+
+def convert_stream(raw_fpath, fpath, stop_event, interval = .5):
+    '''
+    Converts the hand geometry streamed to `raw_fpath` (see `DataHandler`)
+    into joint angles streamed to `fpath`, while it is being recorded.
+    Runs until `stop_event` is set and everything written so far has been
+    converted.
+    '''
+    handler = DataHandler(frame_rate = 1/60, fpath = fpath)
+    n_done = 0
+    while True:
+        stopping = stop_event.wait(interval)
+        try:
+            raw = read_binary(raw_fpath)
+        except ValueError: # header being rewritten, try again
+            if stopping:
+                raise
+            continue
+        raw = raw.view(np.float64).reshape(len(raw), len(RAW_FIELDS) + 1)
+        handler.convert_rows(raw[n_done:])
+        n_done = len(raw)
+        del raw
+        if stopping:
+            break
+    handler.close()
 
 
 class Listener(Leap.Listener):
     '''
-    Records samples from Leap Motion Controller,
-    and returns sample dataframe (joint angles) upon exit
+    Records samples from Leap Motion Controller, and either streams
+    them (joint angles) to `fpath` or returns them as a dataframe upon exit
     '''
 
-    def __init__(self):
+    def __init__(self, fpath = None, deferred = False):
         super(Listener, self).__init__()
-        self.leap2bvh = DataHandler(frame_rate = 1/60)
+        self.leap2bvh = DataHandler(frame_rate = 1/60, fpath = fpath,
+                                    deferred = deferred)
 
     def on_connect(self, controller):
         print('Connected to Leap Motion controller.')
@@ -75,6 +384,9 @@ class Listener(Leap.Listener):
         return
 
     def exit(self):
+        self.leap2bvh.close()
+        if self.leap2bvh.fpath is not None:
+            return None
         df = self.leap2bvh.parse().values
         return df
 
@@ -83,10 +395,25 @@ if __name__ == '__main__':
     '''
     Record from the Leap Motion and the Data Glove simultaneously
     '''
+    parser = argparse.ArgumentParser(
+        description = 'Records from the Leap Motion and the data glove.')
+    parser.add_argument('--stream', action = 'store_true',
+        help = 'stream Leap frames to a .npy file while recording, instead '
+                'of keeping them in memory and saving them at the end')
+    parser.add_argument('--tsv', action = 'store_true',
+        help = 'with --stream, also convert the .npy file to TSV at the end')
+    parser.add_argument('--deferred', action = 'store_true',
+        help = 'only copy hand geometry during recording and compute joint '
+                'angles afterwards (see DataHandler)')
+    parser.add_argument('--resample', type = float, default = None,
+        metavar = 'RATE', help = 'also resample the glove and Leap data to '
+                'RATE Hz on a shared timebase, in merged_<time>.npy')
+    args = parser.parse_args()
     output_dir = join(this_dir, OUTPUT_DIR)
     if not os.path.exists(output_dir):
         os.mkdir(output_dir)
     leap_f = join(output_dir, LEAP_OUTPUT_FILE)
+    leap_stream_f = join(output_dir, LEAP_STREAM_FILE)
     glove_f = join(output_dir, GLOVE_OUTPUT_FILE)
     ## set up recording from data glove
     print('starting data glove...')
@@ -94,7 +421,8 @@ if __name__ == '__main__':
     glove_recorder.start()
     ## set up recording from leap motion
     print('starting leap motion...')
-    listener = Listener()
+    listener = Listener(leap_stream_f if args.stream else None,
+                        deferred = args.deferred)
     controller = Leap.Controller()
     controller.add_listener(listener)
     input('Press enter to stop...')
@@ -102,6 +430,25 @@ if __name__ == '__main__':
     print('Terminated glove recording...')
     controller.remove_listener(listener)
     print('Terminated Leap recording...')
+    if args.deferred:
+        print('Converting Leap frames to joint angles...')
     df = listener.exit()
-    df.iloc[1:, :].to_csv(leap_f, sep = '\t', index = False)
-    print('Saved!')
+    if df is not None:
+        df.iloc[1:, :].to_csv(leap_f, sep = '\t', index = False)
+        leap_src = leap_f if len(df) > 1 else None
+        print('Saved!')
+    elif os.path.exists(leap_stream_f):
+        if args.tsv:
+            binary_to_tsv(leap_stream_f, leap_f)
+        leap_src = leap_stream_f
+        print('Saved!')
+    else:
+        leap_src = None
+        print('No Leap frames were recorded.')
+    if args.resample is not None and leap_src is not None:
+        print('Resampling glove and Leap data to %g Hz...'%args.resample)
+        # only the glove's channels, not its packet counters
+        glove_channels = sorted(CH_NAMES, key = lambda ch: CH_NAMES[ch])
+        resample_recordings(dict(glove = glove_f, leap = leap_src),
+            join(output_dir, MERGED_OUTPUT_FILE), args.resample,
+            columns = dict(glove = glove_channels))
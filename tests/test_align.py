@@ -0,0 +1,95 @@
+import os
+
+import numpy as np
+import pytest
+
+from glove import CH_NAMES, BinaryLogger, TSVLogger
+from glove.align import (align_run, align_runs, epoch, epoch_trials,
+                            find_runs, volume_means)
+
+CH_LIST = sorted(CH_NAMES, key = lambda ch: CH_NAMES[ch])
+
+
+def _run(run_dir, rate = 100., duration = 30., seed = 0):
+    '''
+    Writes glove.npy (channel j of sample i holds i + j), events.tsv with
+    a trial every 5 s, and TRs.tsv with a volume every 2 s.
+    '''
+    os.makedirs(run_dir, exist_ok = True)
+    rng = np.random.default_rng(seed)
+    timestamps = np.sort(rng.uniform(0, duration, int(rate * duration)))
+    channels = (np.arange(len(timestamps))[:, np.newaxis] + np.arange(14)) % 4096
+    log = BinaryLogger(os.path.join(run_dir, 'glove.npy'), CH_LIST)
+    for x, t in zip(channels, timestamps):
+        log.write_sample(x, t)
+    log.close()
+    onsets = np.arange(2., duration - 5, 5.)
+    names = ['stimuli/%d.jpeg'%(i % 3) for i in range(len(onsets))]
+    log = TSVLogger(os.path.join(run_dir, 'events.tsv'), ['timestamp', 'target_position'])
+    for t, name in zip(onsets, names):
+        log.write(timestamp = t, target_position = name)
+    log.write(timestamp = onsets[-1] + 5, target_position = 'n/a')
+    log.close()
+    trs = np.arange(1., duration, 2.)
+    log = TSVLogger(os.path.join(run_dir, 'TRs.tsv'), ['timestamp'])
+    for t in trs:
+        log.write(timestamp = t)
+    log.close()
+    return channels, timestamps, onsets, np.array(names), trs
+
+@pytest.mark.parametrize('chunk_size', [100, 1 << 20])
+def test_epoch(tmp_path, chunk_size):
+    channels, timestamps, _, _, _ = _run(str(tmp_path))
+    # overlapping, unordered, empty and out-of-range windows
+    starts = np.array([10., 3., 3.5, 20., 100.])
+    ends = np.array([12.5, 4., 4., 20., 101.])
+    data, times, counts = epoch(str(tmp_path / 'glove.npy'), starts, ends,
+                                chunk_size)
+    assert data.dtype == np.float32
+    for i, (t0, t1) in enumerate(zip(starts, ends)):
+        inside = (timestamps >= t0) & (timestamps < t1)
+        assert counts[i] == inside.sum()
+        assert np.array_equal(data[i, :counts[i]], channels[inside])
+        assert np.allclose(times[i, :counts[i]], timestamps[inside] - t0)
+        assert np.all(np.isnan(data[i, counts[i]:]))
+    assert counts[-2:].tolist() == [0, 0]
+
+def test_epoch_trials(tmp_path):
+    _, timestamps, onsets, names, _ = _run(str(tmp_path))
+    data, times, counts, stimuli = epoch_trials(str(tmp_path / 'glove.npy'),
+        str(tmp_path / 'events.tsv'), tmin = -.5)
+    assert stimuli.tolist() == names.tolist()
+    # each epoch lasts until the next onset
+    ends = np.append(onsets[1:], onsets[-1] + 5)
+    expected = [((timestamps >= t0 - .5) & (timestamps < t1)).sum()
+                for t0, t1 in zip(onsets, ends)]
+    assert counts.tolist() == expected
+    assert np.nanmin(times) >= -.5
+    _, _, counts, _ = epoch_trials(str(tmp_path / 'glove.npy'),
+        str(tmp_path / 'events.tsv'), tmax = 1.)
+    assert counts.tolist() == [((timestamps >= t0) & (timestamps < t0 + 1)).sum()
+                                for t0 in onsets]
+
+def test_volume_means(tmp_path):
+    channels, timestamps, _, _, trs = _run(str(tmp_path))
+    means, counts = volume_means(str(tmp_path / 'glove.npy'),
+        str(tmp_path / 'TRs.tsv'), chunk_size = 333)
+    edges = np.append(trs, trs[-1] + 2)
+    for i in range(len(trs)):
+        inside = (timestamps >= edges[i]) & (timestamps < edges[i + 1])
+        assert counts[i] == inside.sum()
+        assert np.allclose(means[i], channels[inside].mean(axis = 0))
+
+def test_align_runs(tmp_path):
+    for run in ('run-01', 'run-02'):
+        _run(str(tmp_path / 'sub-01' / run))
+    runs = find_runs(str(tmp_path))
+    assert [os.path.basename(r) for r in runs] == ['run-01', 'run-02']
+    out = align_runs(runs, n_jobs = 2)
+    with np.load(out[1]) as f:
+        assert set(f.files) == {'trial_data', 'trial_times', 'trial_counts',
+            'stimuli', 'volume_means', 'volume_counts'}
+        assert np.array_equal(f['trial_counts'],
+            epoch_trials(str(tmp_path / 'sub-01' / 'run-02' / 'glove.npy'),
+                str(tmp_path / 'sub-01' / 'run-02' / 'events.tsv'))[2])
+    assert align_run(runs[0], out_name = 'other.npz').endswith('other.npz')
@@ -0,0 +1,37 @@
+import numpy as np
+
+from glove.binary import BinaryLogger, read_binary, binary_to_tsv
+
+
+def test_readable_while_recording(tmp_path):
+    fpath = str(tmp_path / 'glove.npy')
+    log = BinaryLogger(fpath, ['a', 'b'], block_size = 4)
+    for i in range(10):
+        log.write_sample(np.array([i, 2 * i] + [0] * 18, dtype = np.uint16), .5 * i)
+    data = read_binary(fpath) # two full blocks written so far
+    assert np.array_equal(data['a'], np.arange(8))
+    log.close()
+    data = read_binary(fpath)
+    assert np.array_equal(data['b'], 2 * np.arange(10))
+    assert np.array_equal(data['timestamp'], .5 * np.arange(10))
+    assert np.array_equal(np.load(fpath), data)
+
+def test_wide_header(tmp_path):
+    # e.g. raw hand geometry, whose header is longer than np.load allows
+    fpath = str(tmp_path / 'wide.npy')
+    fields = ['column_%d'%i for i in range(600)]
+    log = BinaryLogger(fpath, fields, channel_dtype = '<f8')
+    log.write_sample(np.arange(600.), 1.)
+    log.close()
+    data = read_binary(fpath)
+    assert len(data) == 1
+    assert data['column_599'][0] == 599.
+
+def test_to_tsv(tmp_path):
+    src, dst = str(tmp_path / 'glove.npy'), str(tmp_path / 'glove.tsv')
+    log = BinaryLogger(src, ['a'])
+    log.write(a = 3, timestamp = 1.25)
+    log.close()
+    binary_to_tsv(src, dst)
+    with open(dst) as f:
+        assert f.read() == 'a\ttimestamp\n3\t1.25'
@@ -0,0 +1,100 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from glove import (CH_NAMES, TSVLogger, SimulatedGlove, scale_raw,
+                    scale_recording, snapshot_calibration, write_sidecar)
+from glove.gaps import SEQUENCE_FIELDS
+
+CH_LIST = sorted(CH_NAMES, key = lambda ch: CH_NAMES[ch])
+
+
+def _stepped_glove(autocalibrate):
+    '''
+    SimulatedGlove whose current packet is set by hand.
+    '''
+    glove = SimulatedGlove(rate = 100, seed = 0)
+    glove.open('USB0')
+    packet = [0]
+    glove._packet = lambda: packet[0]
+    glove.setAutoCalibrate(autocalibrate)
+    return glove, packet
+
+@pytest.mark.parametrize('autocalibrate', [False, True])
+def test_scale_raw(autocalibrate):
+    glove, packet = _stepped_glove(autocalibrate)
+    glove.resetCalibrationAll()
+    start = snapshot_calibration(glove)
+    raw, scaled = [], []
+    for k in range(50):
+        packet[0] = k
+        raw.append(glove.getSensorRawAll()[:14])
+        scaled.append(glove.getSensorScaledAll()[:14])
+    glove.close()
+    assert np.allclose(scale_raw(raw, start['upper'], start['lower'],
+                                    autocalibrate), scaled)
+    assert np.allclose(scale_raw(raw[-1], start['upper'], start['lower']),
+                        scale_raw([raw[-1]], start['upper'], start['lower'])[0])
+
+def _recording(fpath, raw, samples, calibration, missed = None):
+    log = TSVLogger(fpath, CH_LIST + ['timestamp']
+                    + [n for n, _ in SEQUENCE_FIELDS])
+    missed = np.zeros(len(raw), dtype = int) if missed is None else missed
+    for i, (row, sample) in enumerate(zip(raw, samples)):
+        log.write_row(tuple(row) + (i / 100, sample, missed[i]))
+    log.close()
+    write_sidecar(fpath, calibration = calibration)
+    return fpath
+
+@pytest.fixture
+def raw():
+    return np.random.default_rng(0).integers(1000, 3000, (100, 14))
+
+def _calibration(raw, autocalibrate = True):
+    start = dict(upper = [2000] * 14, lower = [1999] * 14)
+    end = start
+    if autocalibrate:
+        end = dict(upper = np.maximum(raw.max(axis = 0), 2000).tolist(),
+                    lower = np.minimum(raw.min(axis = 0), 1999).tolist())
+    return dict(autocalibrate = autocalibrate, start = start, end = end)
+
+def test_scale_recording(tmp_path, raw):
+    calibration = _calibration(raw)
+    fpath = _recording(str(tmp_path / 'glove.tsv'), raw, range(100), calibration)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        scaled, timestamps = scale_recording(fpath)
+    assert np.allclose(scaled, scale_raw(raw, calibration['start']['upper'],
+                                        calibration['start']['lower'], True))
+    assert len(timestamps) == 100
+
+def test_missing_packets(tmp_path, raw):
+    calibration = _calibration(raw)
+    # 3 packets missed by the driver and 2 samples lost after reading
+    missed = np.zeros(100, dtype = int)
+    missed[10] = 3
+    samples = np.r_[0:50, 52:102]
+    fpath = _recording(str(tmp_path / 'glove.tsv'), raw, samples, calibration,
+                        missed)
+    with pytest.warns(UserWarning, match = 'missing 5 packets'):
+        scale_recording(fpath)
+    # without autocalibration, missed packets do not change the bounds
+    calibration = _calibration(raw, autocalibrate = False)
+    fpath = _recording(str(tmp_path / 'fixed.tsv'), raw, samples, calibration,
+                        missed)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        scale_recording(fpath)
+
+def test_end_mismatch(tmp_path, raw):
+    calibration = _calibration(raw)
+    calibration['end']['upper'][0] += 1 # widened by a packet we do not have
+    fpath = _recording(str(tmp_path / 'glove.tsv'), raw, range(100), calibration)
+    with pytest.warns(UserWarning, match = 'differ'):
+        scale_recording(fpath)
+
+def test_no_calibration(tmp_path, raw):
+    fpath = _recording(str(tmp_path / 'glove.tsv'), raw, range(100), None)
+    with pytest.raises(ValueError):
+        scale_recording(fpath)
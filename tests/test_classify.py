@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from glove import CH_NAMES, TSVLogger
+from glove.binary import glove_dtype
+from glove.classify import GestureClassifier, StreamingClassifier, label_samples
+
+CH_LIST = sorted(CH_NAMES, key = lambda ch: CH_NAMES[ch])
+GESTURES = np.array(['fist', 'open', 'point'])
+# one hand posture (raw values) per gesture
+POSTURES = np.random.default_rng(1).integers(500, 3500, (len(GESTURES), 14))
+
+
+def _samples(labels, rng, noise = 150):
+    idx = np.searchsorted(GESTURES, labels)
+    X = POSTURES[idx] + rng.normal(0, noise, (len(idx), 14))
+    return np.clip(X, 0, 4095).astype(np.uint16)
+
+def _session(tmp_path, seed = 0, n_trials = 12, trial = 2., rate = 50):
+    '''
+    Writes a glove.tsv and events.tsv in which the hand takes on each
+    stimulus's gesture .5 s after its onset.
+    '''
+    rng = np.random.default_rng(seed)
+    names = GESTURES[rng.integers(0, len(GESTURES), n_trials)]
+    onsets = 10 + trial * np.arange(n_trials)
+    events_f = str(tmp_path / 'events.tsv')
+    events = TSVLogger(events_f, ['timestamp', 'target_position'])
+    for t, name in zip(onsets, names):
+        events.write(timestamp = t, target_position = name)
+    events.write(timestamp = onsets[-1] + trial, target_position = 'n/a')
+    events.close()
+    timestamps = np.arange(9, onsets[-1] + trial + 1, 1 / rate)
+    held = np.searchsorted(onsets + .5, timestamps, side = 'right') - 1
+    X = _samples(names[np.maximum(held, 0)], rng)
+    glove_f = str(tmp_path / 'glove.tsv')
+    glove = TSVLogger(glove_f, CH_LIST + ['timestamp'])
+    for x, t in zip(X.tolist(), timestamps.tolist()):
+        glove.write_row(x + [t])
+    glove.close()
+    return glove_f, events_f
+
+def test_label_samples():
+    onsets = np.array([1., 3., 5.])
+    names = np.array(['a', 'b', 'n/a'])
+    t = np.array([0., 1.5, 2.5, 3.2, 4.9, 5., 6.])
+    labels, valid = label_samples(t, onsets, names, settle = 1.)
+    assert labels[valid].tolist() == ['a', 'b']
+    assert valid.tolist() == [False, False, True, False, True, False, False]
+
+def test_fit_predict(tmp_path):
+    rng = np.random.default_rng(0)
+    y = GESTURES[rng.integers(0, 3, 3000)]
+    clf = GestureClassifier().fit(_samples(y, rng), y)
+    y_test = GESTURES[rng.integers(0, 3, 500)]
+    X_test = _samples(y_test, rng)
+    labels, confidence = clf.predict(X_test)
+    assert np.mean(labels == y_test) > .99
+    proba = clf.predict_proba(X_test)
+    assert np.allclose(proba.sum(axis = 1), 1)
+    assert np.array_equal(confidence, proba.max(axis = 1))
+    clf.save(str(tmp_path / 'model.npz'))
+    loaded = GestureClassifier.load(str(tmp_path / 'model.npz'))
+    assert np.array_equal(loaded.predict_proba(X_test), proba)
+
+def test_constant_channel():
+    # a sensor that never moves must not make the covariance singular
+    rng = np.random.default_rng(0)
+    y = GESTURES[rng.integers(0, 3, 300)]
+    X = _samples(y, rng)
+    X[:, 3] = 1000
+    labels, _ = GestureClassifier().fit(X, y).predict(X)
+    assert np.mean(labels == y) > .99
+
+def test_fit_sessions(tmp_path):
+    sessions = []
+    for seed in range(2):
+        run = tmp_path / ('run-%d'%seed)
+        run.mkdir()
+        sessions.append(_session(run, seed))
+    clf = GestureClassifier().fit_sessions(sessions, settle = 1.)
+    assert clf.classes_.tolist() == GESTURES.tolist()
+    rng = np.random.default_rng(5)
+    y = GESTURES[rng.integers(0, 3, 200)]
+    assert np.mean(clf.predict(_samples(y, rng))[0] == y) > .99
+
+@pytest.mark.parametrize('contiguous', [True, False])
+def test_streaming(contiguous):
+    rng = np.random.default_rng(0)
+    y = GESTURES[rng.integers(0, 3, 3000)]
+    stream = StreamingClassifier(GestureClassifier().fit(_samples(y, rng), y),
+                                    settle = 1.)
+    rows = np.zeros(200, dtype = glove_dtype(CH_LIST))
+    X = _samples(np.repeat(['open', 'point'], 100), rng)
+    for j, ch in enumerate(CH_LIST):
+        rows[ch] = X[:, j]
+    rows['timestamp'] = np.arange(200) / 100
+    if not contiguous:
+        rows = rows[::2]
+    stream.set_target('point', timestamp = 0.)
+    labels, confidence = stream.update(rows)
+    assert len(labels) == len(rows)
+    assert stream.prediction == 'point'
+    # only samples from 1 s after the onset are scored
+    assert stream.n_scored == len(rows) // 2
+    assert stream.accuracy == 1.
+    assert len(stream.update(rows[:0])[0]) == 0
@@ -0,0 +1,30 @@
+from multiprocessing import Process, Queue
+import json
+
+from glove import Clock
+
+
+def _read_clock(queue):
+    clock = Clock()
+    queue.put(clock.time())
+
+def test_shared_zero():
+    # a reading taken in another process falls between two in this one
+    clock = Clock()
+    queue = Queue()
+    proc = Process(target = _read_clock, args = (queue,))
+    before = clock.time()
+    proc.start()
+    t_child = queue.get(timeout = 30)
+    proc.join()
+    after = clock.time()
+    assert before <= t_child <= after
+
+def test_monotonic_and_metadata():
+    clock = Clock(n_calibration = 100)
+    t = [clock.time() for _ in range(1000)]
+    assert all(b >= a for a, b in zip(t, t[1:]))
+    meta = clock.metadata()
+    json.dumps(meta)
+    assert meta['offset_uncertainty_ns'] >= 0
+    assert 0 < meta['read_overhead_ns'] < 1e5
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from glove import CH_NAMES
+from glove.compressed import (CODECS, CompressedLogger, compressed_to_tsv,
+    read_compressed, tsv_to_compressed)
+from glove.logging import TSVLogger
+
+CH_LIST = sorted(CH_NAMES, key = lambda ch: CH_NAMES[ch])
+
+
+def _write_tsv(fpath, n = 5000, seed = 0):
+    rng = np.random.default_rng(seed)
+    channels = rng.integers(0, 4096, (n, len(CH_LIST)))
+    timestamps = 1000 + np.cumsum(rng.uniform(.01, .02, n))
+    log = TSVLogger(fpath, CH_LIST + ['timestamp', 'sample', 'missed'])
+    for i in range(n):
+        log.write_row(channels[i].tolist() + [timestamps[i].item(), i, 0])
+    log.close()
+    return channels, timestamps
+
+@pytest.mark.parametrize('codec', list(CODECS))
+def test_tsv_round_trip(tmp_path, codec):
+    src, dcz, dst = (str(tmp_path / f) for f in ('a.tsv', 'a.dcz', 'b.tsv'))
+    channels, timestamps = _write_tsv(src)
+    tsv_to_compressed(src, dcz, codec = codec, block_size = 1000)
+    data = read_compressed(dcz)
+    assert np.array_equal(data['timestamp'], timestamps)
+    assert np.array_equal(np.stack([data[ch] for ch in CH_LIST], axis = 1), channels)
+    assert np.array_equal(data['sample'], np.arange(len(data)))
+    compressed_to_tsv(dcz, dst)
+    with open(src) as a, open(dst) as b:
+        assert a.read() == b.read()
+
+@pytest.mark.parametrize('background', [False, True])
+def test_logger_partial_chunk(tmp_path, background):
+    fpath = str(tmp_path / 'glove.dcz')
+    log = CompressedLogger(fpath, CH_LIST, block_size = 64,
+        background = background, extra_fields = [('sample', '<u8')])
+    vals = np.arange(20, dtype = np.uint16)
+    for i in range(150):
+        log.write_sample(vals, float(i), i)
+    log.close()
+    data = read_compressed(fpath)
+    assert len(data) == 150
+    assert np.array_equal(data['sample'], np.arange(150))
+    assert np.array_equal(data['timestamp'], np.arange(150.))
+    assert np.array_equal(data[CH_LIST[-1]], np.full(150, len(CH_LIST) - 1))
+
+@pytest.mark.parametrize('background', [False, True])
+def test_write_block(tmp_path, background):
+    fpath = str(tmp_path / 'glove.dcz')
+    log = CompressedLogger(fpath, ['a'], block_size = 64,
+                            background = background)
+    for i in range(10): # still buffered when the block comes in
+        log.write_sample([i], float(i))
+    rows = np.zeros(100, dtype = log.dtype)
+    rows['a'] = rows['timestamp'] = np.arange(10, 110)
+    log.write_block(rows)
+    rows['a'] = 0 # the logger has its own copy
+    with pytest.raises(ValueError):
+        log.write_block(np.zeros(1, dtype = [('b', '<u2'), ('timestamp', '<f8')]))
+    log.close()
+    data = read_compressed(fpath)
+    assert np.array_equal(data['a'], np.arange(110))
+    assert np.array_equal(data['timestamp'], np.arange(110.))
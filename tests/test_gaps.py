@@ -0,0 +1,75 @@
+import numpy as np
+
+from glove import BinaryLogger, TSVLogger, check_logs, check_recording, write_sidecar
+from glove.gaps import SEQUENCE_FIELDS, GapEstimator, sequence_numbers
+
+
+def test_gap_estimator():
+    calls = []
+    def rate():
+        calls.append(1)
+        return 100 if len(calls) > 1 else 0 # unknown at first
+    gaps = GapEstimator(rate, refresh_interval = 1.)
+    t = np.r_[np.arange(0, 200), 203, 202.9, np.arange(204, 300)] * .01
+    missed = [gaps(ti) for ti in t]
+    # called with the first sample, then once a second
+    assert len(calls) == 3 and gaps.rate == 100
+    assert sum(missed[:101]) == 0 # no rate yet until t = 1
+    assert missed[200] == 3 # 1.99 -> 2.03
+    assert missed[201] == 0 # the clock going back is not a gap
+    assert sum(missed) == 3
+
+def test_fixed_rate():
+    gaps = GapEstimator(100)
+    assert [gaps(t) for t in [0., .01, .05, .06]] == [0, 0, 3, 0]
+
+def test_sequence_numbers():
+    t = np.array([0., .01, .02, .05, .05, .04, .06])
+    seq, missed = sequence_numbers(t, 100)
+    assert seq.tolist() == [0, 1, 2, 5, 5, 5, 7]
+    assert missed.tolist() == [0, 0, 0, 2, 0, 0, 1]
+
+def _recording(fpath, timestamps, samples, rate = 100):
+    log = TSVLogger(fpath, ['a', 'timestamp'] + [n for n, _ in SEQUENCE_FIELDS])
+    for t, i in zip(timestamps, samples):
+        log.write_row((0, t, i, 0))
+    log.close()
+    write_sidecar(fpath, packet_rate = rate)
+    return fpath
+
+def test_check_recording(tmp_path):
+    t = np.arange(1000) * .01
+    ok = check_recording(_recording(str(tmp_path / 'glove.tsv'), t, range(1000)))
+    assert ok['ok'] and ok['lost'] == 0 and ok['counter_errors'] == 0
+    assert ok['samples'] == 1000 and ok['missed'] == 0
+    # 20 samples lost after reading (queue drops): a jump in the counter
+    # and a gap in time
+    keep = np.r_[0:500, 520:1000]
+    lost = check_recording(_recording(str(tmp_path / 'lost.tsv'), t[keep], keep))
+    assert lost['lost'] == 20 and lost['missed'] == 20
+    assert not lost['ok'] # 2% missed
+    assert check_recording(str(tmp_path / 'lost.tsv'), max_missed = .05)['ok']
+    # a counter that repeats fails the check even without gaps in time
+    samples = np.r_[0:500, 499:998]
+    bad = check_recording(_recording(str(tmp_path / 'bad.tsv'), t[:999], samples))
+    assert bad['counter_errors'] == 1 and not bad['ok']
+
+def test_check_logs(tmp_path):
+    run = tmp_path / 'sub-01' / 'run-01'
+    run.mkdir(parents = True)
+    t = np.arange(300) * .01
+    _recording(str(run / 'glove.tsv'), t, range(300))
+    log = BinaryLogger(str(run / 'glove_left.npy'), ['a'],
+                        extra_fields = SEQUENCE_FIELDS)
+    for i, ti in enumerate(t[::2]): # every other packet missed
+        log.write_sample([0], ti, i, 1)
+    log.close()
+    write_sidecar(str(run / 'glove_left.npy'), packet_rate = 100)
+    merged = str(run / 'glove_merged.tsv')
+    _recording(merged, t, range(300))
+    write_sidecar(merged, devices = ['left', 'right']) # skipped
+    results = {r['fpath']: r for r in check_logs(str(tmp_path), n_jobs = 2)}
+    assert sorted(results) == [str(run / 'glove.tsv'), str(run / 'glove_left.npy')]
+    assert results[str(run / 'glove.tsv')]['ok']
+    left = results[str(run / 'glove_left.npy')]
+    assert not left['ok'] and left['missed'] == 149 and left['lost'] == 0
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from glove import CH_NAMES, TimeIndex
+from glove.binary import BinaryLogger
+from glove.compressed import CompressedLogger, compressed_to_tsv
+
+CH_LIST = sorted(CH_NAMES, key = lambda ch: CH_NAMES[ch])
+
+
+@pytest.fixture(scope = 'module')
+def recordings(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp('index')
+    rng = np.random.default_rng(1)
+    n = 3000
+    channels = rng.integers(0, 4096, (n, len(CH_LIST))).astype(np.uint16)
+    timestamps = 50 + np.cumsum(rng.uniform(.005, .02, n))
+    fpaths = dict(npy = str(tmp / 'glove.npy'), dcz = str(tmp / 'glove.dcz'))
+    for fmt, fpath in fpaths.items():
+        Logger = BinaryLogger if fmt == 'npy' else CompressedLogger
+        log = Logger(fpath, CH_LIST, block_size = 256, background = False)
+        for c, t in zip(channels, timestamps.tolist()):
+            log.write_sample(c, t)
+        log.close()
+    fpaths['tsv'] = str(tmp / 'glove.tsv')
+    compressed_to_tsv(fpaths['dcz'], fpaths['tsv'])
+    return fpaths, channels, timestamps
+
+@pytest.mark.parametrize('fmt, stride', [('npy', 4096), ('dcz', 4096),
+                                            ('tsv', 7), ('tsv', 4096)])
+def test_windows(recordings, fmt, stride):
+    fpaths, channels, timestamps = recordings
+    index = TimeIndex(fpaths[fmt], stride = stride, cache = False)
+    starts = np.array([0., timestamps[0], timestamps[100], timestamps[-5], 1e6])
+    ends = starts + np.array([10., 1., 3., 10., 1.])
+    for t0, t1, (ch, ts) in zip(starts, ends, index.windows(starts, ends)):
+        mask = (timestamps >= t0) & (timestamps < t1)
+        assert np.array_equal(ts, timestamps[mask])
+        assert np.array_equal(ch, channels[mask])
+
+def test_cache_reused(recordings):
+    fpaths, channels, timestamps = recordings
+    TimeIndex(fpaths['tsv'], stride = 64)
+    index = TimeIndex(fpaths['tsv'], stride = 64)
+    ch, ts = index.window(timestamps[10], timestamps[20])
+    assert np.array_equal(ts, timestamps[10:20])
@@ -0,0 +1,42 @@
+import json
+import time
+
+import pytest
+
+from glove.logging import TSVLogger, write_sidecar
+
+
+def _log(fpath, **kwargs):
+    log = TSVLogger(fpath, ['a', 'timestamp'], **kwargs)
+    for i in range(1000):
+        if i % 2:
+            log.write_row((i, i / 8))
+        else:
+            log.write(a = i, timestamp = i / 8)
+    log.write(timestamp = 1.) # missing fields are written as n/a
+    return log
+
+@pytest.mark.parametrize('policy', [dict(), dict(flush_rows = 64),
+                                    dict(flush_bytes = 512), dict(flush_ms = 10)])
+def test_buffered_matches_unbuffered(tmp_path, policy):
+    _log(str(tmp_path / 'direct.tsv')).close()
+    _log(str(tmp_path / 'buffered.tsv'), buffered = True, **policy).close()
+    with open(tmp_path / 'direct.tsv') as a, open(tmp_path / 'buffered.tsv') as b:
+        expected = a.read()
+        assert b.read() == expected
+    assert expected.endswith('\nn/a\t1.0')
+
+def test_flushes_while_open(tmp_path):
+    fpath = str(tmp_path / 'log.tsv')
+    log = _log(fpath, buffered = True, flush_ms = 10)
+    time.sleep(.2)
+    with open(fpath) as f:
+        assert len(f.read().splitlines()) == 1002
+    log.close()
+
+def test_sidecar_keeps_keys(tmp_path):
+    fpath = str(tmp_path / 'log.tsv')
+    write_sidecar(fpath, a = 1, b = [2])
+    write_sidecar(fpath, b = 3)
+    with open(tmp_path / 'log.json') as f:
+        assert json.load(f) == dict(a = 1, b = 3)
@@ -0,0 +1,107 @@
+import json
+
+import numpy as np
+import pytest
+
+from glove import BinaryLogger, TSVLogger, merge_recordings, read_binary, write_sidecar
+from glove.compressed import CompressedLogger, read_compressed
+from glove.merge import _merge_binary
+
+
+def _parts(tmp_path, fmt, n_parts = 3, n = 500, seed = 0):
+    '''
+    Recordings of one channel 'a' holding the part index, at random times
+    (with some timestamps shared between parts).
+    '''
+    rng = np.random.default_rng(seed)
+    parts, times = [], []
+    for i in range(n_parts):
+        t = np.sort(rng.integers(0, 2 * n, n)) / 100.
+        fpath = str(tmp_path / ('part%d.%s'%(i, fmt)))
+        if fmt == 'npy':
+            log = BinaryLogger(fpath, ['a'])
+            for ti in t:
+                log.write_sample([i], ti)
+        elif fmt == 'dcz':
+            log = CompressedLogger(fpath, ['a'], block_size = 64)
+            for ti in t:
+                log.write_sample([i], ti)
+        else:
+            log = TSVLogger(fpath, ['a', 'timestamp'])
+            for ti in t:
+                log.write_row((i, ti))
+        log.close()
+        write_sidecar(fpath, clock = dict(pid = i))
+        parts.append(fpath)
+        times.append(t)
+    return parts, times
+
+def _expected(times):
+    t = np.concatenate(times)
+    device = np.repeat(np.arange(len(times)), [len(ti) for ti in times])
+    order = np.argsort(t, kind = 'stable')
+    return t[order], device[order]
+
+@pytest.mark.parametrize('chunk_size', [7, 65536])
+def test_merge_binary(tmp_path, chunk_size):
+    parts, times = _parts(tmp_path, 'npy')
+    dst = str(tmp_path / 'merged.npy')
+    _merge_binary(parts, dst, ['x', 'y', 'z'], chunk_size = chunk_size)
+    merged = read_binary(dst)
+    t, device = _expected(times)
+    assert merged.dtype['device'] == np.uint16
+    assert np.array_equal(merged['timestamp'], t)
+    # every row is kept as is, with the index of its part
+    assert np.array_equal(merged['a'], merged['device'])
+    assert (sorted(zip(merged['timestamp'].tolist(), merged['device'].tolist()))
+            == sorted(zip(t.tolist(), device.tolist())))
+
+def test_merge_compressed(tmp_path):
+    parts, times = _parts(tmp_path, 'dcz')
+    dst = str(tmp_path / 'merged.dcz')
+    merge_recordings(parts, dst, ['x', 'y', 'z'])
+    merged = read_compressed(dst)
+    t, device = _expected(times)
+    assert merged.dtype['device'] == np.uint16
+    assert np.array_equal(merged['timestamp'], t)
+    assert np.array_equal(merged['a'], merged['device'])
+    assert (sorted(zip(merged['timestamp'].tolist(), merged['device'].tolist()))
+            == sorted(zip(t.tolist(), device.tolist())))
+
+def test_merge_tsv(tmp_path):
+    parts, times = _parts(tmp_path, 'tsv')
+    dst = str(tmp_path / 'merged.tsv')
+    merge_recordings(parts, dst, ['x', 'y', 'z'])
+    with open(dst) as f:
+        header = f.readline().split()
+        rows = [line.split('\t') for line in f.read().splitlines()]
+    t, device = _expected(times)
+    assert header == ['a', 'timestamp', 'device']
+    assert np.array_equal([float(r[1]) for r in rows], t)
+    assert [r[2] for r in rows] == [['x', 'y', 'z'][d] for d in device]
+
+def test_sidecar(tmp_path):
+    parts, _ = _parts(tmp_path, 'npy', n_parts = 2)
+    dst = str(tmp_path / 'merged.npy')
+    merge_recordings(parts, dst, ['left', 'right'])
+    with open(tmp_path / 'merged.json') as f:
+        sidecar = json.load(f)
+    assert sidecar['devices'] == ['left', 'right']
+    assert sidecar['device_metadata']['right'] == dict(clock = dict(pid = 1))
+
+def test_empty_part(tmp_path):
+    parts, times = _parts(tmp_path, 'npy', n_parts = 2)
+    empty = str(tmp_path / 'empty.npy')
+    BinaryLogger(empty, ['a']).close()
+    dst = str(tmp_path / 'merged.npy')
+    merge_recordings([parts[0], empty, parts[1]], dst, ['x', 'y', 'z'])
+    merged = read_binary(dst)
+    assert len(merged) == sum(len(t) for t in times)
+    assert set(merged['device'].tolist()) == {0, 2}
+
+def test_different_columns(tmp_path):
+    parts, _ = _parts(tmp_path, 'npy', n_parts = 1)
+    other = str(tmp_path / 'other.npy')
+    BinaryLogger(other, ['b']).close()
+    with pytest.raises(ValueError):
+        merge_recordings([parts[0], other], str(tmp_path / 'merged.npy'), ['x', 'y'])
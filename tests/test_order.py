@@ -0,0 +1,24 @@
+from collections import Counter
+
+import pytest
+
+from util import generate_order, STIMULI
+
+
+def test_transitions_balanced():
+    order = generate_order(len(STIMULI) * (len(STIMULI) - 1) + 1, seed = 3)
+    pairs = Counter(zip(order[:-1], order[1:]))
+    assert all(a != b for a, b in pairs)
+    assert len(pairs) == len(STIMULI) * (len(STIMULI) - 1)
+    assert set(pairs.values()) == {1}
+
+def test_length_and_seed():
+    assert len(generate_order(120, seed = 1)) == 120
+    assert generate_order(50, seed = 1) == generate_order(50, seed = 1)
+    assert generate_order(5, seed = 1, stimuli = ['a', 'b']) in (
+        ['a', 'b', 'a', 'b', 'a'], ['b', 'a', 'b', 'a', 'b'])
+
+@pytest.mark.parametrize('stimuli', [[], ['a']])
+def test_too_few_stimuli(stimuli):
+    with pytest.raises(ValueError):
+        generate_order(10, stimuli = stimuli)
@@ -0,0 +1,18 @@
+import os
+import subprocess
+import sys
+
+import glove
+
+
+def test_exports_resolve():
+    for name in glove.__all__:
+        assert getattr(glove, name) is not None, name
+
+def test_import_is_lazy():
+    code = ('import sys, glove; glove.Clock; '
+            'print(sorted({"numpy", "multiprocessing", "glove.recorder"} & set(sys.modules)))')
+    out = subprocess.run([sys.executable, '-c', code], capture_output = True,
+                            text = True, check = True,
+                            cwd = os.path.dirname(os.path.dirname(glove.__file__)))
+    assert out.stdout.strip() == '[]'
@@ -0,0 +1,23 @@
+from threading import Thread
+
+from glove import SampleQueue
+
+
+def test_drops_when_full():
+    queue = SampleQueue(maxsize = 3)
+    assert [queue.push(i) for i in range(5)] == [True] * 3 + [False] * 2
+    assert (queue.n_pushed, queue.n_dropped, queue.max_depth) == (3, 2, 3)
+    assert list(queue.drain()) == [0, 1, 2]
+    assert len(queue) == 0
+    assert queue.push(5)
+
+def test_threaded_order():
+    queue = SampleQueue()
+    producer = Thread(target = lambda: [queue.push(i) for i in range(100000)])
+    producer.start()
+    received = []
+    while producer.is_alive() or len(queue):
+        received.extend(queue.drain())
+    producer.join()
+    received.extend(queue.drain())
+    assert received == list(range(100000))
@@ -0,0 +1,38 @@
+import numpy as np
+
+from glove import CH_NAMES, BinaryLogger, TSVLogger
+from glove.readers import read_events, read_glove, read_TRs
+
+CH_LIST = sorted(CH_NAMES, key = lambda ch: CH_NAMES[ch])
+
+
+def test_glove_formats_agree(tmp_path):
+    rng = np.random.default_rng(0)
+    channels = rng.integers(0, 4096, (100, 14)).astype(np.uint16)
+    timestamps = np.cumsum(rng.uniform(.01, .02, 100))
+    tsv = TSVLogger(str(tmp_path / 'glove.tsv'), CH_LIST + ['timestamp'])
+    npy = BinaryLogger(str(tmp_path / 'glove.npy'), CH_LIST)
+    for x, t in zip(channels, timestamps):
+        tsv.write_row(x.tolist() + [t])
+        npy.write_sample(x, t)
+    tsv.close()
+    npy.close()
+    for ext in ('tsv', 'npy'):
+        ch, ts = read_glove(str(tmp_path / ('glove.' + ext)))
+        assert np.array_equal(ch, channels)
+        # pandas parses text timestamps to within an ulp or so
+        assert np.allclose(ts, timestamps, rtol = 1e-14, atol = 0)
+
+def test_events_and_TRs(tmp_path):
+    log = TSVLogger(str(tmp_path / 'events.tsv'), ['timestamp', 'target_position'])
+    log.write(timestamp = 1.5, target_position = 'stimuli/a.jpeg')
+    log.write(timestamp = 6.5, target_position = 'n/a')
+    log.close()
+    onsets, names = read_events(str(tmp_path / 'events.tsv'))
+    assert onsets.tolist() == [1.5, 6.5]
+    assert names.tolist() == ['stimuli/a.jpeg', 'n/a']
+    log = TSVLogger(str(tmp_path / 'TRs.tsv'), ['timestamp'])
+    for t in (1., 3.):
+        log.write(timestamp = t)
+    log.close()
+    assert read_TRs(str(tmp_path / 'TRs.tsv')).tolist() == [1., 3.]
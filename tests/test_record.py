@@ -0,0 +1,66 @@
+from multiprocessing import Event
+import os
+
+import numpy as np
+import pytest
+
+ROSE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        'RoSeMotion', 'app')
+if not os.path.exists(os.path.join(ROSE_DIR, 'LeapData.py')):
+    pytest.skip('RoSeMotion is not checked out', allow_module_level = True)
+
+cwd = os.getcwd()
+import record # changes into RoSeMotion/app
+os.chdir(cwd)
+
+from glove import BinaryLogger, read_binary
+
+
+def _row(rng):
+    row = rng.normal(size = len(record.RAW_FIELDS))
+    row[record.RAW_FIELDS.index('hand_id')] = 7
+    row[record.RAW_FIELDS.index('hand_is_left')] = 0
+    row[record.RAW_FIELDS.index('hand_is_right')] = 1
+    return row
+
+
+def test_capture_restore():
+    row = _row(np.random.default_rng(0))
+    hand = record.restore_hand(row)
+    assert np.array_equal(np.array(record.capture_hand(hand), dtype = float), row)
+    assert hand.id == 7 and hand.is_right and not hand.is_left
+    finger = hand.fingers.finger_type(2)[0]
+    assert finger.tip_position is finger.bone(3).next_joint
+    assert finger.length == sum(finger.bone(b).length for b in range(1, 4))
+    with pytest.raises(AttributeError):
+        hand.sphere_radius
+
+
+def test_deferred_matches_live():
+    '''
+    Both paths give the same channels for the same hands. The hands are
+    rebuilt from random geometry, not recorded with the controller.
+    '''
+    rng = np.random.default_rng(1)
+    frames = [record._Proxy(hands = [record.restore_hand(_row(rng))])
+                for _ in range(20)]
+    live = record.DataHandler(frame_rate = 1/60)
+    deferred = record.DataHandler(frame_rate = 1/60, deferred = True)
+    for frame in frames:
+        live.add_frame(frame)
+        deferred.add_frame(frame)
+    deferred.close()
+    assert live._n_frames == deferred._n_frames == len(frames)
+    n = len(frames)
+    # timestamps differ, channel values must not
+    assert np.array_equal(live._block[:n, :-1], deferred._block[:n, :-1])
+
+
+def test_convert_stream_without_frames(tmp_path):
+    raw_f = str(tmp_path / 'leap_raw.npy')
+    BinaryLogger(raw_f, record.RAW_FIELDS, channel_dtype = '<f8').close()
+    stop = Event()
+    stop.set()
+    record.convert_stream(raw_f, str(tmp_path / 'leap.npy'), stop, interval = 0)
+    assert len(read_binary(raw_f)) == 0
+    assert not os.path.exists(tmp_path / 'leap.npy')
@@ -0,0 +1,145 @@
+'''
+Records from `SimulatedGlove` in a separate process, as with the real glove.
+'''
+import json
+import os
+import time
+
+import numpy as np
+import pytest
+
+from glove import (CH_NAMES, GloveRecorder, MultiGloveRecorder, check_recording,
+                    read_binary, record_from_glove, stats_path)
+
+
+def _read(fpath):
+    '''
+    Channels and timestamps of a recording.
+    '''
+    if fpath.endswith('.npy'):
+        data = read_binary(fpath)
+        return (np.stack([data[ch] for ch in CH_NAMES], axis = 1),
+                np.asarray(data['timestamp']))
+    data = np.loadtxt(fpath, skiprows = 1, ndmin = 2)
+    return data[:, :len(CH_NAMES)], data[:, len(CH_NAMES)]
+
+def _sidecar(fpath):
+    with open(os.path.splitext(fpath)[0] + '.json') as f:
+        return json.load(f)
+
+def _record(fpath, duration = 1., **kwargs):
+    rec = GloveRecorder(fpath, backend = 'simulated',
+        backend_kwargs = dict(rate = 200, seed = 0), **kwargs)
+    rec.start()
+    time.sleep(duration)
+    rec.stop()
+    assert rec._process.exitcode == 0
+    return rec
+
+@pytest.mark.parametrize('fmt', ['tsv', 'npy'])
+@pytest.mark.parametrize('mode', ['poll', 'callback'])
+def test_record(tmp_path, mode, fmt):
+    fpath = str(tmp_path / ('glove.' + fmt))
+    _record(fpath, fmt = fmt, mode = mode)
+    channels, timestamps = _read(fpath)
+    assert channels.shape[1] == len(CH_NAMES)
+    assert 50 < len(timestamps) <= 220
+    assert np.all(np.diff(timestamps) > 0)
+    assert np.all((channels >= 0) & (channels < 4096))
+    sidecar = _sidecar(fpath)
+    assert sidecar['clock']['pid'] != os.getpid()
+    assert sidecar['packet_rate'] == 200
+    # every sample read from the driver was logged, in order
+    gaps = check_recording(fpath)
+    assert gaps['samples'] == len(timestamps)
+    assert gaps['lost'] == gaps['counter_errors'] == 0
+
+@pytest.mark.parametrize('mode', ['poll', 'callback'])
+def test_live_stream(tmp_path, mode):
+    fpath = str(tmp_path / 'glove.npy')
+    rec = GloveRecorder(fpath, fmt = 'npy', mode = mode, backend = 'simulated',
+        backend_kwargs = dict(rate = 200, seed = 0))
+    rec.start()
+    live = []
+    for _ in range(10):
+        time.sleep(.1)
+        live.append(rec.read_new())
+    latest = rec.latest()
+    rec.stop()
+    live = np.concatenate(live)
+    channels, timestamps = _read(fpath)
+    assert rec.n_live_missed == 0
+    assert 0 < len(live) <= len(timestamps)
+    assert np.array_equal(live['timestamp'], timestamps[:len(live)])
+    assert np.array_equal(live['FD_LITTLEFAR'], channels[:len(live), -1])
+    assert latest['timestamp'] in timestamps
+
+@pytest.mark.parametrize('mode', ['poll', 'callback'])
+def test_telemetry(tmp_path, mode):
+    fpath = str(tmp_path / 'glove.npy')
+    rec = _record(fpath, fmt = 'npy', mode = mode, telemetry_interval = .1)
+    _, timestamps = _read(fpath)
+    with open(stats_path(fpath)) as f:
+        stats = json.load(f)
+    assert stats['counts']['samples'] == len(timestamps)
+    assert stats['values']['nominal_rate'] == 200
+    assert stats['info']['mode'] == mode
+    assert rec.telemetry() == stats
+    if mode == 'poll':
+        assert {'read', 'write'} <= set(stats['latency_us'])
+    else:
+        assert 'queue' in stats['latency_us']
+
+def test_telemetry_off(tmp_path):
+    fpath = str(tmp_path / 'glove.npy')
+    rec = _record(fpath, duration = .3, fmt = 'npy')
+    assert not os.path.exists(stats_path(fpath))
+    assert rec.telemetry() is None
+
+def test_unknown_mode(tmp_path):
+    with pytest.raises(ValueError):
+        record_from_glove(None, str(tmp_path / 'glove.tsv'), 'USB0',
+                            backend = 'simulated', mode = 'push')
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        record_from_glove(None, str(tmp_path / 'glove.csv'), 'USB0',
+                            fmt = 'csv', backend = 'simulated')
+
+def test_live_buffer_off(tmp_path):
+    rec = GloveRecorder(str(tmp_path / 'glove.npy'), fmt = 'npy',
+        backend = 'simulated', live_capacity = 0)
+    assert rec.latest() is None
+    rec.start()
+    time.sleep(.3)
+    assert rec.latest() is None
+    assert len(rec.read_new()) == 0
+    rec.stop()
+    assert rec.latest() is None and rec.n_live_missed == 0
+
+@pytest.mark.parametrize('fmt', ['tsv', 'npy'])
+def test_multi_glove(tmp_path, fmt):
+    fpath = str(tmp_path / ('glove.' + fmt))
+    rec = MultiGloveRecorder(fpath, ports = ['USB0', 'USB1'], cpus = None,
+        fmt = fmt, backend = 'simulated', backend_kwargs = dict(rate = 200))
+    rec.start()
+    time.sleep(.5)
+    stats = rec.stats()
+    rec.stop()
+    assert stats['USB1']['samples'] > 0
+    assert rec.stats()['USB1']['samples'] is None
+    parts = [r.fpath for r in rec.recorders]
+    assert parts[0] == str(tmp_path / ('glove_device-USB0.' + fmt))
+    n_parts = sum(len(_read(p)[1]) for p in parts)
+    if fmt == 'npy':
+        merged = read_binary(fpath)
+        assert len(merged) == n_parts
+        assert set(merged['device'].tolist()) == {0, 1}
+        timestamps = merged['timestamp']
+    else:
+        timestamps = np.loadtxt(fpath, skiprows = 1, usecols = len(CH_NAMES))
+        assert len(timestamps) == n_parts
+    assert np.all(np.diff(timestamps) >= 0)
+    sidecar = _sidecar(fpath)
+    assert sidecar['devices'] == ['USB0', 'USB1']
+    assert 'clock' in sidecar['device_metadata']['USB0']
@@ -0,0 +1,78 @@
+import json
+
+import numpy as np
+import pytest
+
+from glove import BinaryLogger, TSVLogger, read_binary, resample_recordings
+from glove.compressed import read_compressed
+
+
+def _ramp(fpath, t, slope = 2.):
+    '''
+    Recording of one channel 'x' = slope * t.
+    '''
+    if fpath.endswith('.npy'):
+        log = BinaryLogger(fpath, ['x'], channel_dtype = '<f8')
+        for ti in t:
+            log.write_sample([slope * ti], ti)
+    else:
+        log = TSVLogger(fpath, ['x', 'timestamp'])
+        for ti in t:
+            log.write_row((slope * ti, ti))
+    log.close()
+    return fpath
+
+@pytest.fixture
+def sources(tmp_path):
+    rng = np.random.default_rng(0)
+    a = np.sort(rng.uniform(1, 11, 2000))
+    b = np.sort(rng.uniform(0, 10, 700))
+    return dict(a = _ramp(str(tmp_path / 'a.tsv'), a),
+                b = _ramp(str(tmp_path / 'b.npy'), b, slope = -1.)), a, b
+
+def test_linear(tmp_path, sources):
+    sources, a, b = sources
+    dst = str(tmp_path / 'merged.npy')
+    n = resample_recordings(sources, dst, 50., max_gap = 1.)
+    out = read_binary(dst)
+    assert n == len(out)
+    t = out['timestamp']
+    # the grid lies within both recordings
+    assert t[0] == max(a[0], b[0]) and t[-1] <= min(a[-1], b[-1])
+    assert np.allclose(np.diff(t), 1 / 50.)
+    assert out['a_valid'].all() and out['b_valid'].all()
+    assert np.allclose(out['a_x'], 2 * t)
+    assert np.allclose(out['b_x'], -t)
+    with open(tmp_path / 'merged.json') as f:
+        assert json.load(f)['columns'] == dict(a = ['x'], b = ['x'])
+
+def test_chunking(tmp_path, sources):
+    sources, _, _ = sources
+    whole, chunked = str(tmp_path / 'whole.npy'), str(tmp_path / 'chunked.npy')
+    # (the default max_gap is estimated from the first chunk)
+    resample_recordings(sources, whole, 37., max_gap = .05)
+    resample_recordings(sources, chunked, 37., max_gap = .05,
+                        chunk_size = 11, block_size = 13)
+    whole, chunked = read_binary(whole), read_binary(chunked)
+    assert whole.dtype == chunked.dtype and len(whole) == len(chunked)
+    for name in whole.dtype.names:
+        assert np.array_equal(whole[name], chunked[name], equal_nan = True)
+
+def test_hold_and_gap(tmp_path):
+    t = np.r_[np.arange(0, 5, .1), np.arange(8, 10, .1)]
+    src = _ramp(str(tmp_path / 'a.npy'), t)
+    dst = str(tmp_path / 'held.dcz')
+    resample_recordings(dict(a = src), dst, 7., method = 'hold')
+    out = read_compressed(dst)
+    gap = (out['timestamp'] > 4.9 + 5 * .1) & (out['timestamp'] < 8)
+    assert gap.any()
+    assert not out['a_valid'][gap].any()
+    assert np.isnan(out['a_x'][gap]).all()
+    ok = out['a_valid'] == 1
+    held = t[np.searchsorted(t, out['timestamp'][ok], side = 'right') - 1]
+    assert np.allclose(out['a_x'][ok], 2 * held)
+
+def test_bad_method(tmp_path, sources):
+    sources, _, _ = sources
+    with pytest.raises(ValueError):
+        resample_recordings(sources, str(tmp_path / 'x.npy'), 10., method = 'cubic')
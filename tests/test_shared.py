@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from glove import SharedRing
+
+
+@pytest.fixture
+def ring():
+    ring = SharedRing(capacity = 8, fields = ['a', 'b'])
+    yield ring
+    ring.close()
+
+def _write(ring, start, stop):
+    for i in range(start, stop):
+        ring.write_sample(np.array([i, 2 * i], dtype = np.uint16), float(i))
+
+def test_read_since(ring):
+    assert ring.latest() is None
+    _write(ring, 0, 5)
+    rows, first, end = ring.read_since(0)
+    assert (first, end) == (0, 5)
+    assert np.array_equal(rows['a'], np.arange(5))
+    assert ring.latest()['timestamp'] == 4.
+
+def test_reader_falls_behind(ring):
+    _write(ring, 0, 20)
+    rows, first, end = ring.read_since(3)
+    # the oldest rows were overwritten, and one more is kept free for the writer
+    assert (first, end) == (13, 20)
+    assert np.array_equal(rows['b'], 2 * np.arange(13, 20))
+
+def test_attach_by_name(ring):
+    _write(ring, 0, 3)
+    reader = SharedRing(name = ring.name, fields = ['a', 'b'])
+    assert reader.capacity == 8 and reader.count == 3
+    assert reader.latest()['a'] == 2
+    reader.close()
+    with pytest.raises(ValueError):
+        SharedRing(name = ring.name, fields = ['a'])
@@ -0,0 +1,65 @@
+import time
+
+import numpy as np
+import pytest
+
+from glove import CH_NAMES, BinaryLogger, load_glove, SimulatedGlove
+
+CH_LIST = sorted(CH_NAMES, key = lambda ch: CH_NAMES[ch])
+
+
+def test_packet_schedule():
+    glove = SimulatedGlove(rate = 200, seed = 0)
+    glove.open('USB0')
+    n = 0
+    t_end = time.perf_counter() + .5
+    while time.perf_counter() < t_end:
+        n += glove.newData()
+    glove.close()
+    assert 90 <= n <= 101
+    assert glove.getPacketRate() == 200
+
+def test_replays_recording(tmp_path):
+    fpath = str(tmp_path / 'glove.npy')
+    values = np.arange(10 * 14, dtype = np.uint16).reshape(10, 14)
+    log = BinaryLogger(fpath, CH_LIST)
+    for i, row in enumerate(values):
+        log.write_sample(row, i / 50)
+    log.close()
+    glove = load_glove('simulated', source = fpath)
+    assert glove.rate == 50
+    glove.open('USB0')
+    raw = glove.getSensorRawAll()
+    assert len(raw) == 20
+    assert raw[:14] in values.tolist()
+    upper, lower = glove.getCalibrationAll()
+    assert upper[:14] == values.max(axis = 0).tolist()
+    assert lower[:14] == values.min(axis = 0).tolist()
+
+def test_reads_in_place():
+    glove = SimulatedGlove(rate = 1000, seed = 0)
+    glove.open('USB0')
+    raw = np.zeros(20, dtype = np.uint16)
+    assert glove.getSensorRawAll(raw) is raw
+    scaled = np.zeros(20, dtype = np.float32)
+    glove.getSensorScaledAll(scaled)
+    assert np.all((scaled >= 0) & (scaled <= 1))
+    upper, lower = np.zeros((2, 20), dtype = np.uint16)
+    glove.getCalibrationAll(upper, lower)
+    assert np.all(upper[:14] >= lower[:14])
+
+def test_block_timestamps_after_read():
+    glove = SimulatedGlove(rate = 500, seed = 0)
+    clock = time.perf_counter
+    block = np.zeros((50, 20), dtype = np.uint16)
+    timestamps = np.zeros(50)
+    glove.open('USB0')
+    t0 = clock()
+    assert glove.getSensorRawBlock(block, timestamps, clock) == 50
+    assert timestamps[0] >= t0 and np.all(np.diff(timestamps) > 0)
+    # each timestamp falls in the packet period of the sample it was read with
+    packets = ((timestamps - glove._t0) * glove.rate).astype(int)
+    expected = glove._data[packets % len(glove._data)]
+    assert np.mean(np.all(block == expected, axis = 1)) > .9
+    with pytest.raises(ValueError):
+        glove.getSensorRawBlock(block, timestamps)
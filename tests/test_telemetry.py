@@ -0,0 +1,56 @@
+import json
+
+import numpy as np
+
+from glove import Telemetry, stats_path
+
+
+def test_stats_path():
+    assert stats_path('logs/run-01/glove.tsv') == 'logs/run-01/glove_stats.json'
+
+def test_tick():
+    tel = Telemetry('unused.json')
+    t = np.r_[np.arange(10), 13, 13.1, np.arange(14, 20)] * .01
+    for ti in t: # nothing is counted as missed before the rate is known
+        tel.tick(ti)
+    assert tel.counts == dict(samples = len(t), missed = 0, duplicates = 0)
+    tel = Telemetry('unused.json')
+    tel.set_rate(100)
+    for ti in t:
+        tel.tick(ti)
+    # 9 -> 13 skips three packets, 13 -> 13.1 is a duplicate read
+    assert tel.counts == dict(samples = len(t), missed = 3, duplicates = 1)
+    assert tel.values['nominal_rate'] == 100
+
+def test_snapshot():
+    tel = Telemetry('unused.json', n_latencies = 4, port = 'USB0')
+    tel.count('dropped', 2)
+    tel.set('driver', 'simulated')
+    for x in [1e-6, 2e-6, 3e-6, 4e-6, 100e-6]: # the oldest one is overwritten
+        tel.latency('read', x)
+    tel.gauge('depth', lambda: 5)
+    tel.gauge('broken', lambda: 1 / 0)
+    stats = tel.snapshot()
+    assert stats['info'] == dict(port = 'USB0')
+    assert stats['counts']['dropped'] == 2
+    assert stats['values'] == dict(driver = 'simulated')
+    assert stats['gauges']['depth'] == 5
+    assert 'ZeroDivisionError' in stats['gauges']['broken']
+    read = stats['latency_us']['read']
+    assert read['n'] == 5
+    assert np.isclose(read['max'], 100) and np.isclose(read['p50'], 3.5)
+    assert stats['rates_per_s'] == dict() # needs a previous snapshot
+    tel.tick(0.)
+    assert tel.snapshot()['rates_per_s']['samples'] > 0
+
+def test_write_and_close(tmp_path):
+    fpath = str(tmp_path / 'glove_stats.json')
+    tel = Telemetry(fpath, interval = .01).start()
+    for i in range(100):
+        tel.tick(i * .01)
+    tel.close()
+    tel.close()
+    with open(fpath) as f:
+        stats = json.load(f)
+    assert stats['counts']['samples'] == 100
+    assert not (tmp_path / 'glove_stats.json.tmp').exists()
@@ -1,15 +1,13 @@
-from multiprocessing import Process, Event 
+from collections import namedtuple
 import numpy as np
 import os
 
-from psychopy.hardware.keyboard import Keyboard
-from psychopy import visual, core
-from psychtoolbox import hid
-
-from glove import WinClock
-from glove.logging import TSVLogger
+from glove import Clock, Telemetry, stats_path
+from glove.logging import TSVLogger, write_sidecar
 
 def init_keyboard(dev_name = 'Dell Dell USB Entry Keyboard'):
+    from psychopy.hardware.keyboard import Keyboard
+    from psychtoolbox import hid
     devs = hid.get_keyboard_indices()
     idxs = devs[0]
     names = devs[1]
@@ -21,10 +19,119 @@ def init_keyboard(dev_name = 'Dell Dell USB Entry Keyboard'):
         )
     return Keyboard(idx)
 
+
+# the attributes of psychopy's KeyPress that `record_TRs` uses: `tDown` is
+# absolute, `rt` is relative to the keyboard clock's last reset
+KeyPress = namedtuple('KeyPress', ['name', 'tDown', 'rt'])
+
+class _KeyboardClock:
+    '''
+    Resettable clock like psychopy's `Keyboard.clock`: `getTime` counts
+    from the last `reset`, `getLastResetTime` is absolute.
+    '''
+
+    def __init__(self, time):
+        self._time = time
+        self.reset()
+
+    def reset(self):
+        self._reset_time = self._time()
+
+    def getLastResetTime(self):
+        return self._reset_time
+
+    def getTime(self):
+        return self._time() - self._reset_time
+
+class SimulatedKeyboard:
+    '''
+    Stands in for the scanner's trigger keyboard: presses `key` once per TR,
+    with optional jitter and missed pulses, so TR capture can be tested and
+    benchmarked away from the scanner.
+
+    Like psychopy's `Keyboard`, `clock` counts from its last reset (when
+    the keyboard is created), key presses have an absolute `tDown` (on
+    `Clock`'s timebase, standing in for psychtoolbox's) and an `rt`
+    relative to that reset. The full trigger schedule (including missed
+    pulses), on `Clock`'s timebase, can be written to a TSV file to compare
+    with the TR log.
+    '''
+
+    def __init__(self, key = 't', tr = 2., jitter = 0., p_missed = 0.,
+                    start_delay = 1., n_TRs = 10000, seed = None,
+                    schedule_fpath = None):
+        '''
+        Parameters
+        ----------
+        key : str
+            Key to press, e.g. `MRI_EMULATED_KEY`.
+        tr : float
+            Seconds between triggers.
+        jitter : float
+            Standard deviation (seconds) of Gaussian noise added to each
+            trigger time.
+        p_missed : float
+            Probability that a trigger is never sent.
+        start_delay : float
+            Seconds from now until the first trigger.
+        n_TRs : int
+            Length of the schedule.
+        seed : int | None
+        schedule_fpath : str | None
+            If given, the schedule is saved there with columns 'timestamp'
+            and 'missed'.
+        '''
+        self._time = Clock().time
+        self.clock = _KeyboardClock(self._time)
+        rng = np.random.default_rng(seed)
+        t0 = self._time() + start_delay
+        times = t0 + tr * np.arange(n_TRs) + rng.normal(0, jitter, n_TRs)
+        self.times = np.sort(times)
+        self.missed = rng.random(n_TRs) < p_missed
+        self.key = key
+        self._sent = self.times[~self.missed]
+        self._next = 0
+        if schedule_fpath is not None:
+            log = TSVLogger(schedule_fpath, ['timestamp', 'missed'])
+            for t, missed in zip(self.times.tolist(), self.missed.astype(int).tolist()):
+                log.write_row((t, missed))
+            log.close()
+            write_sidecar(schedule_fpath, tr = tr, jitter = jitter,
+                            p_missed = p_missed, seed = seed)
+
+    def getKeys(self, keyList = None, waitRelease = False, clear = True):
+        if keyList is not None and self.key not in keyList:
+            return []
+        end = np.searchsorted(self._sent, self._time(), side = 'right')
+        t0 = self.clock.getLastResetTime()
+        keys = [KeyPress(self.key, t, t - t0)
+                for t in self._sent[self._next:end].tolist()]
+        if clear:
+            self._next = end
+        return keys
+
+
+# backend name -> function returning a keyboard with psychopy's `getKeys`
+KEYBOARDS = {
+    'hid': init_keyboard,
+    'simulated': SimulatedKeyboard,
+}
+
+def load_keyboard(backend = 'hid', **kwargs):
+    '''
+    Opens a keyboard backend: 'hid' for a real device (`init_keyboard`, which
+    takes `dev_name`) or 'simulated' for `SimulatedKeyboard`.
+    '''
+    if backend not in KEYBOARDS:
+        raise ValueError('Unknown keyboard backend %r. Available backends are %s.'%(
+            backend, ', '.join(KEYBOARDS)))
+    return KEYBOARDS[backend](**kwargs)
+
 def fixation(win, t):
     '''
     displays a fixation cross for `t` seconds
     '''
+    from psychopy import visual, core
     cross = visual.TextStim(win, text = '+', color = WHITE, height = MASK_SIZE / 10)
     cross.draw()
     win.flip()
@@ -39,6 +146,7 @@ def _display_text(win, txt, **txt_kwargs):
     txt : str
         Text to display.
     '''
+    from psychopy import visual
     msg = visual.TextStim(
         win,
         text = txt,
@@ -67,61 +175,180 @@ def show_instructions(win, kb, msg, max_width = None):
     _display_text(win, msg, wrapWidth = max_width)
     _wait_for_key(kb)
 
-def _generate_order():
-
-    # gather stimuli and possible transitions between them
-    positions = [os.path.join('stimuli', 'image_%d.jpeg'%i) for i in range(1, 9)]
-    transitions = {pos: [p for p in positions if p != pos] for pos in positions}
-
-    pos_list = []
-    pos_list.append(np.random.choice(positions)) # start on a random position
-    # then exhaust all possible transitions
-    for i in range(len(positions) * (len(positions) - 1)):
-        np.random.shuffle(transitions[pos_list[-1]])
-        next_pos = transitions[pos_list[-1]].pop()
-        pos_list.append(next_pos)
-
-    return pos_list
-
-def generate_order():
-    '''
-    exhausts all possible transitions in random order, and then does it again
-    '''
-    order = []
-    while len(order) < 120:
-        try:
-            order += _generate_order()
-        except:
-            continue
-    order = order[:120]
-    return order
-
-def record_TRs(stop_event, start_event, fname, kb_name, mri_key):
-    clock = WinClock()
-    kb = init_keyboard(kb_name)
-    log = TSVLogger(fname, ['timestamp'])
-    first_tr = True
-    try: # in case we're interrupted by main process
-        while True:
-            assert(not stop_event.is_set())
+class StimulusCache:
+    '''
+    Loads each stimulus image once, so that showing it during the task
+    only costs a draw call instead of decoding a JPEG before every flip.
+    '''
+
+    def __init__(self, win, fpaths, **stim_kwargs):
+        '''
+        Parameters
+        ----------
+        win : psychopy.visual.Window
+        fpaths : list of str
+            Images to preload; duplicates are loaded once.
+        **stim_kwargs
+            Passed to `visual.ImageStim`.
+        '''
+        from psychopy import visual
+        self._stims = dict()
+        for fpath in fpaths:
+            if fpath not in self._stims:
+                stim = visual.ImageStim(win, fpath, **stim_kwargs)
+                stim.draw() # forces the texture upload now
+                self._stims[fpath] = stim
+        win.clearBuffer() # nothing drawn here should ever be shown
+
+    def __getitem__(self, fpath):
+        return self._stims[fpath]
+
+    def __len__(self):
+        return len(self._stims)
+
+STIMULI = [os.path.join('stimuli', 'image_%d.jpeg'%i) for i in range(1, 9)]
+
+def _eulerian_circuit(n, start, rng):
+    '''
+    Random Eulerian circuit over the complete directed graph on `n` nodes
+    (no self-loops), i.e. a walk from `start` back to `start` that takes
+    every transition between two different nodes exactly once.
+
+    Uses Hierholzer's algorithm with each node's outgoing edges in random
+    order, so it runs in time linear in the n * (n - 1) transitions and
+    never dead-ends.
+    '''
+    out = [[j for j in rng.permutation(n).tolist() if j != i] for i in range(n)]
+    stack = [start]
+    circuit = []
+    while stack:
+        edges = out[stack[-1]]
+        if edges:
+            stack.append(edges.pop())
+        else:
+            circuit.append(stack.pop())
+    return circuit[::-1]
+
+def generate_order(n_trials = 120, seed = None, stimuli = STIMULI):
+    '''
+    Exhausts all possible transitions between stimuli in random order,
+    and then does it again, until there are `n_trials` trials.
+
+    Each pass is an Eulerian circuit (see `_eulerian_circuit`) that starts
+    where the previous one ended, so no stimulus is ever shown twice in a
+    row and every transition is equally frequent.
+
+    Parameters
+    ----------
+    n_trials : int
+    seed : int | None
+        Seed of the random order; the same seed gives the same order.
+    stimuli : list of str
+        At least two, since no stimulus may follow itself.
+    '''
+    n = len(stimuli)
+    if n < 2:
+        raise ValueError('Need at least 2 stimuli to alternate, got %d.'%n)
+    rng = np.random.default_rng(seed)
+    order = [int(rng.integers(n))] # start on a random position
+    while len(order) < n_trials:
+        order += _eulerian_circuit(n, order[-1], rng)[1:]
+    return [stimuli[i] for i in order[:n_trials]]
+
+def _latency_summary(latencies):
+    '''
+    Percentiles (in ms) of the delay between the scanner trigger and the
+    time it was logged, to be stored in the sidecar of TRs.tsv.
+    '''
+    if not latencies:
+        return dict(n = 0)
+    ms = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return dict(n = len(ms), median_ms = p50, p95_ms = p95, p99_ms = p99,
+                max_ms = ms.max(), min_ms = ms.min())
+
+def record_TRs(stop_event, start_event, fname, kb_name, mri_key,
+                min_sleep = .001, max_sleep = .02, kb_backend = 'hid',
+                kb_kwargs = None, telemetry_interval = None):
+    '''
+    Logs scanner triggers (`mri_key` presses) until `stop_event` is set.
+
+    Key presses are timestamped by the HID event queue, so how often the
+    queue is checked only affects how soon a trigger is logged, not its
+    timestamp. The queue is checked every `min_sleep` seconds after a
+    trigger, backing off to every `max_sleep` seconds while idle.
+
+    Each row of the log holds the trigger time on `Clock` ('timestamp',
+    corrected by the measured latency) and the 'latency', i.e. how long
+    after the key press the trigger was picked up. A summary of the
+    latencies is written to the sidecar when recording stops.
+
+    `kb_backend` and `kb_kwargs` select the trigger source (see
+    `load_keyboard`); `kb_name` is the device name of the 'hid' backend.
+
+    If `telemetry_interval` is given, TR counts, trigger latencies and TRs
+    missing from the otherwise regular sequence are published to a stats
+    file next to the log (see `glove.Telemetry`).
+    '''
+    clock = Clock()
+    kb_kwargs = dict() if kb_kwargs is None else dict(kb_kwargs)
+    if kb_backend == 'hid':
+        kb_kwargs.setdefault('dev_name', kb_name)
+    kb = load_keyboard(kb_backend, **kb_kwargs)
+    log = TSVLogger(fname, ['timestamp', 'latency'], buffered = True)
+    write_sidecar(fname, clock = clock.metadata())
+    latencies = []
+    telemetry = None
+    if telemetry_interval is not None:
+        telemetry = Telemetry(stats_path(fname), telemetry_interval,
+                                recording = fname, keyboard = kb_backend)
+        telemetry.gauge('writer_queue_depth', lambda: log.queue_depth)
+        telemetry.start()
+    trs = []
+    sleep = min_sleep
+    try:
+        while not stop_event.is_set():
             keys = kb.getKeys([mri_key], waitRelease = False, clear = True)
             if keys:
                 t = clock.time()
-                log.write(timestamp = t)
-                if first_tr:
-                    first_tr = False
+                # `kb.clock` counts from its last reset, as does `rt`;
+                # `tDown` is on psychtoolbox's absolute timebase
+                now = kb.clock.getTime()
+                for key in keys:
+                    latency = now - key.rt
+                    log.write_row((t - latency, latency))
+                    latencies.append(latency)
+                    trs.append(t - latency)
+                    if telemetry is not None:
+                        if len(trs) == 4: # TR is known once a few came in
+                            telemetry.set_rate(1 / np.median(np.diff(trs)))
+                        telemetry.tick(t - latency)
+                        telemetry.latency('trigger', latency)
+                if not start_event.is_set():
                     start_event.set()
-    except:
+                sleep = min_sleep
+            else:
+                sleep = min(2 * sleep, max_sleep)
+            stop_event.wait(sleep)
+    finally:
         log.close()
+        write_sidecar(fname, latency = _latency_summary(latencies))
+        if telemetry is not None:
+            telemetry.close()
 
 class TRSync:
 
-    def __init__(self, fname, kb_name, mri_key):
+    def __init__(self, fname, kb_name, mri_key, kb_backend = 'hid',
+                    kb_kwargs = None, telemetry_interval = None):
         self.fname = fname
         self.kb_name = kb_name
         self.mri_key = mri_key
+        self.kb_backend = kb_backend
+        self.kb_kwargs = kb_kwargs
+        self.telemetry_interval = telemetry_interval
 
     def start(self):
+        from multiprocessing import Process, Event
         self._stop_event = Event()
         self._start_event = Event()
         self._process = Process(
@@ -132,6 +359,11 @@ class TRSync:
                 self.fname, 
                 self.kb_name, 
                 self.mri_key
+                ),
+            kwargs = dict(
+                kb_backend = self.kb_backend,
+                kb_kwargs = self.kb_kwargs,
+                telemetry_interval = self.telemetry_interval
                 )
             )
         self._process.start()
@@ -144,10 +376,12 @@ class TRSync:
     def received_first_TR(self):
         return self._start_event.is_set()
 
-    def wait_until_first_TR(self, poll_time = .05):
-        while not self.received_first_TR:
-            core.wait(poll_time)
-        return
+    def wait_until_first_TR(self, timeout = None):
+        '''
+        Blocks until the first TR comes in, or for at most `timeout` seconds.
+        Returns whether it did.
+        '''
+        return self._start_event.wait(timeout)
 
     def __del__(self):
         self.stop()